@@ -0,0 +1,147 @@
+# bench_reducers.py
+#
+# So sánh thời gian tính toán EE giữa cách cũ (5 lần reduceRegion: count,
+# sum tổng, sum từng khu HCM / BD / BRVT) và cách mới (1 reduceRegion
+# sum+count cho tổng + sum từng khu). Cả 2 cách đều được gói vào
+# 1 ee.Dictionary -> 1 getInfo, nên chênh lệch là thời gian tính phía EE,
+# không phải số round-trip. Đồng thời kiểm tra kết quả giống nhau
+# (max_rel_diff: sai lệch tương đối lớn nhất giữa các số).
+#
+#   python -m app.bench_reducers --dates 2024-10-01 2023-10-15 2022-10-20 --scale 30
+#
+# Cần earthengine-api + tài khoản EE đã xác thực (như khi chạy server).
+import argparse
+import datetime as dt
+import time
+import statistics
+
+import ee
+
+from .processing import (
+    AOI,
+    AOI_BD,
+    AOI_BRVT,
+    AOI_HCM,
+    _flood_area_stats,
+    _regional_area_km2,
+    jrc_perm_water_mask,
+    load_s1_vv,
+    otsu_threshold,
+    srtm_elev_mask,
+    timeseries_window,
+)
+
+
+def _flood_mask(win, scale, min_diff_db=-2.0, elev_max_m=15):
+    aoi = AOI
+    pre_vv = load_s1_vv(aoi, win["pre_start"], win["pre_end"])
+    evt_vv = load_s1_vv(aoi, win["event_start"], win["event_end"])
+    delta = evt_vv.subtract(pre_vv)
+    flood = evt_vv.lte(otsu_threshold(evt_vv, aoi, scale)).And(
+        delta.lte(min_diff_db)
+    )
+    flood = flood.updateMask(jrc_perm_water_mask().Not())
+    flood = flood.updateMask(srtm_elev_mask(elev_max_m))
+    return flood.updateMask(flood).rename("flood").clip(aoi)
+
+
+def _legacy_stats(flood, scale):
+    """Cách cũ: mỗi thống kê 1 lần reduceRegion riêng (5 lượt quét raster)."""
+
+    def _reduce(img, reducer, region):
+        v = img.reduceRegion(
+            reducer=reducer,
+            geometry=region,
+            scale=scale,
+            maxPixels=1e13,
+            bestEffort=True,
+        ).get("flood")
+        return ee.Number(ee.Algorithms.If(v, v, ee.Number(0)))
+
+    area_img = flood.multiply(ee.Image.pixelArea())
+    return ee.Dictionary(
+        {
+            "pixel_count": _reduce(flood, ee.Reducer.count(), AOI),
+            "area_km2": _reduce(area_img, ee.Reducer.sum(), AOI).divide(1e6),
+            "hcm": _reduce(area_img, ee.Reducer.sum(), AOI_HCM).divide(1e6),
+            "bd": _reduce(area_img, ee.Reducer.sum(), AOI_BD).divide(1e6),
+            "brvt": _reduce(area_img, ee.Reducer.sum(), AOI_BRVT).divide(1e6),
+        }
+    )
+
+
+def _combined_stats(flood, scale):
+    """Cách mới: 1 reduceRegion (sum+count) cho tổng + sum từng khu."""
+    area_km2, pixel_count = _flood_area_stats(flood, AOI, scale)
+    regional = _regional_area_km2(flood, scale)
+    return ee.Dictionary(
+        {
+            "pixel_count": pixel_count,
+            "area_km2": area_km2,
+            "hcm": regional.get("hcm"),
+            "bd": regional.get("bd"),
+            "brvt": regional.get("brvt"),
+        }
+    )
+
+
+def _timed(obj):
+    t0 = time.perf_counter()
+    out = obj.getInfo()
+    return out, time.perf_counter() - t0
+
+
+def _max_rel_diff(old, new) -> float:
+    return max(
+        abs(float(old[k]) - float(new[k])) / max(1.0, abs(float(old[k])))
+        for k in old
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark flood reducers")
+    parser.add_argument("--dates", nargs="+", default=["2024-10-01"])
+    parser.add_argument("--scale", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    total_old = total_new = 0.0
+    print(f"{'date':<12}{'legacy_s':>10}{'combined_s':>12}{'max_rel_diff':>14}{'same':>6}")
+    for d in args.dates:
+        win = timeseries_window(dt.date.fromisoformat(d))
+        flood = _flood_mask(win, args.scale)
+
+        # đổi thứ tự mỗi lượt để cache dữ liệu nguồn của EE không thiên vị
+        # cách nào; lấy median
+        t_olds, t_news = [], []
+        for i in range(max(1, args.repeat)):
+            if i % 2 == 0:
+                new, t_new = _timed(_combined_stats(flood, args.scale))
+                old, t_old = _timed(_legacy_stats(flood, args.scale))
+            else:
+                old, t_old = _timed(_legacy_stats(flood, args.scale))
+                new, t_new = _timed(_combined_stats(flood, args.scale))
+            t_olds.append(t_old)
+            t_news.append(t_new)
+        t_old, t_new = statistics.median(t_olds), statistics.median(t_news)
+        total_old += t_old
+        total_new += t_new
+
+        diff = _max_rel_diff(old, new)
+        same = diff <= 1e-6
+        print(
+            f"{d:<12}{t_old:>10.2f}{t_new:>12.2f}{diff:>14.2e}"
+            f"{'yes' if same else 'NO':>6}"
+        )
+        if not same:
+            print(f"  legacy={old}\n  combined={new}")
+
+    if total_old:
+        print(
+            f"total legacy={total_old:.2f}s combined={total_new:.2f}s "
+            f"saving={(1 - total_new / total_old) * 100:.1f}%"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+# ============================================================
+#  BENCHMARK SERIALIZE RESPONSE /flood: TRƯỚC (pydantic + json) / SAU (orjson)
+# ============================================================
+# Dữ liệu giả lập cỡ 1 sự kiện lớn (polygon răng cưa kiểu reduceToVectors,
+# tọa độ đủ 15-17 chữ số như getInfo trả về + 4 ranh giới khu).
+#
+#     python -m app.bench_serialization
+#     python -m app.bench_serialization --features 5000 --vertices 200
+#
+# "trước": đường mặc định của FastAPI với response_model – validate
+#          FloodResponse, jsonable_encoder, json.dumps.
+# "sau"  : làm tròn tọa độ 1 lần khi lưu (không tính vào thời gian gửi),
+#          fastjson.dumps; thêm gzip / br như khi client gửi Accept-Encoding.
+
+import json
+import time
+import argparse
+import statistics
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+
+from .fastjson import GEOJSON_DECIMALS, brotli, compress, dumps, orjson, round_geojson
+from .models import FloodResponse
+
+
+def _ring(rng, cx: float, cy: float, n: int, r: float) -> list:
+    a = np.sort(rng.uniform(0, 2 * np.pi, n))
+    rr = r * (1 + 0.3 * rng.standard_normal(n)).clip(0.3)
+    # bám lưới ~30 m như vector hóa từ raster, rồi cộng nhiễu float
+    step = 30 / 111_320
+    x = np.round((cx + rr * np.cos(a)) / step) * step + rng.normal(0, 1e-12, n)
+    y = np.round((cy + rr * np.sin(a)) / step) * step + rng.normal(0, 1e-12, n)
+    pts = np.column_stack([x, y]).tolist()
+    return pts + [pts[0]]
+
+
+def _fc(rng, n_features: int, vertices: int, r: float = 0.004) -> dict:
+    side = int(np.ceil(np.sqrt(n_features)))
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "id": f"+{i}",
+                "properties": {"class": 1},
+                "geometry": {
+                    "type": "Polygon",
+                    "coordinates": [
+                        _ring(rng, 106.4 + (i % side) * 0.01, 10.6 + (i // side) * 0.01, vertices, r)
+                    ],
+                },
+            }
+            for i in range(n_features)
+        ],
+    }
+
+
+def sample_response(n_features: int, vertices: int, region_vertices: int) -> dict:
+    rng = np.random.default_rng(0)
+    regions = {
+        name: _fc(rng, 1, region_vertices, r=0.4)
+        for name in ("merged", "hcm", "bd", "brvt")
+    }
+    return {
+        "stats": {
+            "area_km2": 123.4,
+            "pixel_count": 137111,
+            "scale_m": 30,
+            "area_km2_hcm": 61.2,
+            "area_km2_bd": 40.1,
+            "area_km2_brvt": 22.1,
+            "otsu_threshold_db": -17.5,
+        },
+        "polygons_geojson": _fc(rng, n_features, vertices),
+        "aoi_geojson": regions["merged"],
+        "thumb_url": "/images/0123456789abcdef.png",
+        "layers": {
+            "flood": "/images/a.png",
+            "pre_vv": "/images/b.png",
+            "event_vv": "/images/c.png",
+            "delta_db": "/images/d.png",
+        },
+        "regions_geojson": regions,
+        "ee_round_trips": 0,
+        "result_key": "0123456789abcdef",
+        "cached": True,
+    }
+
+
+def _rounded(data: dict) -> dict:
+    return {
+        **data,
+        "polygons_geojson": round_geojson(data["polygons_geojson"]),
+        "aoi_geojson": round_geojson(data["aoi_geojson"]),
+        "regions_geojson": {
+            k: round_geojson(v) for k, v in data["regions_geojson"].items()
+        },
+    }
+
+
+def _before(data: dict) -> bytes:
+    model = FloodResponse.model_validate(data)
+    return json.dumps(
+        jsonable_encoder(model),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def _timed(fn, repeat: int):
+    times, out = [], None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(times), out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark serialize response /flood")
+    ap.add_argument("--features", type=int, default=3000)
+    ap.add_argument("--vertices", type=int, default=120)
+    ap.add_argument("--region-vertices", type=int, default=20000)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    data = sample_response(args.features, args.vertices, args.region_vertices)
+    rounded_ms, rounded = _timed(lambda: _rounded(data), 1)
+
+    rows = []
+    ms, before = _timed(lambda: _before(data), args.repeat)
+    rows.append(("trước: validate + jsonable_encoder + json", ms, len(before)))
+    gz_ms, gz = _timed(lambda: compress(before, "gzip"), args.repeat)
+    rows.append(("trước + gzip", ms + gz_ms, len(gz)))
+
+    ms, after = _timed(lambda: dumps(rounded), args.repeat)
+    encoder = "orjson" if orjson is not None else "json"
+    rows.append((f"sau: {encoder}, tọa độ {GEOJSON_DECIMALS} chữ số", ms, len(after)))
+    gz_ms, gz = _timed(lambda: compress(after, "gzip"), args.repeat)
+    rows.append(("sau + gzip (lần đầu; sau đó gửi bytes đã lưu)", ms + gz_ms, len(gz)))
+    if brotli is not None:
+        br_ms, br = _timed(lambda: compress(after, "br"), args.repeat)
+        rows.append(("sau + br (lần đầu; sau đó gửi bytes đã lưu)", ms + br_ms, len(br)))
+
+    n_vertices = args.features * (args.vertices + 1) + 4 * (args.region_vertices + 1)
+    print(
+        f"FloodResponse: {args.features} polygon x {args.vertices} đỉnh + 4 ranh giới x "
+        f"{args.region_vertices} đỉnh (~{n_vertices:,} đỉnh); median {args.repeat} lần"
+    )
+    print(f"làm tròn tọa độ (1 lần khi lưu kết quả): {rounded_ms:.0f} ms")
+    if brotli is None:
+        print("(chưa cài brotli -> bỏ qua br)")
+    print()
+    width = max(len(r[0]) for r in rows)
+    print(f"{'':{width}}  {'ms':>9}  {'bytes':>12}")
+    for name, ms, size in rows:
+        print(f"{name:{width}}  {ms:9.1f}  {size:12,}")
+
+
+if __name__ == "__main__":
+    main()
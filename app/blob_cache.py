@@ -0,0 +1,158 @@
+import os
+import time
+import uuid
+import threading
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Optional
+
+from .result_cache import CACHE_DIR
+
+# ============================================================
+#  CACHE BYTES TRÊN ĐĨA (TILE PNG, ẢNH LAYER) – LRU THEO MTIME
+# ============================================================
+# - Khóa dạng "a/b/c" -> file <dir>/a/b/c<suffix> (cho phép thư mục
+#   con, vd. tile theo layer/result_key/z/x/y).
+# - get() "chạm" mtime; vượt max_disk_bytes thì xóa file cũ nhất tới
+#   khi còn ~90% giới hạn. Tổng dung lượng được giữ trong RAM, chỉ quét
+#   thư mục khi khởi tạo lần đầu và khi phải dọn.
+# - TTL theo mtime (ttl_s <= 0 -> không hết hạn).
+# - File lớn (ZIP báo cáo, ...): open() đọc dần từ đĩa, staging_path() +
+#   commit_file() ghi dần rồi đưa vào cache – không giữ cả file trong RAM.
+
+
+class BlobCache:
+    def __init__(
+        self,
+        name: str,
+        max_disk_bytes: int = 512 * 1024 * 1024,
+        ttl_s: float = 0,
+        suffix: str = ".bin",
+        disk_dir: Optional[Path] = None,
+    ):
+        self.name = name
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl_s = ttl_s
+        self.suffix = suffix
+        self.disk_dir = Path(disk_dir) if disk_dir else CACHE_DIR / name
+
+        self._lock = threading.Lock()
+        self._total: Optional[int] = None  # None = chưa quét thư mục
+        self._counters = {"hits": 0, "misses": 0, "sets": 0, "evictions": 0, "expired": 0}
+
+    def _path(self, key: str) -> Path:
+        parts = [p for p in key.split("/") if p and p not in (".", "..")]
+        if not parts:
+            raise ValueError(f"khóa cache không hợp lệ: {key!r}")
+        return self.disk_dir.joinpath(*parts).with_suffix(self.suffix)
+
+    def _files(self):
+        out = []
+        for p in self.disk_dir.rglob(f"*{self.suffix}"):
+            try:
+                out.append((p, p.stat()))
+            except OSError:
+                pass
+        return out
+
+    # ---------- API ----------
+
+    def _read(self, key: str, read):
+        path = self._path(key)
+        try:
+            st = path.stat()
+            if self.ttl_s > 0 and time.time() - st.st_mtime > self.ttl_s:
+                path.unlink(missing_ok=True)
+                with self._lock:
+                    self._counters["expired"] += 1
+                    self._counters["misses"] += 1
+                    if self._total is not None:
+                        self._total -= st.st_size
+                return None
+            data = read(path)
+            os.utime(path, None)
+        except OSError:
+            with self._lock:
+                self._counters["misses"] += 1
+            return None
+
+        with self._lock:
+            self._counters["hits"] += 1
+        return data
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._read(key, Path.read_bytes)
+
+    def open(self, key: str) -> Optional[BinaryIO]:
+        """File (rb) của khóa để đọc dần; None nếu chưa có / hết hạn. Caller tự đóng."""
+        return self._read(key, lambda p: open(p, "rb"))
+
+    def set(self, key: str, data: bytes):
+        tmp = self.staging_path(key)
+        with open(tmp, "wb") as f:
+            f.write(data)
+        self.commit_file(key, tmp)
+
+    def staging_path(self, key: str) -> Path:
+        """File tạm cạnh vị trí của khóa (cùng ổ đĩa) để ghi dần rồi commit_file()."""
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+
+    def commit_file(self, key: str, tmp: Path):
+        """Đưa file tạm (từ staging_path) vào cache dưới khóa key."""
+        path = self._path(key)
+        try:
+            old = path.stat().st_size
+        except OSError:
+            old = 0
+        size = tmp.stat().st_size
+        os.replace(tmp, path)
+
+        with self._lock:
+            self._counters["sets"] += 1
+            if self._total is not None:
+                self._total += size - old
+            need_scan = self._total is None or self._total > self.max_disk_bytes
+        if need_scan:
+            self._evict()
+
+    def _evict(self):
+        """Xóa file hết hạn + file ít dùng nhất cho tới khi còn ~90% giới hạn."""
+        files = self._files()
+        now = time.time()
+        alive = []
+        for p, st in files:
+            if self.ttl_s > 0 and now - st.st_mtime > self.ttl_s:
+                p.unlink(missing_ok=True)
+                with self._lock:
+                    self._counters["expired"] += 1
+            else:
+                alive.append((p, st))
+
+        total = sum(st.st_size for _, st in alive)
+        if total > self.max_disk_bytes:
+            target = int(self.max_disk_bytes * 0.9)
+            alive.sort(key=lambda it: it[1].st_mtime)
+            for p, st in alive:
+                if total <= target:
+                    break
+                p.unlink(missing_ok=True)
+                total -= st.st_size
+                with self._lock:
+                    self._counters["evictions"] += 1
+
+        with self._lock:
+            self._total = total
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            total = self._total
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            "name": self.name,
+            **counters,
+            "hit_ratio": (counters["hits"] / lookups) if lookups else None,
+            "disk_bytes": total,
+            "max_disk_bytes": self.max_disk_bytes,
+        }
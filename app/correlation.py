@@ -0,0 +1,152 @@
+import datetime as dt
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# ============================================================
+#  TƯƠNG QUAN MƯA – NGẬP (NumPy, có độ trễ + mưa tích lũy)
+# ============================================================
+# Với mỗi mốc ngập d, lag L (ngày) và cửa sổ tích lũy W (ngày):
+#     rain(d, L, W) = tổng mưa các ngày [d - L - W + 1, d - L]
+# Toàn bộ lưới (L x W x N mốc) được dựng 1 lần bằng cumsum + fancy
+# indexing, Pearson / Spearman tính vector hóa trên trục cuối.
+
+
+def pearson(xs: Sequence[float], ys: Sequence[float]) -> Optional[float]:
+    """Pearson cho 2 dãy số; None nếu < 2 phần tử hoặc phương sai = 0."""
+    x = np.asarray(xs, dtype=float)
+    y = np.asarray(ys, dtype=float)
+    if x.size < 2:
+        return None
+    r = _masked_pearson(x[None, :], y[None, :], np.ones((1, x.size), bool))[0]
+    return None if np.isnan(r) else float(r)
+
+
+def _masked_pearson(x: np.ndarray, y: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    """Pearson theo từng hàng, chỉ dùng các phần tử valid. Trả NaN nếu không xác định."""
+    n = valid.sum(axis=-1)
+    x = np.where(valid, x, 0.0)
+    y = np.where(valid, y, 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mx = x.sum(axis=-1) / n
+        my = y.sum(axis=-1) / n
+        dx = np.where(valid, x - mx[..., None], 0.0)
+        dy = np.where(valid, y - my[..., None], 0.0)
+        cov = (dx * dy).sum(axis=-1)
+        var_x = (dx * dx).sum(axis=-1)
+        var_y = (dy * dy).sum(axis=-1)
+        r = cov / np.sqrt(var_x * var_y)
+    r[(n < 2) | (var_x == 0) | (var_y == 0)] = np.nan
+    return r
+
+
+def _masked_rank(v: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    """
+    Hạng (1..n, hạng trung bình khi bằng nhau) theo từng hàng, chỉ xét
+    phần tử valid (phần tử không valid bị đẩy xuống cuối, bỏ qua sau đó).
+    """
+    rows, n = v.shape
+    vv = np.where(valid, v, np.inf)
+    order = np.argsort(vv, axis=1, kind="mergesort")
+    sv = np.take_along_axis(vv, order, axis=1)
+
+    new_group = np.ones_like(sv, dtype=bool)
+    new_group[:, 1:] = sv[:, 1:] != sv[:, :-1]
+    gid = np.cumsum(new_group.ravel()) - 1
+
+    pos = np.tile(np.arange(1, n + 1, dtype=float), rows)
+    avg = np.bincount(gid, weights=pos) / np.bincount(gid)
+
+    ranks = np.empty_like(sv, dtype=float)
+    np.put_along_axis(ranks, order, avg[gid].reshape(rows, n), axis=1)
+    return ranks
+
+
+def lagged_rain_correlation(
+    flood_series: List[Dict[str, Any]],
+    rain_series: List[Dict[str, Any]],
+    max_lag_days: int = 10,
+    windows: Sequence[int] = (1, 3, 7, 14),
+    method: str = "pearson",
+) -> Dict[str, Any]:
+    """
+    Tương quan diện tích ngập với mưa (lệch lag ngày, tích lũy W ngày)
+    cho mọi lag trong [0, max_lag_days] và mọi W trong windows.
+
+    Trả về:
+      {"grid": [{lag_days, window_days, pearson, spearman, n}, ...],
+       "best": {lag_days, window_days, corr, method, n} | None}
+    """
+    lags = np.arange(0, max(0, int(max_lag_days)) + 1)
+    wins = np.array(sorted({int(w) for w in windows if int(w) > 0}) or [1])
+
+    f_ord = np.array(
+        [dt.date.fromisoformat(r["date"]).toordinal() for r in flood_series],
+        dtype=np.int64,
+    )
+    area = np.array([float(r.get("area_km2") or 0.0) for r in flood_series])
+
+    if not rain_series or f_ord.size < 2:
+        return {"grid": [], "best": None}
+
+    # ---- Mưa ngày dạng mảng dày (NaN = thiếu) + cumsum ----
+    r_ord = np.array(
+        [dt.date.fromisoformat(r["date"]).toordinal() for r in rain_series],
+        dtype=np.int64,
+    )
+    r0 = int(r_ord.min())
+    rain = np.full(int(r_ord.max()) - r0 + 1, np.nan)
+    rain[r_ord - r0] = [float(r.get("rain_mm") or 0.0) for r in rain_series]
+
+    have = ~np.isnan(rain)
+    cs = np.concatenate([[0.0], np.cumsum(np.where(have, rain, 0.0))])
+    cnt = np.concatenate([[0], np.cumsum(have)])
+
+    # ---- Lưới (lag, window, mốc) ----
+    end = f_ord[None, None, :] - lags[:, None, None] - r0  # chỉ số ngày cuối cửa sổ
+    start = end - wins[None, :, None] + 1
+    in_range = (start >= 0) & (end < rain.size)
+    s_idx = np.clip(start, 0, rain.size)
+    e_idx = np.clip(end + 1, 0, rain.size)
+
+    acc = cs[e_idx] - cs[s_idx]
+    complete = (cnt[e_idx] - cnt[s_idx]) == wins[None, :, None]
+    valid = in_range & complete
+
+    shape = valid.shape  # (L, W, N)
+    x = acc.reshape(-1, shape[-1])
+    m = valid.reshape(-1, shape[-1])
+    y = np.broadcast_to(area, x.shape)
+
+    r_p = _masked_pearson(x, y, m)
+    r_s = _masked_pearson(_masked_rank(x, m), _masked_rank(y, m), m)
+    n = m.sum(axis=-1)
+
+    def _f(v):
+        return None if np.isnan(v) else round(float(v), 4)
+
+    grid = []
+    for i, (li, wi) in enumerate(np.ndindex(shape[0], shape[1])):
+        grid.append(
+            {
+                "lag_days": int(lags[li]),
+                "window_days": int(wins[wi]),
+                "pearson": _f(r_p[i]),
+                "spearman": _f(r_s[i]),
+                "n": int(n[i]),
+            }
+        )
+
+    score = r_s if method == "spearman" else r_p
+    best = None
+    if not np.all(np.isnan(score)):
+        i = int(np.nanargmax(score))
+        best = {
+            "lag_days": grid[i]["lag_days"],
+            "window_days": grid[i]["window_days"],
+            "corr": _f(score[i]),
+            "method": "spearman" if method == "spearman" else "pearson",
+            "n": grid[i]["n"],
+        }
+
+    return {"grid": grid, "best": best}
@@ -0,0 +1,80 @@
+from typing import List, Sequence
+
+# ============================================================
+#  GIẢM ĐIỂM CHO CHUỖI THỜI GIAN (giữ payload biểu đồ cố định)
+# ============================================================
+# Cả 2 hàm nhận x (đã sort tăng dần), y cùng độ dài và trả về
+# danh sách CHỈ SỐ được giữ lại (tăng dần) -> caller tự lấy bản ghi gốc.
+
+
+def lttb_indices(x: Sequence[float], y: Sequence[float], max_points: int) -> List[int]:
+    """
+    Largest-Triangle-Three-Buckets: giữ điểm đầu/cuối, mỗi bucket ở giữa
+    chọn điểm tạo tam giác lớn nhất với điểm đã chọn trước đó và
+    trung bình bucket kế tiếp -> giữ được hình dạng đỉnh/đáy của chuỗi.
+    """
+    n = len(x)
+    if max_points >= n or n <= 2:
+        return list(range(n))
+    if max_points < 3:
+        return [0, n - 1][:max(1, max_points)]
+
+    every = (n - 2) / (max_points - 2)
+    out = [0]
+    a = 0
+
+    for i in range(max_points - 2):
+        # bucket hiện tại [start, end)
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+
+        # trung bình bucket kế tiếp
+        nxt_start = end
+        nxt_end = min(int((i + 2) * every) + 1, n)
+        if nxt_start >= nxt_end:
+            nxt_start, nxt_end = n - 1, n
+        cnt = nxt_end - nxt_start
+        avg_x = sum(x[nxt_start:nxt_end]) / cnt
+        avg_y = sum(y[nxt_start:nxt_end]) / cnt
+
+        ax, ay = x[a], y[a]
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (y[j] - ay) - (ax - x[j]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        out.append(best)
+        a = best
+
+    out.append(n - 1)
+    return out
+
+
+def minmax_indices(y: Sequence[float], max_points: int) -> List[int]:
+    """
+    Bucket min/max: giữ điểm đầu/cuối, chia phần giữa thành
+    (max_points - 2)/2 bucket, mỗi bucket giữ điểm nhỏ nhất và lớn nhất
+    (theo thứ tự thời gian) -> không mất đỉnh ngập. max_points < 4: chỉ
+    giữ min/max toàn chuỗi.
+    """
+    n = len(y)
+    if max_points >= n or n <= 2:
+        return list(range(n))
+    if max_points < 4:
+        lo = min(range(n), key=lambda j: y[j])
+        hi = max(range(n), key=lambda j: y[j])
+        return sorted({lo, hi})
+
+    n_buckets = (max_points - 2) // 2
+    size = (n - 2) / n_buckets
+    out: List[int] = [0]
+    for b in range(n_buckets):
+        start = int(b * size) + 1
+        end = min(int((b + 1) * size) + 1, n - 1)
+        if start >= end:
+            continue
+        lo = min(range(start, end), key=lambda j: y[j])
+        hi = max(range(start, end), key=lambda j: y[j])
+        out.extend(sorted({lo, hi}))
+    out.append(n - 1)
+    return out
@@ -1,4 +1,9 @@
 import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
 import ee
 from google.oauth2 import service_account
 
@@ -30,3 +35,53 @@ def init_ee():
         ee.Initialize(project=project or None)
 
     _initialized = True
+
+
+# ---------- Đếm số round-trip tới Earth Engine ----------
+
+
+class RoundTripCounter:
+    """Bộ đếm số lần gọi mạng tới EE (getInfo, getThumbURL, ...) trong 1 request."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def add(self, n: int = 1):
+        with self._lock:
+            self.count += n
+
+
+_current_counter: ContextVar[Optional[RoundTripCounter]] = ContextVar(
+    "ee_round_trip_counter", default=None
+)
+
+
+@contextmanager
+def count_round_trips():
+    """
+    Đếm round-trip EE trong khối `with`:
+
+        with count_round_trips() as rt:
+            ...
+        rt.count
+    """
+    counter = RoundTripCounter()
+    token = _current_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _current_counter.reset(token)
+
+
+def record_round_trip(n: int = 1):
+    """Ghi nhận n round-trip cho bộ đếm hiện tại (nếu có)."""
+    counter = _current_counter.get()
+    if counter is not None:
+        counter.add(n)
+
+
+def get_info(obj):
+    """obj.getInfo() + ghi nhận 1 round-trip."""
+    record_round_trip()
+    return obj.getInfo()
@@ -0,0 +1,45 @@
+import os
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+# ============================================================
+#  THREAD POOL CHO CÁC LỜI GỌI BLOCKING (Earth Engine / HTTP)
+# ============================================================
+# getInfo, getThumbURL, requests.get ... đều chặn luồng.
+# Chạy chúng trong pool riêng để event loop của uvicorn luôn rảnh
+# (vd. /health vẫn trả lời ngay khi /flood đang chờ EE).
+
+EE_POOL_SIZE = int(os.getenv("EE_POOL_SIZE", "8"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "4"))
+
+_ee_pool = ThreadPoolExecutor(max_workers=EE_POOL_SIZE, thread_name_prefix="ee")
+_http_pool = ThreadPoolExecutor(
+    max_workers=HTTP_POOL_SIZE, thread_name_prefix="http"
+)
+
+
+async def _run_in(pool: ThreadPoolExecutor, fn, *args, **kwargs):
+    # copy_context để ContextVar (vd. bộ đếm round-trip EE) đi theo sang thread
+    ctx = contextvars.copy_context()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        pool, functools.partial(ctx.run, fn, *args, **kwargs)
+    )
+
+
+async def run_ee(fn, *args, **kwargs):
+    """Chạy 1 lời gọi Earth Engine (blocking) trong EE pool."""
+    return await _run_in(_ee_pool, fn, *args, **kwargs)
+
+
+async def run_http(fn, *args, **kwargs):
+    """Chạy 1 lời gọi HTTP (blocking, vd. requests.get) trong HTTP pool."""
+    return await _run_in(_http_pool, fn, *args, **kwargs)
+
+
+def shutdown_pools(wait: bool = False):
+    """Đóng các pool khi tắt app."""
+    _ee_pool.shutdown(wait=wait, cancel_futures=True)
+    _http_pool.shutdown(wait=wait, cancel_futures=True)
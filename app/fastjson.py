@@ -0,0 +1,166 @@
+import os
+import gzip
+import json
+from typing import Any, Dict, Optional
+
+import numpy as np
+from fastapi import Request
+from fastapi.responses import Response
+
+from .blob_cache import BlobCache
+
+try:
+    import orjson
+except ImportError:  # chạy được (chậm hơn) khi chưa cài orjson
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# ============================================================
+#  BODY JSON DỰNG SẴN CHO CÁC RESPONSE GEOJSON LỚN
+# ============================================================
+# - dumps(): orjson nếu có (nhanh hơn json chuẩn nhiều lần), không thì
+#   json chuẩn dạng gọn; cả hai trả về bytes UTF-8.
+# - round_geojson(): làm tròn tọa độ về GEOJSON_DECIMALS chữ số (6 ~ 0.1 m)
+#   -> body nhỏ hơn đáng kể, làm 1 lần khi lưu kết quả.
+# - Endpoint trả Response bytes trực tiếp: FastAPI không validate lại
+#   response_model, không đi qua jsonable_encoder.
+# - Nén theo Accept-Encoding: br > gzip > không nén. brotli có trong
+#   requirements.txt; thiếu thư viện thì chỉ dùng gzip (không hỏng).
+# - PreparedBodies: body đã serialize (+ bản nén) của 1 khóa lưu trên đĩa
+#   -> lần sau gửi thẳng bytes, không serialize / nén lại.
+#
+# So sánh trước/sau:
+#     python -m app.bench_serialization
+
+GEOJSON_DECIMALS = int(os.getenv("GEOJSON_DECIMALS", "6"))
+GZIP_LEVEL = int(os.getenv("JSON_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("JSON_BROTLI_QUALITY", "5"))
+# body nhỏ hơn ngưỡng này không nén (header + CPU không đáng)
+COMPRESS_MIN_BYTES = 1024
+
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(
+        obj, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def _round_coords(coords, decimals: int):
+    if not coords:
+        return coords
+    if isinstance(coords[0], (int, float)):
+        return [round(c, decimals) for c in coords]
+    if coords[0] and isinstance(coords[0][0], (int, float)):
+        # 1 ring / line: danh sách điểm -> làm tròn cả mảng 1 lần
+        try:
+            return np.round(np.asarray(coords, dtype=float), decimals).tolist()
+        except ValueError:  # điểm có số chiều khác nhau
+            return [[round(c, decimals) for c in p] for p in coords]
+    return [_round_coords(c, decimals) for c in coords]
+
+
+def round_geojson(obj: Optional[Dict[str, Any]], decimals: int = GEOJSON_DECIMALS):
+    """Bản sao GeoJSON (FeatureCollection / Feature / Geometry) đã làm tròn tọa độ."""
+    if not isinstance(obj, dict):
+        return obj
+    t = obj.get("type")
+    if t == "FeatureCollection":
+        return {**obj, "features": [round_geojson(f, decimals) for f in obj.get("features") or []]}
+    if t == "Feature":
+        return {**obj, "geometry": round_geojson(obj.get("geometry"), decimals)}
+    if t == "GeometryCollection":
+        return {**obj, "geometries": [round_geojson(g, decimals) for g in obj.get("geometries") or []]}
+    if "coordinates" in obj:
+        return {**obj, "coordinates": _round_coords(obj["coordinates"], decimals)}
+    return obj
+
+
+def accepted_encoding(accept_encoding: str) -> Optional[str]:
+    """Mã nén tốt nhất client chấp nhận: "br" / "gzip" / None."""
+    accepted = set()
+    for part in (accept_encoding or "").lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name and q > 0:
+            accepted.add(name)
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(raw: bytes, encoding: Optional[str]) -> bytes:
+    if encoding == "br":
+        return brotli.compress(raw, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(raw, compresslevel=GZIP_LEVEL)
+    return raw
+
+
+def _encoding_for(request: Request, size: int) -> Optional[str]:
+    if size < COMPRESS_MIN_BYTES:
+        return None
+    return accepted_encoding(request.headers.get("accept-encoding", ""))
+
+
+def encoded_response(
+    body: bytes, encoding: Optional[str], headers: Optional[Dict[str, str]] = None
+) -> Response:
+    h = {"Vary": "Accept-Encoding", **(headers or {})}
+    if encoding:
+        h["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=h)
+
+
+def raw_response(
+    request: Request, raw: bytes, headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """Body JSON đã serialize -> nén theo Accept-Encoding (blocking)."""
+    encoding = _encoding_for(request, len(raw))
+    return encoded_response(compress(raw, encoding), encoding, headers)
+
+
+def json_response(
+    request: Request, obj: Any, headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """Serialize + nén theo Accept-Encoding (blocking, nên chạy trong thread)."""
+    return raw_response(request, dumps(obj), headers)
+
+
+class PreparedBodies:
+    """Body JSON đã serialize theo khóa; bản nén dựng lười rồi lưu cạnh bản gốc."""
+
+    def __init__(self, cache: BlobCache):
+        self.cache = cache
+
+    def set(self, key: str, raw: bytes):
+        self.cache.set(f"{key}/identity", raw)
+
+    def response(
+        self, key: str, request: Request, headers: Optional[Dict[str, str]] = None
+    ) -> Optional[Response]:
+        """Response từ body đã lưu (None nếu chưa có); blocking."""
+        raw = self.cache.get(f"{key}/identity")
+        if raw is None:
+            return None
+        encoding = _encoding_for(request, len(raw))
+        if encoding is None:
+            return encoded_response(raw, None, headers)
+
+        body = self.cache.get(f"{key}/{encoding}")
+        if body is None:
+            body = compress(raw, encoding)
+            self.cache.set(f"{key}/{encoding}", body)
+        return encoded_response(body, encoding, headers)
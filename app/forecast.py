@@ -0,0 +1,239 @@
+import os
+import time
+import asyncio
+import datetime as dt
+from typing import Any, Dict, Optional
+
+import httpx
+
+# ============================================================
+#  DỰ BÁO MƯA OPENWEATHER: CLIENT DÙNG CHUNG + CACHE TTL + LÀM MỚI NỀN
+# ============================================================
+# - 1 httpx.AsyncClient cho cả tiến trình (giữ kết nối keep-alive tới
+#   OpenWeather), không chiếm thread pool như requests.get.
+# - Cache kết quả ĐÃ gộp theo ngày (không phải JSON thô): mọi request
+#   trong FORECAST_TTL_S dùng chung 1 lần gọi upstream.
+# - Làm mới trước khi hết hạn: vòng lặp nền (start()) gọi lại sau mỗi
+#   TTL - REFRESH_AHEAD; request tới khi còn < REFRESH_AHEAD cũng kích
+#   hoạt làm mới nền. Nhiều request lúc cache trống chờ chung 1 lần gọi.
+# - Upstream lỗi: trả kết quả cũ nếu chưa quá FORECAST_STALE_S.
+
+FORECAST_URL = "https://api.openweathermap.org/data/2.5/forecast"
+
+HCM_LAT = 10.82
+HCM_LON = 106.63
+
+RAIN_3D_MEDIUM = 40.0
+RAIN_3D_HIGH = 80.0
+
+# giờ VN (UTC+7) để gộp mưa theo ngày
+TZ_OFFSET_HOURS = 7
+
+# forecast 5 ngày / 3h của OpenWeather cập nhật vài giờ 1 lần
+FORECAST_TTL_S = float(os.getenv("FORECAST_TTL_S", str(3 * 3600)))
+FORECAST_REFRESH_AHEAD_S = float(os.getenv("FORECAST_REFRESH_AHEAD_S", "600"))
+FORECAST_STALE_S = float(os.getenv("FORECAST_STALE_S", str(12 * 3600)))
+# chờ lại sau khi làm mới nền thất bại
+FORECAST_RETRY_S = 60.0
+
+
+class ForecastError(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def classify_risk(rain_3d: float) -> str:
+    if rain_3d >= RAIN_3D_HIGH:
+        return "high"
+    elif rain_3d >= RAIN_3D_MEDIUM:
+        return "medium"
+    return "low"
+
+
+def aggregate_forecast(data: Dict[str, Any], lat: float, lon: float) -> Dict[str, Any]:
+    """JSON forecast 3h của OpenWeather -> mưa theo ngày + mức nguy cơ ngập."""
+    # list: các bước dự báo 3h
+    items = data.get("list", [])
+    if not items:
+        raise ForecastError(500, "Không có dữ liệu forecast từ OpenWeather.")
+
+    daily_rain: Dict[str, float] = {}
+    for it in items:
+        try:
+            ts = it.get("dt")
+            if ts is None:
+                continue
+
+            dt_utc = dt.datetime.fromtimestamp(ts, dt.timezone.utc)
+            dt_local = dt_utc + dt.timedelta(hours=TZ_OFFSET_HOURS)
+            date_str = dt_local.date().isoformat()
+
+            rain_3h = it.get("rain", {}).get("3h", 0.0)
+            rain_val = float(rain_3h) if rain_3h is not None else 0.0
+        except Exception:
+            continue
+
+        daily_rain[date_str] = daily_rain.get(date_str, 0.0) + rain_val
+
+    if not daily_rain:
+        raise ForecastError(500, "Không gom được lượng mưa theo ngày từ OpenWeather.")
+
+    # Sắp xếp ngày, chỉ lấy khoảng 7 ngày đầu cho UI
+    sorted_dates = sorted(daily_rain.keys())
+    raw_daily = [
+        {"date": d, "rain_mm": round(daily_rain[d], 2)}
+        for d in sorted_dates[:7]
+    ]
+
+    # Tổng mưa 3 ngày & 5 ngày
+    rain_3d = round(sum(r["rain_mm"] for r in raw_daily[:3]), 2)
+    rain_5d = round(sum(r["rain_mm"] for r in raw_daily[:5]), 2)
+
+    city = data.get("city", {})
+    location_name = city.get("name") or "TP.HCM (xấp xỉ tâm vùng)"
+
+    return {
+        "location": {
+            "name": location_name,
+            "lat": lat,
+            "lon": lon,
+        },
+        "rain_3d_mm": rain_3d,
+        "rain_5d_mm": rain_5d,
+        "risk_level": classify_risk(rain_3d),
+        "thresholds": {
+            "rain_3d_medium": RAIN_3D_MEDIUM,
+            "rain_3d_high": RAIN_3D_HIGH,
+        },
+        "raw_daily": raw_daily,
+    }
+
+
+class ForecastService:
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        lat: float = HCM_LAT,
+        lon: float = HCM_LON,
+        ttl_s: float = FORECAST_TTL_S,
+        refresh_ahead_s: float = FORECAST_REFRESH_AHEAD_S,
+        stale_s: float = FORECAST_STALE_S,
+    ):
+        self.api_key = api_key
+        self.lat = lat
+        self.lon = lon
+        self.ttl_s = ttl_s
+        self.refresh_ahead_s = min(refresh_ahead_s, ttl_s / 2)
+        self.stale_s = max(stale_s, ttl_s)
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._result: Optional[Dict[str, Any]] = None
+        self._fetched_at = 0.0
+        self._inflight: Optional[asyncio.Task] = None
+        self._loop_task: Optional[asyncio.Task] = None
+        self._counters = {"hits": 0, "misses": 0, "stale": 0, "upstream_calls": 0, "errors": 0}
+
+    def _api_key(self) -> Optional[str]:
+        # đọc lúc gọi: .env được nạp sau khi module này được import
+        return self.api_key or os.getenv("OPENWEATHER_API_KEY")
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=15.0,
+                limits=httpx.Limits(max_connections=4, max_keepalive_connections=2),
+            )
+        return self._client
+
+    async def _fetch(self) -> Dict[str, Any]:
+        self._counters["upstream_calls"] += 1
+        try:
+            resp = await self._http().get(
+                FORECAST_URL,
+                params={
+                    "lat": self.lat,
+                    "lon": self.lon,
+                    "appid": self._api_key(),
+                    "units": "metric",  # nhiệt độ °C, mưa mm
+                },
+            )
+            resp.raise_for_status()
+            data = resp.json()
+        except Exception as e:
+            self._counters["errors"] += 1
+            raise ForecastError(502, f"Không gọi được OpenWeather forecast: {e}")
+
+        result = aggregate_forecast(data, self.lat, self.lon)
+        self._result, self._fetched_at = result, time.time()
+        return result
+
+    def _refresh(self) -> asyncio.Task:
+        """Task gọi upstream (dùng chung nếu đang có lần gọi dở)."""
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.create_task(self._fetch())
+            # lỗi của lần làm mới nền không ai chờ -> lấy ra để khỏi cảnh báo
+            self._inflight.add_done_callback(
+                lambda t: t.cancelled() or t.exception()
+            )
+        return self._inflight
+
+    async def get(self) -> Dict[str, Any]:
+        """Kết quả đã gộp; chỉ chờ upstream khi cache trống hoặc đã hết hạn."""
+        if not self._api_key():
+            raise ForecastError(
+                500, "OPENWEATHER_API_KEY chưa được cấu hình trong biến môi trường."
+            )
+
+        age = time.time() - self._fetched_at
+        if self._result is not None and age < self.ttl_s:
+            self._counters["hits"] += 1
+            if age > self.ttl_s - self.refresh_ahead_s:
+                self._refresh()
+            return self._result
+
+        self._counters["misses"] += 1
+        try:
+            # shield: client ngắt kết nối không hủy lần gọi dùng chung
+            return await asyncio.shield(self._refresh())
+        except ForecastError:
+            if self._result is not None and age < self.stale_s:
+                self._counters["stale"] += 1
+                return self._result
+            raise
+
+    async def _loop(self):
+        while True:
+            # tính từ lần lấy gần nhất (kể cả lần do request kích hoạt)
+            due = self._fetched_at + self.ttl_s - self.refresh_ahead_s - time.time()
+            if due > 0:
+                await asyncio.sleep(due)
+                continue
+            try:
+                await self._refresh()
+            except Exception:
+                await asyncio.sleep(FORECAST_RETRY_S)
+
+    def start(self):
+        """Bật vòng làm mới nền (gọi trong event loop, vd. lúc startup)."""
+        if self._api_key() and self._loop_task is None:
+            self._loop_task = asyncio.create_task(self._loop())
+
+    async def aclose(self):
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            self._loop_task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._counters,
+            "age_s": round(time.time() - self._fetched_at, 1) if self._result else None,
+            "ttl_s": self.ttl_s,
+        }
+
+
+forecast_service = ForecastService()
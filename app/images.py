@@ -0,0 +1,71 @@
+import os
+from typing import Any, Dict, Optional
+
+import ee
+import requests
+
+from .blob_cache import BlobCache
+from .ee_utils import record_round_trip
+from .processing import thumb_url
+from .result_cache import ResultCache, cache_key
+
+# ============================================================
+#  CACHE + PROXY PNG CHO CÁC ẢNH LAYER (thay URL thumbnail EE)
+# ============================================================
+# - Khóa ảnh = hash(graph EE đã serialize của ảnh + region + size):
+#   cùng ảnh, cùng kích thước -> cùng khóa, dù do /flood, /flood/preview
+#   hay /report dựng.
+# - register(): lưu "spec" (graph serialize) theo khóa, KHÔNG gọi EE.
+# - render(): spec -> getThumbURL -> tải PNG 1 lần -> BlobCache trên đĩa.
+#   URL thumbnail của EE hết hạn, nhưng spec thì không: ảnh hết hạn
+#   trong cache vẫn dựng lại được từ spec.
+# - main.py phục vụ bytes ở /images/{key}.png (ETag + Cache-Control dài).
+
+image_cache = BlobCache(
+    "images",
+    max_disk_bytes=int(os.getenv("IMAGE_CACHE_DISK_MB", "512")) * 1024 * 1024,
+    ttl_s=float(os.getenv("IMAGE_CACHE_TTL_S", str(30 * 86400))),
+    suffix=".png",
+)
+
+
+class ImageStore:
+    def __init__(self, cache: BlobCache = image_cache, specs: Optional[ResultCache] = None):
+        self.cache = cache
+        self.specs = specs or ResultCache(
+            "image_specs",
+            max_items=1024,
+            ttl_s=float(os.getenv("IMAGE_CACHE_TTL_S", str(30 * 86400))),
+            max_disk_bytes=128 * 1024 * 1024,
+        )
+        self._session = requests.Session()
+
+    def register(self, img: ee.Image, region, size: int) -> str:
+        """Lưu spec của ảnh (đã visualize) -> khóa ảnh. Không gọi EE."""
+        spec = {
+            "image": ee.serializer.toJSON(img),
+            "region": ee.serializer.toJSON(region),
+            "size": int(size),
+        }
+        key = cache_key("image", spec)
+        if self.specs.get(key) is None:
+            self.specs.set(key, spec)
+        return key
+
+    def spec(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.specs.get(key)
+
+    def thumb_url(self, spec: Dict[str, Any]) -> str:
+        """URL PNG từ spec (1 round-trip getThumbURL)."""
+        record_round_trip()
+        img = ee.Image(ee.deserializer.fromJSON(spec["image"]))
+        region = ee.Geometry(ee.deserializer.fromJSON(spec["region"]))
+        return thumb_url(img, region, size=spec["size"], is_mask=False)
+
+    def download(self, url: str) -> bytes:
+        resp = self._session.get(url, timeout=60)
+        resp.raise_for_status()
+        return resp.content
+
+
+image_store = ImageStore()
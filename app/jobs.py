@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# ============================================================
+#  HÀNG ĐỢI JOB NỀN CHO /flood, /report (SUBMIT -> POLL / SSE)
+# ============================================================
+# - submit() trả job_id ngay, công việc chạy như asyncio task, tối đa
+#   JOB_WORKERS job chạy cùng lúc (phần blocking vẫn nằm trong EE/HTTP pool).
+# - Mỗi job ghi lại các sự kiện tiến độ theo stage (stats, vectors,
+#   thumbnails, ...) để client poll hoặc nghe SSE.
+# - Job đã xong được giữ lại JOB_TTL_S giây rồi bị dọn.
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_TTL_S = float(os.getenv("JOB_TTL_S", "3600"))
+JOB_MAX_RETAINED = int(os.getenv("JOB_MAX_RETAINED", "200"))
+
+Progress = Callable[[str], None]
+
+
+class Job:
+    def __init__(self, kind: str, params: Dict[str, Any]):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.status = "queued"  # queued | running | done | error
+        self.stage: Optional[str] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.error_status: int = 500
+        self.events: List[Dict[str, Any]] = []
+        self._changed = asyncio.Event()
+
+    def _emit(self, event: str, **data):
+        self.events.append({"event": event, "t": round(time.time() - self.created, 3), **data})
+        # đánh thức mọi subscriber SSE rồi tạo Event mới cho lần sau
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def progress(self, stage: str):
+        self.stage = stage
+        self._emit("progress", stage=stage)
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "error")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "stage": self.stage,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "expires_at": (self.finished + JOB_TTL_S) if self.finished else None,
+            "error": self.error,
+            "stages_done": [e["stage"] for e in self.events if e["event"] == "progress"],
+        }
+
+    async def sse(self):
+        """Sinh các dòng SSE: phát lại sự kiện cũ rồi chờ sự kiện mới tới khi xong."""
+        sent = 0
+        while True:
+            waiter = self._changed
+            while sent < len(self.events):
+                ev = self.events[sent]
+                sent += 1
+                yield f"event: {ev['event']}\ndata: {json.dumps(ev, ensure_ascii=False)}\n\n"
+            if self.done:
+                return
+            try:
+                await asyncio.wait_for(waiter.wait(), timeout=15)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+
+
+class JobManager:
+    def __init__(self, max_workers: int = JOB_WORKERS, ttl_s: float = JOB_TTL_S):
+        self.ttl_s = ttl_s
+        self._jobs: Dict[str, Job] = {}
+        self._sem = asyncio.Semaphore(max(1, max_workers))
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def _purge(self):
+        now = time.time()
+        expired = [
+            jid
+            for jid, j in self._jobs.items()
+            if j.done and j.finished and now - j.finished > self.ttl_s
+        ]
+        for jid in expired:
+            del self._jobs[jid]
+
+        # quá nhiều job đã xong -> bỏ bớt job cũ nhất
+        finished = sorted(
+            (j for j in self._jobs.values() if j.done), key=lambda j: j.finished
+        )
+        for j in finished[: max(0, len(self._jobs) - JOB_MAX_RETAINED)]:
+            del self._jobs[j.id]
+
+    def submit(
+        self,
+        kind: str,
+        params: Dict[str, Any],
+        work: Callable[[Progress], Awaitable[Any]],
+    ) -> Job:
+        """work(progress) là coroutine function; kết quả lưu vào job.result."""
+        self._purge()
+        job = Job(kind, params)
+        self._jobs[job.id] = job
+        job._emit("queued")
+        task = asyncio.create_task(self._run(job, work))
+        self._tasks[job.id] = task
+        task.add_done_callback(lambda _t: self._tasks.pop(job.id, None))
+        return job
+
+    async def _run(self, job: Job, work: Callable[[Progress], Awaitable[Any]]):
+        async with self._sem:
+            job.status = "running"
+            job.started = time.time()
+            job._emit("running")
+            try:
+                job.result = await work(job.progress)
+                job.status = "done"
+            except Exception as e:
+                job.status = "error"
+                job.error = str(getattr(e, "detail", None) or e)
+                job.error_status = int(getattr(e, "status_code", 500))
+            finally:
+                job.finished = time.time()
+                job._emit(job.status, error=job.error)
+
+    def find(self, kind: str, params: Dict[str, Any]) -> Optional[Job]:
+        """Job cùng kind + params còn giữ và chưa lỗi (mới nhất), nếu có."""
+        self._purge()
+        for job in reversed(list(self._jobs.values())):
+            if job.kind == kind and job.status != "error" and job.params == params:
+                return job
+        return None
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._purge()
+        return self._jobs.get(job_id)
+
+    def cancel_all(self):
+        for t in list(self._tasks.values()):
+            t.cancel()
@@ -1,48 +1,83 @@
 import os
 import json
+import time
+import uuid
+import asyncio
 import datetime as dt
 from pathlib import Path
-import io
-import csv
-import zipfile
-import requests
+from typing import List, Optional
+import numpy as np
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 
 from dotenv import load_dotenv
 import ee
 from ee.ee_exception import EEException
 
-from .ee_utils import init_ee
+from .ee_utils import init_ee, count_round_trips, get_info
+from .executor import run_ee, run_http, shutdown_pools
+from .result_cache import ResultCache, cache_key
+from .regions import region_store
+from .timeseries_store import TimeseriesStore
+from .downsample import lttb_indices, minmax_indices
+from .rainfall_store import RainfallStore
+from .correlation import lagged_rain_correlation
+from .jobs import JOB_TTL_S, Job, JobManager, Progress
+from .zipstream import csv_chunks, file_chunks, stream_zip
+from .simplify import (
+    COLLINEAR_TOL,
+    LOD_MAX_VERTICES,
+    LOD_ZOOMS,
+    build_lods,
+    lod_level,
+    simplify_features,
+    simplify_to_budget,
+    tolerance_for_zoom,
+)
+from .singleflight import SingleFlight
+from .otsu import histogram_cache, otsu_from_counts
+from .images import image_store
+from .tiles import TILE_LAYERS, tile_cache, tile_key, tile_source, valid_tile
+from .mvt import TileGeometry, mvt_cache, mvt_key, mvt_source
+from .spatial import FloodIndex, QUERY_MAX_BBOXES, QUERY_MAX_POINTS, index_store
+from .blob_cache import BlobCache
+from .forecast import ForecastError, forecast_service
+from .fastjson import (
+    PreparedBodies,
+    accepted_encoding,
+    dumps,
+    encoded_response,
+    json_response,
+    raw_response,
+    round_geojson,
+)
 from .models import (
     FloodRequest,
     FloodResponse,
+    FloodPreviewResponse,
+    FloodSweepRequest,
+    FloodSweepResponse,
+    FloodSweepCell,
+    FloodPointQuery,
+    FloodPointQueryResponse,
+    FloodBBoxQuery,
+    FloodBBoxQueryResponse,
+    FloodBBoxResult,
     FloodStats,
     FloodMapLayers,
     FloodRegions,
 )
 from .processing import (
-    AOI,
-    AOI_HCM,
-    AOI_BD,
-    AOI_BRVT,
-    detect_flood,
-    to_geojson,
-    thumb_url,
+    FloodPipeline,
     rainfall_timeseries,
     flood_rain_correlation_from_cached,
-    make_flood_map_image,
-    make_vv_image,
-    make_delta_image,
 )
 
 # --- Load biến môi trường & init Earth Engine ---
 load_dotenv()
 init_ee()
-OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
-
 app = FastAPI(
     title="GEE Flood API",
     version="0.1.0",
@@ -56,45 +91,151 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.on_event("startup")
+async def _startup():
+    # nạp ranh giới tĩnh 1 lần; lỗi EE lúc khởi động thì để request đầu tiên thử lại
+    try:
+        await run_ee(region_store.load)
+    except Exception:
+        pass
+    # dự báo mưa: lấy sẵn + làm mới nền trước khi cache hết hạn
+    forecast_service.start()
+
+
+@app.on_event("shutdown")
+async def _shutdown():
+    jobs.cancel_all()
+    await forecast_service.aclose()
+    shutdown_pools()
+
 # ---- Đường dẫn file cache time-series 10 năm ----
 TIMESERIES_CACHE_PATH = Path(__file__).resolve().parent / "flood_timeseries_10y.json"
 
-# ============================================================
-#  CẤU HÌNH DỰ BÁO MƯA & CẢNH BÁO NGUY CƠ NGẬP (OpenWeather)
-# ============================================================
+# ---- Store chuỗi ngập trong RAM (tự nạp lại khi file đổi) ----
+timeseries_store = TimeseriesStore(TIMESERIES_CACHE_PATH)
+
 
-HCM_LAT = 10.82
-HCM_LON = 106.63
+def _timeseries_missing() -> HTTPException:
+    return HTTPException(
+        status_code=500,
+        detail=(
+            "Timeseries cache chưa tồn tại. "
+            "Hãy chạy script precompute_timeseries.py để tạo file."
+        ),
+    )
 
-RAIN_3D_MEDIUM = 40.0
-RAIN_3D_HIGH = 80.0
 
+# ---- Cache mưa CHIRPS theo (ngày, scale), chỉ hỏi EE phần còn thiếu ----
+rainfall_store = RainfallStore(fetch=rainfall_timeseries)
 
-def classify_risk(rain_3d: float) -> str:
-    if rain_3d >= RAIN_3D_HIGH:
-        return "high"
-    elif rain_3d >= RAIN_3D_MEDIUM:
-        return "medium"
-    else:
-        return "low"
+# ---- Job nền cho /flood, /report (submit -> poll / SSE) ----
+jobs = JobManager()
+
+# ---- Gộp các request giống hệt đang chạy dở (/flood, /correlation) ----
+flights = SingleFlight()
+
+# ---- Cache kết quả /flood (RAM LRU + đĩa) ----
+# TTL mặc định 1h (ảnh layer phục vụ qua /images nên không còn phụ thuộc
+# hạn của URL thumbnail GEE; có thể tăng FLOOD_CACHE_TTL_S).
+flood_cache = ResultCache(
+    "flood",
+    max_items=int(os.getenv("FLOOD_CACHE_ITEMS", "64")),
+    ttl_s=float(os.getenv("FLOOD_CACHE_TTL_S", "3600")),
+    max_disk_bytes=int(os.getenv("FLOOD_CACHE_DISK_MB", "512")) * 1024 * 1024,
+)
 
+# ---- Body JSON (+ gzip/br) dựng sẵn của response /flood đã cache: lần gọi
+#      sau gửi thẳng bytes, không dựng lại FloodResponse / serialize / nén ----
+flood_bodies = PreparedBodies(
+    BlobCache(
+        "flood_bodies",
+        max_disk_bytes=int(os.getenv("FLOOD_CACHE_DISK_MB", "512")) * 1024 * 1024,
+        ttl_s=float(os.getenv("FLOOD_CACHE_TTL_S", "3600")),
+        suffix=".json",
+    )
+)
+
+# ---- result_key -> tham số /flood đã chuẩn hóa (để dựng lại ảnh cho tile) ----
+# giữ lâu hơn cache kết quả: tile vẫn phục vụ được khi response đã hết hạn
+flood_requests = ResultCache(
+    "flood_requests",
+    max_items=1024,
+    ttl_s=float(os.getenv("FLOOD_REQUESTS_TTL_S", str(30 * 86400))),
+    max_disk_bytes=32 * 1024 * 1024,
+)
+
+# ---- Polygon ngập đầy đủ theo result_key + các mức LOD đã đơn giản hóa ----
+polygon_store = ResultCache(
+    "polygons",
+    max_items=16,
+    ttl_s=float(os.getenv("FLOOD_REQUESTS_TTL_S", str(30 * 86400))),
+    max_disk_bytes=int(os.getenv("POLYGON_CACHE_DISK_MB", "1024")) * 1024 * 1024,
+)
+lod_cache = ResultCache(
+    "polygon_lods",
+    max_items=128,
+    ttl_s=float(os.getenv("FLOOD_REQUESTS_TTL_S", str(30 * 86400))),
+    max_disk_bytes=int(os.getenv("POLYGON_CACHE_DISK_MB", "1024")) * 1024 * 1024,
+)
+
+# ---- Cache riêng cho bản xem nhanh /flood/preview (nhỏ, không bị kết
+#      quả /flood đầy đủ đẩy ra khỏi LRU) ----
+preview_cache = ResultCache(
+    "preview",
+    max_items=int(os.getenv("PREVIEW_CACHE_ITEMS", "256")),
+    ttl_s=float(os.getenv("FLOOD_CACHE_TTL_S", "3600")),
+    max_disk_bytes=64 * 1024 * 1024,
+)
+PREVIEW_SCALE_M = int(os.getenv("PREVIEW_SCALE_M", "250"))
+PREVIEW_THUMB_SIZE = int(os.getenv("PREVIEW_THUMB_SIZE", "512"))
+
+# ---- File ZIP của job /jobs/report: ghi dần ra đĩa, tải về bằng stream;
+#      giữ bằng thời gian giữ job ----
+report_cache = BlobCache(
+    "reports",
+    max_disk_bytes=int(os.getenv("REPORT_CACHE_DISK_MB", "512")) * 1024 * 1024,
+    ttl_s=JOB_TTL_S,
+    suffix=".zip",
+)
+
+# ---- Số tổ hợp tối đa cho 1 lần /flood/sweep (mỗi tổ hợp = 1 band) ----
+SWEEP_MAX_COMBOS = int(os.getenv("SWEEP_MAX_COMBOS", "36"))
 
 @app.get("/health")
 async def health():
     return {"status": "ok"}
 
 
+@app.get("/cache/stats")
+async def cache_stats():
+    """Số hit/miss/eviction của các cache kết quả."""
+    return {
+        "flood": flood_cache.stats(),
+        "preview": preview_cache.stats(),
+        "tiles": {**tile_cache.stats(), **tile_source.stats()},
+        "images": image_store.cache.stats(),
+        "reports": report_cache.stats(),
+        "mvt": {**mvt_cache.stats(), **mvt_source.stats()},
+        "polygon_lods": lod_cache.stats(),
+        "spatial_index": index_store.stats(),
+        "rainfall": {"ee_fetches": rainfall_store.ee_fetches},
+        "singleflight": flights.stats(),
+        "otsu_hist": histogram_cache.cache.stats(),
+        "forecast": forecast_service.stats(),
+    }
+
+
 @app.get("/aoi")
-async def get_aoi():
+async def get_aoi(request: Request):
     """
     Trả về ranh giới AOI (TP.HCM sau sáp nhập) dưới dạng GeoJSON
     để frontend vẽ viền vàng trên MapView.
     (Giữ endpoint cũ để không vỡ UI hiện tại.)
+    Body JSON + bản gzip được dựng sẵn trong RegionStore, không gọi GEE.
     """
     try:
-        aoi_fc = ee.FeatureCollection(ee.Feature(AOI))
-        aoi_gj = to_geojson(aoi_fc, max_features=1)
-        return {"aoi_geojson": aoi_gj}
+        await run_ee(region_store.load)
     except EEException as e:
         return JSONResponse(
             status_code=502,
@@ -106,12 +247,58 @@ async def get_aoi():
             content={"detail": f"Internal server error (get_aoi): {str(e)}"},
         )
 
+    encoding = accepted_encoding(request.headers.get("accept-encoding", ""))
+    return encoded_response(
+        region_store.aoi_bodies[encoding],
+        encoding,
+        {"Cache-Control": "public, max-age=86400"},
+    )
+
 
 # ====================== NGẬP SỰ KIỆN =======================
 
 
-@app.post("/flood", response_model=FloodResponse)
-async def flood(req: FloodRequest):
+@app.post(
+    "/flood",
+    response_class=Response,
+    responses={200: {"model": FloodResponse, "content": {"application/json": {}}}},
+)
+async def flood(req: FloodRequest, request: Request):
+    """
+    Kết quả ngập của 1 sự kiện. Body JSON gửi dạng bytes dựng sẵn (orjson,
+    nén theo Accept-Encoding); FloodResponse chỉ mô tả schema trong
+    OpenAPI, handler không validate lại.
+    """
+    aoi_asset = _resolve_aoi_asset(req)
+    key = cache_key("flood", _flood_params(aoi_asset, req))
+
+    try:
+        body = await asyncio.to_thread(flood_bodies.response, key, request)
+        if body is not None:
+            return body
+        resp = await _flood_cached(aoi_asset, req)
+        return await asyncio.to_thread(_flood_body, key, resp, request)
+    except EEException as e:
+        return JSONResponse(
+            status_code=502,
+            content={"detail": f"Earth Engine error: {str(e)}"},
+        )
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"detail": f"Internal server error: {str(e)}"},
+        )
+
+
+def _flood_body(key: str, resp: FloodResponse, request: Request) -> Response:
+    """Serialize FloodResponse; lưu bản "cached" (cho các lần sau) theo khóa."""
+    data = resp.model_dump()
+    raw_cached = dumps({**data, "cached": True, "ee_round_trips": 0})
+    flood_bodies.set(key, raw_cached)
+    return raw_response(request, raw_cached if resp.cached else dumps(data))
+
+
+def _resolve_aoi_asset(req: FloodRequest) -> str:
     aoi_asset = req.aoi_asset or os.getenv("AOI_ASSET")
 
     if not aoi_asset:
@@ -119,95 +306,716 @@ async def flood(req: FloodRequest):
             status_code=400,
             detail="AOI asset not provided and AOI_ASSET env missing",
         )
+    return aoi_asset
+
+
+def _no_progress(stage: str):
+    pass
+
+
+async def _stage(aw, progress: Progress, *stages: str):
+    """Chờ aw xong rồi báo các stage tương ứng cho progress."""
+    out = await aw
+    for st in stages:
+        progress(st)
+    return out
+
+
+async def _flood_cached(
+    aoi_asset: str, req: FloodRequest, progress: Progress = _no_progress
+) -> FloodResponse:
+    """FloodResponse từ cache nếu có, không thì tính rồi lưu cache."""
+    params = _flood_params(aoi_asset, req)
+    key = cache_key("flood", params)
+
+    cached = await asyncio.to_thread(flood_cache.get, key)
+    if cached is not None:
+        resp = FloodResponse(**cached)
+        resp.cached = True
+        resp.ee_round_trips = 0
+        return resp
+
+    async def compute() -> FloodResponse:
+        with count_round_trips() as rt:
+            resp = await _flood_response(aoi_asset, req, rt, progress)
+
+        resp.result_key = key
+        resp.tiles = _tile_templates(key)
+
+        # polygon đầy đủ (tọa độ làm tròn GEOJSON_DECIMALS) lưu riêng; response
+        # chỉ mang bản đơn giản hóa vừa max_vertices, các mức LOD dựng sẵn ở nền
+        full = await asyncio.to_thread(round_geojson, resp.polygons_geojson)
+        resp.polygons_geojson, resp.polygons_lod = await asyncio.to_thread(
+            simplify_to_budget,
+            full,
+            params["max_vertices"],
+            tolerance_for_zoom(max(LOD_ZOOMS)),
+        )
+        resp.polygons_url = f"/flood/{key}/polygons"
+        await asyncio.to_thread(polygon_store.set, key, full)
+        _spawn(_precompute_lods(key, full))
+
+        await asyncio.to_thread(flood_requests.set, key, params)
+        await asyncio.to_thread(flood_cache.set, key, resp.model_dump())
+        return resp
+
+    # request giống hệt đang chạy dở -> chờ chung 1 tính toán
+    # (job đi sau không nhận sự kiện stage của tính toán dùng chung)
+    return await flights.do(key, compute)
+
 
+def _norm_date(s: str) -> str:
+    s = s.strip()
     try:
-        result = detect_flood(
-            aoi_asset,
-            req.pre_start,
-            req.pre_end,
-            req.event_start,
-            req.event_end,
-            req.min_diff_db if req.min_diff_db is not None else -2.0,
-            req.elev_max_m or 15,
-            req.scale_m or 30,
-        )
-
-        # ====== LẤY CÁC THỐNG KÊ DIỆN TÍCH ======
-        area_km2 = float(ee.Number(result["area_km2"]).getInfo())
-        pixel_count = int(ee.Number(result["pixel_count"]).getInfo())
-
-        area_km2_hcm = float(ee.Number(result["area_km2_hcm"]).getInfo())
-        area_km2_bd = float(ee.Number(result["area_km2_bd"]).getInfo())
-        area_km2_brvt = float(ee.Number(result["area_km2_brvt"]).getInfo())
-
-        # vector ngập & AOI merge
-        gj = to_geojson(result["vectors"])
-        aoi_gj = to_geojson(result["aoi_fc"], max_features=1)
-
-        # ====== GEOJSON RANH GIỚI TỪNG KHU (HCM / BD / BRVT / MERGED) ======
-        merged_fc = ee.FeatureCollection(ee.Feature(AOI))
-        hcm_fc = ee.FeatureCollection(ee.Feature(AOI_HCM))
-        bd_fc = ee.FeatureCollection(ee.Feature(AOI_BD))
-        brvt_fc = ee.FeatureCollection(ee.Feature(AOI_BRVT))
-
-        merged_gj = to_geojson(merged_fc, max_features=1)
-        hcm_gj = to_geojson(hcm_fc, max_features=1)
-        bd_gj = to_geojson(bd_fc, max_features=1)
-        brvt_gj = to_geojson(brvt_fc, max_features=1)
-
-        # ====== TẠO CÁC LAYER ẢNH ĐỂ WEBGIS HIỂN THỊ ======
-        flood_img = ee.Image(result["image"])
-        aoi_geom = result["aoi"]
-        thumb_size = getattr(req, "thumb_size", None) or 1024
+        return dt.date.fromisoformat(s).isoformat()
+    except ValueError:
+        return s
 
-        # 1) Ảnh composite ngập (nền tối + AOI vàng + vùng ngập xanh)
-        flood_img_vis = make_flood_map_image(flood_img, aoi_geom)
-        flood_thumb = thumb_url(
-            flood_img_vis, aoi_geom, size=thumb_size, is_mask=False
-        )
-
-        # 2) Ảnh VV pre / event / delta (dB)
-        pre_vv_db = ee.Image(result["pre_vv_db"])
-        evt_vv_db = ee.Image(result["evt_vv_db"])
-        delta_db = ee.Image(result["delta_db"])
-
-        pre_img = make_vv_image(pre_vv_db, aoi_geom)
-        evt_img = make_vv_image(evt_vv_db, aoi_geom)
-        delta_img = make_delta_image(delta_db, aoi_geom)
-
-        pre_thumb = thumb_url(pre_img, aoi_geom, size=thumb_size, is_mask=False)
-        evt_thumb = thumb_url(evt_img, aoi_geom, size=thumb_size, is_mask=False)
-        delta_thumb = thumb_url(delta_img, aoi_geom, size=thumb_size, is_mask=False)
-
-        return FloodResponse(
-            stats=FloodStats(
-                area_km2=area_km2,
-                pixel_count=pixel_count,
-                scale_m=req.scale_m or 30,
-                area_km2_hcm=area_km2_hcm,
-                area_km2_bd=area_km2_bd,
-                area_km2_brvt=area_km2_brvt,
-            ),
-            polygons_geojson=gj,
-            aoi_geojson=aoi_gj,
-            # thumbnail nhỏ (UI cũ) dùng luôn composite flood
-            thumb_url=flood_thumb,
-            # các lớp PNG cho WebGIS
-            layers=FloodMapLayers(
-                flood=flood_thumb,
-                pre_vv=pre_thumb,
-                event_vv=evt_thumb,
-                delta_db=delta_thumb,
-            ),
-            # ranh giới từng khu để hiển thị thêm overlay trên MapView
-            regions_geojson=FloodRegions(
-                merged=merged_gj,
-                hcm=hcm_gj,
-                bd=bd_gj,
-                brvt=brvt_gj,
+
+def _flood_params(aoi_asset: str, req: FloodRequest) -> dict:
+    """
+    Tham số FloodRequest đã chuẩn hóa (áp default giống detect_flood,
+    ngày về dạng ISO) -> dùng làm khóa cache.
+    """
+    return {
+        "aoi_asset": aoi_asset,
+        "pre_start": _norm_date(req.pre_start),
+        "pre_end": _norm_date(req.pre_end),
+        "event_start": _norm_date(req.event_start),
+        "event_end": _norm_date(req.event_end),
+        "min_diff_db": float(req.min_diff_db if req.min_diff_db is not None else -2.0),
+        "elev_max_m": float(req.elev_max_m or 15),
+        "scale_m": int(req.scale_m or 30),
+        "max_vertices": int(req.max_vertices),
+        "thumb_size": int(getattr(req, "thumb_size", None) or 1024),
+    }
+
+
+def _pipeline(req: FloodRequest, threshold_db: Optional[float] = None) -> FloodPipeline:
+    """FloodPipeline cho 1 FloodRequest (áp default giống detect_flood)."""
+    return FloodPipeline(
+        req.pre_start,
+        req.pre_end,
+        req.event_start,
+        req.event_end,
+        min_diff_db=req.min_diff_db if req.min_diff_db is not None else -2.0,
+        elev_max_m=req.elev_max_m or 15,
+        scale=req.scale_m or 30,
+        threshold_db=threshold_db,
+    )
+
+
+def _histogram_args(req: FloodRequest):
+    """Khóa histogram Otsu: (event_start, event_end, scale) đã chuẩn hóa."""
+    return (_norm_date(req.event_start), _norm_date(req.event_end), req.scale_m or 30)
+
+
+async def _cached_threshold(req):
+    """
+    (khóa histogram, ngưỡng Otsu từ histogram đã cache | None).
+    None -> caller thêm stage "histogram" vào getInfo rồi gọi _save_histogram.
+    """
+    hist_args = _histogram_args(req)
+    return hist_args, await asyncio.to_thread(histogram_cache.threshold, *hist_args)
+
+
+async def _save_histogram(hist_args, counts) -> float:
+    """Lưu histogram vừa lấy về cho lần sau, trả ngưỡng Otsu của nó."""
+    await asyncio.to_thread(histogram_cache.set, *hist_args, counts)
+    return otsu_from_counts(counts)
+
+
+def _flood_stats(summary: dict, scale_m: int, threshold: float) -> FloodStats:
+    """FloodStats từ kết quả getInfo của summary (stats + regional_stats)."""
+    return FloodStats(
+        area_km2=float(summary["area_km2"]),
+        pixel_count=int(summary["pixel_count"]),
+        scale_m=scale_m,
+        area_km2_hcm=float(summary["area_km2_hcm"]),
+        area_km2_bd=float(summary["area_km2_bd"]),
+        area_km2_brvt=float(summary["area_km2_brvt"]),
+        otsu_threshold_db=round(threshold, 3),
+    )
+
+
+# task nền (tải trước ảnh) – giữ tham chiếu để không bị GC giữa chừng
+_background = set()
+
+
+def _spawn(coro):
+    task = asyncio.ensure_future(coro)
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+async def _image_url(img, region, size: int) -> str:
+    """
+    Đăng ký ảnh đã visualize vào ImageStore -> URL /images/{key}.png,
+    đồng thời tải trước PNG ở nền (không chờ).
+    """
+    key = await asyncio.to_thread(image_store.register, img, region, size)
+    _spawn(_prefetch_image(key))
+    return f"/images/{key}.png"
+
+
+async def _prefetch_image(key: str):
+    try:
+        await _image_bytes(key)
+    except Exception:
+        pass  # request /images/{key}.png sẽ thử lại và báo lỗi
+
+
+async def _image_bytes(key: str) -> bytes:
+    """PNG của ảnh đã đăng ký: từ cache đĩa, không thì getThumbURL + tải 1 lần."""
+    data = await asyncio.to_thread(image_store.cache.get, key)
+    if data is not None:
+        return data
+
+    async def render() -> bytes:
+        spec = await asyncio.to_thread(image_store.spec, key)
+        if spec is None:
+            raise HTTPException(
+                status_code=404, detail="Ảnh không tồn tại hoặc đã hết hạn."
+            )
+        url = await run_ee(image_store.thumb_url, spec)
+        png = await run_http(image_store.download, url)
+        await asyncio.to_thread(image_store.cache.set, key, png)
+        return png
+
+    return await flights.do(f"image:{key}", render)
+
+
+async def _image_file(key: str):
+    """File PNG (đang mở, đọc dần) của ảnh đã đăng ký; render trước nếu chưa có."""
+    f = await asyncio.to_thread(image_store.cache.open, key)
+    if f is None:
+        await _image_bytes(key)
+        f = await asyncio.to_thread(image_store.cache.open, key)
+    if f is None:
+        raise HTTPException(status_code=500, detail="Không lưu được ảnh bản đồ.")
+    return f
+
+
+async def _flood_response(
+    aoi_asset: str,
+    req: FloodRequest,
+    rt,
+    progress: Progress = _no_progress,
+) -> FloodResponse:
+    """
+    Chạy FloodPipeline và dựng FloodResponse (đếm round-trip EE vào rt,
+    báo tiến độ các stage stats / vectors / thumbnails qua progress).
+    """
+    # ngưỡng Otsu từ histogram đã cache (cùng cửa sổ sự kiện + scale) ->
+    # EE không phải reduce lại histogram; chưa có thì lấy histogram về
+    # cùng getInfo thống kê rồi lưu cho lần chỉnh tham số sau
+    hist_args, threshold = await _cached_threshold(req)
+    pipe = _pipeline(req, threshold_db=threshold)
+
+    stages = ("stats", "regional_stats", "vectors")
+    if threshold is None:
+        stages += ("histogram",)
+    summary_ee = pipe.summary(stages)
+
+    # ====== 1 getInfo (thống kê + vector); ranh giới lấy từ RegionStore
+    #        (không gọi EE) ======
+    regions, summary = await asyncio.gather(
+        run_ee(region_store.load),
+        # thống kê + vector về cùng 1 getInfo -> 2 stage xong cùng lúc
+        _stage(run_ee(get_info, summary_ee), progress, "stats", "vectors"),
+    )
+
+    if threshold is None:
+        threshold = await _save_histogram(hist_args, summary["vv_histogram"])
+        # ảnh dùng ngưỡng hằng số -> cùng graph (cùng khóa ảnh / tile)
+        # với /report và các lần /flood sau của cùng cửa sổ
+        pipe = _pipeline(req, threshold_db=threshold)
+
+    # ====== CÁC LAYER ẢNH CHO WEBGIS: URL /images/{key}.png (PNG tải 1 lần
+    #        ở nền, cache trên đĩa) thay cho URL thumbnail EE có hạn ======
+    thumb_size = getattr(req, "thumb_size", None) or 1024
+    flood_thumb, pre_thumb, evt_thumb, delta_thumb = await _stage(
+        asyncio.gather(
+            # composite ngập (nền tối + AOI vàng + vùng ngập xanh)
+            _image_url(pipe.flood_layer, pipe.aoi, thumb_size),
+            # VV pre / event / delta (dB)
+            _image_url(pipe.vv_layers["pre_vv"], pipe.aoi, thumb_size),
+            _image_url(pipe.vv_layers["event_vv"], pipe.aoi, thumb_size),
+            _image_url(pipe.delta_layer, pipe.aoi, thumb_size),
+        ),
+        progress,
+        "thumbnails",
+    )
+
+    # vector ngập & AOI merge
+    gj = summary["polygons"]
+    aoi_gj = regions["merged"]
+
+    return FloodResponse(
+        stats=_flood_stats(summary, req.scale_m or 30, threshold),
+        polygons_geojson=gj,
+        aoi_geojson=aoi_gj,
+        # thumbnail nhỏ (UI cũ) dùng luôn composite flood
+        thumb_url=flood_thumb,
+        # các lớp PNG cho WebGIS
+        layers=FloodMapLayers(
+            flood=flood_thumb,
+            pre_vv=pre_thumb,
+            event_vv=evt_thumb,
+            delta_db=delta_thumb,
+        ),
+        # ranh giới từng khu để hiển thị thêm overlay trên MapView
+        regions_geojson=FloodRegions(
+            merged=regions["merged"],
+            hcm=regions["hcm"],
+            bd=regions["bd"],
+            brvt=regions["brvt"],
+        ),
+        ee_round_trips=rt.count,
+    )
+
+
+def _tile_templates(result_key: str) -> dict:
+    tiles = {
+        layer: f"/tiles/{layer}/{result_key}/{{z}}/{{x}}/{{y}}.png"
+        for layer in TILE_LAYERS
+    }
+    # polygon ngập dạng vector tile (MVT, layer "flood")
+    tiles["polygons"] = f"/mvt/{result_key}/{{z}}/{{x}}/{{y}}.pbf"
+    return tiles
+
+
+@app.get("/tiles/{layer}/{result_key}/{z}/{x}/{y}.png")
+async def flood_tile(layer: str, result_key: str, z: int, x: int, y: int):
+    """
+    Tile XYZ (PNG 256x256) của 1 lớp ảnh cho kết quả /flood có result_key.
+    Tile đã tải nằm trong cache đĩa; lần đầu dựng map id EE cho lớp đó.
+    """
+    if layer not in TILE_LAYERS or not valid_tile(z, x, y):
+        raise HTTPException(status_code=404, detail="Tile không tồn tại.")
+
+    key = tile_key(layer, result_key, z, x, y)
+    data = await asyncio.to_thread(tile_cache.get, key)
+    if data is None:
+        try:
+            data = await flights.do(
+                f"tile:{key}", lambda: _render_tile(layer, result_key, z, x, y)
+            )
+        except HTTPException:
+            raise
+        except EEException as e:
+            raise HTTPException(
+                status_code=502, detail=f"Earth Engine error (tile): {str(e)}"
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=502, detail=f"Không tải được tile: {str(e)}"
+            )
+
+    return Response(
+        content=data,
+        media_type="image/png",
+        headers={"Cache-Control": "public, max-age=86400"},
+    )
+
+
+async def _render_tile(layer: str, result_key: str, z: int, x: int, y: int) -> bytes:
+    tf = tile_source.cached_fetcher(layer, result_key)
+    if tf is None:
+        params = await asyncio.to_thread(flood_requests.get, result_key)
+        if params is None:
+            raise HTTPException(
+                status_code=404,
+                detail="result_key không tồn tại hoặc đã hết hạn (gọi lại /flood).",
+            )
+        req = FloodRequest(**params)
+        _, threshold = await _cached_threshold(req)
+        pipe = _pipeline(req, threshold_db=threshold)
+
+        # nhiều tile cùng lớp tới cùng lúc -> chỉ 1 getMapId
+        tf = await flights.do(
+            f"mapid:{layer}:{result_key}",
+            lambda: run_ee(
+                tile_source.fetcher, layer, result_key, lambda: pipe.layer(layer)
             ),
         )
 
+    data = await run_http(tile_source.fetch, tf, z, x, y)
+    await asyncio.to_thread(tile_cache.set, tile_key(layer, result_key, z, x, y), data)
+    return data
+
+
+@app.get("/mvt/{result_key}/{z}/{x}/{y}.pbf")
+async def flood_mvt(result_key: str, z: int, x: int, y: int):
+    """
+    Vector tile (MVT v2, layer "flood") polygon ngập của kết quả /flood có
+    result_key: đơn giản hóa theo mức LOD của zoom, cắt theo khung tile.
+    Tile không có polygon -> body rỗng.
+    """
+    if not valid_tile(z, x, y):
+        raise HTTPException(status_code=404, detail="Tile không tồn tại.")
+
+    key = mvt_key(result_key, z, x, y)
+    data = await asyncio.to_thread(mvt_cache.get, key)
+    if data is None:
+        data = await flights.do(f"mvt:{key}", lambda: _render_mvt(result_key, z, x, y))
+
+    return Response(
+        content=data,
+        media_type="application/vnd.mapbox-vector-tile",
+        headers={"Cache-Control": "public, max-age=86400"},
+    )
+
+
+async def _mvt_geometry(result_key: str, z: int) -> TileGeometry:
+    """Polygon mức LOD của zoom đã chiếu sẵn (dựng 1 lần cho mọi tile cùng mức)."""
+    level = lod_level(z)
+    geo = mvt_source.cached(result_key, level)
+    if geo is not None:
+        return geo
+
+    async def build() -> TileGeometry:
+        full = await asyncio.to_thread(polygon_store.get, result_key)
+        if full is None:
+            raise HTTPException(
+                status_code=404,
+                detail="result_key không tồn tại hoặc đã hết hạn (gọi lại /flood).",
+            )
+        fc = full
+        if level is not None:
+            fc = await asyncio.to_thread(
+                simplify_features, full, tolerance_for_zoom(level)
+            )
+        return await asyncio.to_thread(mvt_source.build, result_key, level, fc)
+
+    return await flights.do(f"mvtsrc:{result_key}:{level}", build)
+
+
+async def _render_mvt(result_key: str, z: int, x: int, y: int) -> bytes:
+    geo = await _mvt_geometry(result_key, z)
+    data = await asyncio.to_thread(geo.tile, z, x, y)
+    await asyncio.to_thread(mvt_cache.set, mvt_key(result_key, z, x, y), data)
+    return data
+
+
+def _lod_key(result_key: str, level, max_vertices: int) -> str:
+    return cache_key(
+        "lod", {"result_key": result_key, "level": level, "max_vertices": max_vertices}
+    )
+
+
+async def _precompute_lods(result_key: str, full: dict):
+    try:
+        lods = await asyncio.to_thread(build_lods, full, LOD_MAX_VERTICES)
+        for level, (fc, info) in lods.items():
+            await asyncio.to_thread(
+                lod_cache.set,
+                _lod_key(result_key, int(level), LOD_MAX_VERTICES),
+                {**fc, "lod": {**info, "level": int(level)}},
+            )
+    except Exception:
+        pass  # endpoint /polygons tự dựng lại mức cần khi chưa có
+
+
+@app.get("/flood/{result_key}/polygons")
+async def flood_polygons(
+    request: Request,
+    result_key: str,
+    zoom: float = 10,
+    max_vertices: int = LOD_MAX_VERTICES,
+):
+    """
+    Polygon ngập của 1 kết quả /flood ở mức chi tiết hợp với zoom bản đồ:
+    Douglas–Peucker với dung sai ~1 pixel màn hình ở mức LOD (LOD_ZOOMS)
+    gần nhất <= zoom, ép tổng số đỉnh <= max_vertices. Zoom vượt mức mịn
+    nhất -> gần như đầy đủ (chỉ bỏ đỉnh thẳng hàng), vẫn theo max_vertices.
+    """
+    if not 0 <= zoom <= 22 or not 100 <= max_vertices <= 1_000_000:
+        raise HTTPException(
+            status_code=400,
+            detail="zoom phải trong [0, 22], max_vertices trong [100, 1000000]",
+        )
+
+    level = lod_level(zoom)
+    key = _lod_key(result_key, level if level is not None else "full", max_vertices)
+    cached = await asyncio.to_thread(lod_cache.get, key)
+    if cached is not None:
+        return await asyncio.to_thread(json_response, request, cached)
+
+    async def compute():
+        full = await asyncio.to_thread(polygon_store.get, result_key)
+        if full is None:
+            raise HTTPException(
+                status_code=404,
+                detail="result_key không tồn tại hoặc đã hết hạn (gọi lại /flood).",
+            )
+        tol = tolerance_for_zoom(level) if level is not None else COLLINEAR_TOL
+        fc, info = await asyncio.to_thread(simplify_to_budget, full, max_vertices, tol)
+        out = {**fc, "lod": {**info, "level": level}}
+        await asyncio.to_thread(lod_cache.set, key, out)
+        return out
+
+    out = await flights.do(key, compute)
+    return await asyncio.to_thread(json_response, request, out)
+
+
+async def _flood_index(result_key: str) -> FloodIndex:
+    """Chỉ mục không gian polygon đầy đủ của result_key (dựng 1 lần)."""
+    idx = index_store.get(result_key)
+    if idx is not None:
+        return idx
+
+    async def build() -> FloodIndex:
+        full = await asyncio.to_thread(polygon_store.get, result_key)
+        if full is None:
+            raise HTTPException(
+                status_code=404,
+                detail="result_key không tồn tại hoặc đã hết hạn (gọi lại /flood).",
+            )
+        return await asyncio.to_thread(index_store.build, result_key, full)
+
+    return await flights.do(f"index:{result_key}", build)
+
+
+@app.post("/flood/{result_key}/query/points", response_model=FloodPointQueryResponse)
+async def flood_query_points(result_key: str, req: FloodPointQuery):
+    """
+    Điểm nào nằm trong vùng ngập của kết quả /flood (theo lô, tối đa
+    QUERY_MAX_POINTS điểm [lon, lat] mỗi lần gọi).
+    """
+    if not 0 < len(req.points) <= QUERY_MAX_POINTS:
+        raise HTTPException(
+            status_code=400, detail=f"Cần 1..{QUERY_MAX_POINTS} điểm [lon, lat]"
+        )
+    if any(len(p) != 2 for p in req.points):
+        raise HTTPException(status_code=400, detail="Mỗi điểm phải là [lon, lat]")
+    pts = np.asarray(req.points, dtype=float)
+    if not (
+        np.isfinite(pts).all()
+        and (np.abs(pts[:, 0]) <= 180).all()
+        and (np.abs(pts[:, 1]) <= 90).all()
+    ):
+        raise HTTPException(status_code=400, detail="Tọa độ [lon, lat] không hợp lệ")
+
+    idx = await _flood_index(result_key)
+    t0 = time.perf_counter()
+    found = await asyncio.to_thread(idx.points, pts)
+    query_ms = (time.perf_counter() - t0) * 1000
+
+    flooded = found >= 0
+    return FloodPointQueryResponse(
+        flooded=flooded.tolist(),
+        feature_ids=[int(f) if f >= 0 else None for f in found.tolist()],
+        flooded_count=int(flooded.sum()),
+        query_ms=round(query_ms, 3),
+    )
+
+
+@app.post("/flood/{result_key}/query/bbox", response_model=FloodBBoxQueryResponse)
+async def flood_query_bbox(result_key: str, req: FloodBBoxQuery):
+    """
+    Với mỗi bbox [minLon, minLat, maxLon, maxLat]: diện tích ngập nằm
+    trong bbox (km²) + các feature ngập giao với bbox.
+    """
+    if not 0 < len(req.bboxes) <= QUERY_MAX_BBOXES:
+        raise HTTPException(
+            status_code=400, detail=f"Cần 1..{QUERY_MAX_BBOXES} bbox"
+        )
+    if any(len(b) != 4 for b in req.bboxes):
+        raise HTTPException(
+            status_code=400, detail="Mỗi bbox phải là [minLon, minLat, maxLon, maxLat]"
+        )
+    boxes = np.asarray(req.bboxes, dtype=float)
+    if not (
+        np.isfinite(boxes).all()
+        and (boxes[:, 0] <= boxes[:, 2]).all()
+        and (boxes[:, 1] <= boxes[:, 3]).all()
+    ):
+        raise HTTPException(status_code=400, detail="bbox không hợp lệ")
+
+    idx = await _flood_index(result_key)
+    t0 = time.perf_counter()
+    results = await asyncio.to_thread(idx.bboxes, boxes)
+    query_ms = (time.perf_counter() - t0) * 1000
+
+    return FloodBBoxQueryResponse(
+        results=[
+            FloodBBoxResult(
+                bbox=b,
+                flooded_area_km2=round(r["flooded_area_km2"], 6),
+                feature_count=len(r["feature_ids"]),
+                feature_ids=r["feature_ids"],
+            )
+            for b, r in zip(req.bboxes, results)
+        ],
+        query_ms=round(query_ms, 3),
+    )
+
+
+@app.get("/images/{key}.png")
+async def layer_image(key: str, request: Request):
+    """
+    PNG của 1 lớp ảnh đã dựng (khóa = hash graph ảnh + size): tải từ EE
+    1 lần rồi phục vụ từ cache đĩa. Nội dung theo khóa không đổi ->
+    ETag = khóa, cache phía trình duyệt dài hạn.
+    """
+    etag = f'"{key}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "public, max-age=31536000, immutable",
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    try:
+        data = await _image_bytes(key)
+    except HTTPException:
+        raise
+    except EEException as e:
+        raise HTTPException(
+            status_code=502, detail=f"Earth Engine error (image): {str(e)}"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=502, detail=f"Không tải được ảnh: {str(e)}"
+        )
+
+    return Response(content=data, media_type="image/png", headers=headers)
+
+
+@app.post("/flood/preview", response_model=FloodPreviewResponse)
+async def flood_preview(
+    req: FloodRequest,
+    scale_m: int = PREVIEW_SCALE_M,
+    full: bool = True,
+):
+    """
+    Xem nhanh: stats + thumbnail ngập ở scale thô (mặc định 250 m),
+    1 getInfo + 1 getThumbURL, cache riêng với /flood.
+    full=True -> đồng thời submit job /flood ở req.scale_m (dùng lại job
+    cùng tham số nếu đang chạy / đã xong); kết quả đầy đủ lấy ở
+    /jobs/{id}/result (hoặc nghe /jobs/{id}/events).
+    """
+    aoi_asset = _resolve_aoi_asset(req)
+    if not 30 <= scale_m <= 2000:
+        raise HTTPException(status_code=400, detail="scale_m phải trong [30, 2000]")
+
+    preview_req = req.model_copy(
+        update={
+            "scale_m": scale_m,
+            "thumb_size": min(req.thumb_size or 1024, PREVIEW_THUMB_SIZE),
+        }
+    )
+
+    # job đầy đủ chạy song song với bản xem nhanh
+    full_job = None
+    if full:
+        # kéo slider / gọi lại cùng sự kiện -> không tạo job trùng
+        job = jobs.find("flood", req.model_dump()) or _submit_flood_job(aoi_asset, req)
+        full_job = _job_status(job)
+
+    try:
+        resp = await _preview_cached(aoi_asset, preview_req)
+    except EEException as e:
+        return JSONResponse(
+            status_code=502,
+            content={"detail": f"Earth Engine error: {str(e)}"},
+        )
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"detail": f"Internal server error: {str(e)}"},
+        )
+
+    # resp có thể là object dùng chung (single-flight / cache) -> không sửa tại chỗ
+    return resp.model_copy(update={"full_job": full_job})
+
+
+async def _preview_cached(aoi_asset: str, req: FloodRequest) -> FloodPreviewResponse:
+    key = cache_key("preview", _flood_params(aoi_asset, req))
+
+    cached = await asyncio.to_thread(preview_cache.get, key)
+    if cached is not None:
+        resp = FloodPreviewResponse(**cached)
+        resp.cached = True
+        resp.ee_round_trips = 0
+        return resp
+
+    async def compute() -> FloodPreviewResponse:
+        with count_round_trips() as rt:
+            hist_args, threshold = await _cached_threshold(req)
+            pipe = _pipeline(req, threshold_db=threshold)
+
+            stages = ("stats", "regional_stats")
+            if threshold is None:
+                stages += ("histogram",)
+
+            summary = await run_ee(get_info, pipe.summary(stages))
+            if threshold is None:
+                threshold = await _save_histogram(hist_args, summary["vv_histogram"])
+                pipe = _pipeline(req, threshold_db=threshold)
+            thumb = await _image_url(pipe.flood_layer, pipe.aoi, req.thumb_size)
+
+        resp = FloodPreviewResponse(
+            stats=_flood_stats(summary, req.scale_m, threshold),
+            thumb_url=thumb,
+            ee_round_trips=rt.count,
+        )
+        await asyncio.to_thread(preview_cache.set, key, resp.model_dump())
+        return resp
+
+    return await flights.do(key, compute)
+
+
+@app.post("/flood/sweep", response_model=FloodSweepResponse)
+async def flood_sweep(req: FloodSweepRequest):
+    """
+    Diện tích / số pixel ngập cho mọi tổ hợp min_diff_db x elev_max_m
+    của 1 sự kiện, tính trong 1 reduceRegion trên ảnh nhiều band
+    (thay cho gọi /flood lặp lại từng giá trị).
+    """
+    min_diffs = sorted({float(v) for v in req.min_diff_db})
+    elevs = sorted({float(v) for v in req.elev_max_m})
+    if not min_diffs or not elevs:
+        raise HTTPException(
+            status_code=400, detail="min_diff_db và elev_max_m không được rỗng"
+        )
+    if len(min_diffs) * len(elevs) > SWEEP_MAX_COMBOS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Tối đa {SWEEP_MAX_COMBOS} tổ hợp min_diff_db x elev_max_m",
+        )
+
+    key = cache_key(
+        "sweep",
+        {
+            "pre_start": _norm_date(req.pre_start),
+            "pre_end": _norm_date(req.pre_end),
+            "event_start": _norm_date(req.event_start),
+            "event_end": _norm_date(req.event_end),
+            "min_diff_db": min_diffs,
+            "elev_max_m": elevs,
+            "scale_m": int(req.scale_m or 30),
+        },
+    )
+
+    try:
+        cached = await asyncio.to_thread(flood_cache.get, key)
+        if cached is not None:
+            resp = FloodSweepResponse(**cached)
+            resp.cached = True
+            resp.ee_round_trips = 0
+            return resp
+
+        async def compute() -> FloodSweepResponse:
+            with count_round_trips() as rt:
+                resp = await _sweep_response(req, min_diffs, elevs)
+            resp.ee_round_trips = rt.count
+            await asyncio.to_thread(flood_cache.set, key, resp.model_dump())
+            return resp
+
+        return await flights.do(key, compute)
+
     except EEException as e:
         return JSONResponse(
             status_code=502,
@@ -220,24 +1028,88 @@ async def flood(req: FloodRequest):
         )
 
 
+async def _sweep_response(
+    req: FloodSweepRequest, min_diffs: List[float], elevs: List[float]
+) -> FloodSweepResponse:
+    """1 getInfo cho cả lưới (kèm histogram Otsu nếu chưa có trong cache)."""
+    hist_args, threshold = await _cached_threshold(req)
+
+    pipe = FloodPipeline(
+        req.pre_start,
+        req.pre_end,
+        req.event_start,
+        req.event_end,
+        scale=req.scale_m or 30,
+        threshold_db=threshold,
+    )
+    out_ee = ee.Dictionary({"sweep": pipe.sweep(min_diffs, elevs)})
+    if threshold is None:
+        out_ee = out_ee.set("vv_histogram", pipe.histogram)
+
+    out = await run_ee(get_info, out_ee)
+
+    if threshold is None:
+        threshold = await _save_histogram(hist_args, out["vv_histogram"])
+
+    combos = [(d, e) for d in min_diffs for e in elevs]
+    grid = [
+        FloodSweepCell(
+            min_diff_db=d,
+            elev_max_m=e,
+            area_km2=float(a),
+            pixel_count=int(p),
+        )
+        for (d, e), a, p in zip(
+            combos, out["sweep"]["area_km2"], out["sweep"]["pixel_count"]
+        )
+    ]
+    return FloodSweepResponse(
+        min_diff_db=min_diffs,
+        elev_max_m=elevs,
+        grid=grid,
+        scale_m=req.scale_m or 30,
+        otsu_threshold_db=round(threshold, 3),
+    )
+
+
 # ==================== CHUỖI THỜI GIAN NGẬP =================
 
 
 @app.get("/flood/timeseries")
-async def flood_timeseries():
+async def flood_timeseries(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    years: Optional[int] = None,
+    max_points: Optional[int] = None,
+    downsample: str = "lttb",
+):
+    """
+    Chuỗi diện tích ngập từ cache 10 năm.
+    - start / end (YYYY-MM-DD): lọc khoảng ngày (bao gồm 2 đầu).
+    - years: nếu không có start -> chỉ lấy N năm gần nhất.
+    - max_points: giảm số điểm trả về (downsample = "lttb" | "minmax").
+    """
     try:
-        if not TIMESERIES_CACHE_PATH.exists():
-            raise HTTPException(
-                status_code=500,
-                detail=(
-                    "Timeseries cache chưa tồn tại. "
-                    "Hãy chạy script precompute_timeseries.py để tạo file."
-                ),
-            )
+        start_d = dt.date.fromisoformat(start) if start else None
+        end_d = dt.date.fromisoformat(end) if end else None
+    except ValueError:
+        raise HTTPException(
+            status_code=400, detail="start/end phải có dạng YYYY-MM-DD"
+        )
+    if downsample not in ("lttb", "minmax"):
+        raise HTTPException(
+            status_code=400, detail="downsample phải là 'lttb' hoặc 'minmax'"
+        )
+    if max_points is not None and max_points < 2:
+        raise HTTPException(status_code=400, detail="max_points phải >= 2")
 
-        with open(TIMESERIES_CACHE_PATH, "r", encoding="utf-8") as f:
-            data = json.load(f)
+    try:
+        if not timeseries_store.exists():
+            raise _timeseries_missing()
 
+        data = await asyncio.to_thread(
+            _query_timeseries, start_d, end_d, years, max_points, downsample
+        )
         return {"data": data}
 
     except HTTPException:
@@ -249,6 +1121,21 @@ async def flood_timeseries():
         )
 
 
+def _query_timeseries(start_d, end_d, years, max_points, downsample):
+    if start_d is None and years:
+        start_d = timeseries_store.cutoff_for_years(years)
+
+    cols = timeseries_store.window(start_d, end_d)
+    if not max_points or len(cols.records) <= max_points:
+        return cols.records
+
+    if downsample == "minmax":
+        idx = minmax_indices(cols.area_km2, max_points)
+    else:
+        idx = lttb_indices(cols.ordinals, cols.area_km2, max_points)
+    return [cols.records[i] for i in idx]
+
+
 # ========================= LƯỢNG MƯA ========================
 
 
@@ -259,7 +1146,8 @@ async def rainfall(
     scale_m: int = 5000,
 ):
     try:
-        data = rainfall_timeseries(
+        data = await run_ee(
+            rainfall_store.get_series,
             start_date=start,
             end_date=end,
             scale=scale_m,
@@ -284,41 +1172,52 @@ async def rainfall(
 async def correlation(
     years: int = 5,
     rainfall_scale_m: int = 5000,
+    max_lag_days: int = 10,
+    windows: List[int] = Query(default=[1, 3, 7, 14]),
+    method: str = "pearson",
 ):
-    try:
-        if not TIMESERIES_CACHE_PATH.exists():
-            raise HTTPException(
-                status_code=500,
-                detail=(
-                    "Timeseries cache chưa tồn tại. "
-                    "Hãy chạy script precompute_timeseries.py để tạo file."
-                ),
-            )
-
-        with open(TIMESERIES_CACHE_PATH, "r", encoding="utf-8") as f:
-            all_series = json.load(f)
-
-        if not isinstance(all_series, list) or not all_series:
-            return {"data": [], "corr": None}
-
-        all_series_sorted = sorted(all_series, key=lambda r: r["date"])
+    """
+    Tương quan mưa – ngập:
+    - data / corr: mưa cùng ngày (giữ cho UI cũ).
+    - lagged: lưới Pearson/Spearman theo lag 0..max_lag_days và mưa tích lũy
+      `windows` ngày, kèm cặp (lag, window) tốt nhất theo `method`.
+    """
+    if method not in ("pearson", "spearman"):
+        raise HTTPException(
+            status_code=400, detail="method phải là 'pearson' hoặc 'spearman'"
+        )
+    if (
+        not 0 <= max_lag_days <= 60
+        or not windows
+        or min(windows) < 1
+        or max(windows) > 90
+    ):
+        raise HTTPException(
+            status_code=400,
+            detail="max_lag_days phải trong [0, 60], windows trong [1, 90]",
+        )
 
-        if years and years > 0:
-            last_date = dt.date.fromisoformat(all_series_sorted[-1]["date"])
-            cutoff = last_date - dt.timedelta(days=365 * years)
-            flood_series = [
-                rec
-                for rec in all_series_sorted
-                if dt.date.fromisoformat(rec["date"]) >= cutoff
-            ]
-        else:
-            flood_series = all_series_sorted
+    try:
+        if not timeseries_store.exists():
+            raise _timeseries_missing()
 
-        result = flood_rain_correlation_from_cached(
-            flood_series=flood_series,
-            rainfall_scale=rainfall_scale_m,
+        # request giống hệt đang chạy dở -> dùng chung 1 tính toán
+        key = cache_key(
+            "correlation",
+            {
+                "years": years,
+                "rainfall_scale_m": rainfall_scale_m,
+                "max_lag_days": max_lag_days,
+                "windows": sorted(set(windows)),
+                "method": method,
+            },
+        )
+        return await flights.do(
+            key,
+            lambda: _correlation_result(
+                years, rainfall_scale_m, max_lag_days, windows, method
+            ),
         )
-        return result
 
     except HTTPException:
         raise
@@ -334,6 +1233,37 @@ async def correlation(
         )
 
 
+async def _correlation_result(years, rainfall_scale_m, max_lag_days, windows, method):
+    """Chuỗi ngập N năm + mưa CHIRPS (qua cache) -> tương quan cùng ngày + theo lag."""
+    flood_series = await asyncio.to_thread(timeseries_store.last_years, years)
+    if not flood_series:
+        return {"data": [], "corr": None}
+
+    # mưa phủ cả phần lùi về trước (lag + cửa sổ tích lũy) của mốc đầu
+    first = dt.date.fromisoformat(flood_series[0]["date"])
+    last = dt.date.fromisoformat(flood_series[-1]["date"])
+    lookback = dt.timedelta(days=max_lag_days + max(windows) - 1)
+    rain_series = await run_ee(
+        rainfall_store.get_series,
+        start_date=(first - lookback).isoformat(),
+        end_date=(last + dt.timedelta(days=1)).isoformat(),
+        scale=rainfall_scale_m,
+    )
+    result = flood_rain_correlation_from_cached(
+        flood_series=flood_series,
+        rainfall_scale=rainfall_scale_m,
+        rain_series=rain_series,
+    )
+    result["lagged"] = lagged_rain_correlation(
+        flood_series,
+        rain_series,
+        max_lag_days=max_lag_days,
+        windows=windows,
+        method=method,
+    )
+    return result
+
+
 # ================= DỰ BÁO MƯA & CẢNH BÁO NGẬP ================
 
 
@@ -341,99 +1271,12 @@ async def correlation(
 async def get_flood_risk_forecast():
     """
     Dự báo nguy cơ ngập dựa trên lượng mưa dự báo 5 ngày (3h forecast) của OpenWeather.
+    Kết quả đã gộp theo ngày được cache (FORECAST_TTL_S) và làm mới ở nền.
     """
-    if not OPENWEATHER_API_KEY:
-        raise HTTPException(
-            status_code=500,
-            detail="OPENWEATHER_API_KEY chưa được cấu hình trong biến môi trường.",
-        )
-
     try:
-        url = "https://api.openweathermap.org/data/2.5/forecast"
-        params = {
-            "lat": HCM_LAT,
-            "lon": HCM_LON,
-            "appid": OPENWEATHER_API_KEY,
-            "units": "metric",  # nhiệt độ °C, mưa mm
-        }
-
-        resp = requests.get(url, params=params, timeout=15)
-        resp.raise_for_status()
-        data = resp.json()
-    except Exception as e:
-        raise HTTPException(
-            status_code=502,
-            detail=f"Không gọi được OpenWeather forecast: {e}",
-        )
-
-    # list: các bước dự báo 3h
-    items = data.get("list", [])
-    if not items:
-        raise HTTPException(
-            status_code=500,
-            detail="Không có dữ liệu forecast từ OpenWeather.",
-        )
-
-    # Gộp mưa theo ngày (giờ VN UTC+7)
-    daily_rain: dict[str, float] = {}
-    TZ_OFFSET_HOURS = 7
-
-    for it in items:
-        try:
-            ts = it.get("dt")
-            if ts is None:
-                continue
-
-            dt_utc = dt.datetime.utcfromtimestamp(ts)
-            dt_local = dt_utc + dt.timedelta(hours=TZ_OFFSET_HOURS)
-            date_str = dt_local.date().isoformat()
-
-            rain_3h = it.get("rain", {}).get("3h", 0.0)
-            rain_val = float(rain_3h) if rain_3h is not None else 0.0
-        except Exception:
-            continue
-
-        daily_rain[date_str] = daily_rain.get(date_str, 0.0) + rain_val
-
-    if not daily_rain:
-        raise HTTPException(
-            status_code=500,
-            detail="Không gom được lượng mưa theo ngày từ OpenWeather.",
-        )
-
-    # Sắp xếp ngày, chỉ lấy khoảng 7 ngày đầu cho UI
-    sorted_dates = sorted(daily_rain.keys())
-    raw_daily = [
-        {"date": d, "rain_mm": round(daily_rain[d], 2)}
-        for d in sorted_dates[:7]
-    ]
-
-    # Tổng mưa 3 ngày & 5 ngày
-    rain_3d = round(sum(r["rain_mm"] for r in raw_daily[:3]), 2)
-    rain_5d = round(sum(r["rain_mm"] for r in raw_daily[:5]), 2)
-
-    risk_level = classify_risk(rain_3d)
-
-    city = data.get("city", {})
-    location_name = city.get("name") or "TP.HCM (xấp xỉ tâm vùng)"
-
-    result = {
-        "location": {
-            "name": location_name,
-            "lat": HCM_LAT,
-            "lon": HCM_LON,
-        },
-        "rain_3d_mm": rain_3d,
-        "rain_5d_mm": rain_5d,
-        "risk_level": risk_level,
-        "thresholds": {
-            "rain_3d_medium": RAIN_3D_MEDIUM,
-            "rain_3d_high": RAIN_3D_HIGH,
-        },
-        "raw_daily": raw_daily,
-    }
-
-    return result
+        return await forecast_service.get()
+    except ForecastError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
 
 
 # ====================== BÁO CÁO ZIP =========================
@@ -447,197 +1290,290 @@ async def create_report(
 ):
     """
     Tạo 1 file ZIP gồm:
-      - flood_map.png        : ảnh bản đồ ngập (nền tối + ranh giới AOI vàng + vùng ngập xanh)
       - flood_timeseries.csv : chuỗi diện tích ngập (dùng cache 10 năm, lọc N năm gần nhất)
       - rainfall.csv         : chuỗi lượng mưa tương ứng (CHIRPS)
+      - flood_map.png        : ảnh bản đồ ngập (nền tối + ranh giới AOI vàng + vùng ngập xanh)
       - metadata.json        : thông tin sự kiện hiện tại
+    Dữ liệu lấy xong trước (lỗi EE -> 502), sau đó ZIP được stream.
     """
-    # ========= 1. Ảnh bản đồ ngập từ GEE =========
-    aoi_asset = req.aoi_asset or os.getenv("AOI_ASSET")
-    if not aoi_asset:
-        raise HTTPException(
-            status_code=400,
-            detail="AOI asset not provided and AOI_ASSET env missing",
-        )
-
-    try:
-        # chạy detect_flood giống endpoint /flood
-        result = detect_flood(
-            aoi_asset,
-            req.pre_start,
-            req.pre_end,
-            req.event_start,
-            req.event_end,
-            req.min_diff_db if req.min_diff_db is not None else -2.0,
-            req.elev_max_m or 15,
-            req.scale_m or 30,
-        )
+    aoi_asset = _resolve_aoi_asset(req)
+    chunks, filename = await _build_report(aoi_asset, req, years, rainfall_scale_m)
 
-        # thống kê sự kiện hiện tại (tổng vùng merge)
-        area_km2 = float(ee.Number(result["area_km2"]).getInfo())
-        pixel_count = int(ee.Number(result["pixel_count"]).getInfo())
-
-        # flood mask & AOI geometry
-        flood_img = ee.Image(result["image"])
-        aoi_geom = result["aoi"]
-
-        # tạo ảnh composite (nền tối + AOI border vàng + flood xanh)
-        map_img = make_flood_map_image(flood_img, aoi_geom)
+    return StreamingResponse(
+        chunks,
+        media_type="application/x-zip-compressed",
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"'
+        },
+    )
 
-        # size lấy từ req.thumb_size nếu có, mặc định 1024
-        thumb_size = getattr(req, "thumb_size", None) or 1024
 
-        # lấy URL PNG từ GEE (img đã visualize, nên is_mask=False)
-        thumb = thumb_url(map_img, aoi_geom, size=thumb_size, is_mask=False)
+REPORT_FLOOD_FIELDS = [
+    "date",
+    "area_km2",
+    "pixel_count",
+    "pre_start",
+    "pre_end",
+    "event_start",
+    "event_end",
+]
+REPORT_RAIN_FIELDS = ["date", "rain_mm"]
 
-        # tải PNG về backend
-        resp = requests.get(thumb, timeout=60)
-        resp.raise_for_status()
-        flood_png = resp.content
 
-    except EEException as e:
-        return JSONResponse(
-            status_code=502,
-            content={"detail": f"Earth Engine error (flood/report): {str(e)}"},
-        )
-    except Exception as e:
-        return JSONResponse(
-            status_code=500,
-            content={"detail": f"Internal server error (flood/report): {str(e)}"},
-        )
+async def _build_report(
+    aoi_asset: str,
+    req: FloodRequest,
+    years: int,
+    rainfall_scale_m: int,
+    progress: Progress = _no_progress,
+):
+    """
+    Chuẩn bị báo cáo ZIP -> (async iterator các chunk bytes, filename).
 
-    # ========= 2. Chuỗi ngập từ cache 10 năm =========
+    Chuỗi ngập (cache cục bộ), ảnh bản đồ và mưa CHIRPS (chạy song song)
+    đều xong TRƯỚC khi trả về -> lỗi EE ném ra dạng HTTPException (502)
+    trước byte đầu tiên, không bao giờ gửi ZIP hỏng với status 200. PNG
+    bản đồ đọc dần từ cache ảnh trên đĩa, ZIP được stream (bộ nhớ cỡ
+    1 chunk).
+    """
+    # ========= 1. Chuỗi ngập từ cache 10 năm =========
     try:
-        if not TIMESERIES_CACHE_PATH.exists():
-            raise HTTPException(
-                status_code=500,
-                detail=(
-                    "Timeseries cache chưa tồn tại. "
-                    "Hãy chạy script precompute_timeseries.py để tạo file."
-                ),
-            )
-
-        with open(TIMESERIES_CACHE_PATH, "r", encoding="utf-8") as f:
-            all_series = json.load(f)
+        if not timeseries_store.exists():
+            raise _timeseries_missing()
 
-        if not isinstance(all_series, list) or not all_series:
+        flood_series = await asyncio.to_thread(timeseries_store.last_years, years)
+        if not flood_series:
             raise HTTPException(
                 status_code=500,
                 detail="Timeseries cache rỗng hoặc sai định dạng.",
             )
-
-        all_series_sorted = sorted(all_series, key=lambda r: r["date"])
-
-        if years and years > 0:
-            last_date = dt.date.fromisoformat(all_series_sorted[-1]["date"])
-            cutoff = last_date - dt.timedelta(days=365 * years)
-            flood_series = [
-                rec
-                for rec in all_series_sorted
-                if dt.date.fromisoformat(rec["date"]) >= cutoff
-            ]
-        else:
-            flood_series = all_series_sorted
-
-        # Chuẩn bị khoảng thời gian cho CHIRPS
-        dates = [dt.date.fromisoformat(rec["date"]) for rec in flood_series]
-        start_date = min(dates).isoformat()
-        end_date = max(dates).isoformat()
-
-        # ========= 3. Chuỗi mưa CHIRPS =========
-        rain_series = rainfall_timeseries(
-            start_date=start_date,
-            end_date=end_date,
-            scale=rainfall_scale_m,
-        )
-
+        progress("timeseries")
     except HTTPException:
         raise
-    except EEException as e:
-        return JSONResponse(
-            status_code=502,
-            content={"detail": f"Earth Engine error (rainfall/report): {str(e)}"},
-        )
     except Exception as e:
-        return JSONResponse(
+        raise HTTPException(
             status_code=500,
-            content={"detail": f"Internal server error (timeseries/report): {str(e)}"},
-        )
-
-    # ========= 4. Tạo CSV trong bộ nhớ =========
-    # 4.1 flood_timeseries.csv
-    flood_output = io.StringIO()
-    flood_fields = [
-        "date",
-        "area_km2",
-        "pixel_count",
-        "pre_start",
-        "pre_end",
-        "event_start",
-        "event_end",
-    ]
-    flood_writer = csv.DictWriter(flood_output, fieldnames=flood_fields)
-    flood_writer.writeheader()
-    for row in flood_series:
-        flood_writer.writerow(
-            {
-                "date": row.get("date"),
-                "area_km2": row.get("area_km2"),
-                "pixel_count": row.get("pixel_count"),
-                "pre_start": row.get("pre_start"),
-                "pre_end": row.get("pre_end"),
-                "event_start": row.get("event_start"),
-                "event_end": row.get("event_end"),
-            }
-        )
-    flood_csv_bytes = flood_output.getvalue().encode("utf-8")
-
-    # 4.2 rainfall.csv
-    rain_output = io.StringIO()
-    rain_fields = ["date", "rain_mm"]
-    rain_writer = csv.DictWriter(rain_output, fieldnames=rain_fields)
-    rain_writer.writeheader()
-    for row in rain_series:
-        rain_writer.writerow(
-            {
-                "date": row.get("date"),
-                "rain_mm": row.get("rain_mm"),
-            }
+            detail=f"Internal server error (timeseries/report): {str(e)}",
         )
-    rain_csv_bytes = rain_output.getvalue().encode("utf-8")
 
-    # 4.3 metadata.json (thông tin sự kiện hiện tại)
+    # ========= 2. Ảnh bản đồ + mưa CHIRPS song song, xong hết rồi mới stream =========
+    map_task = asyncio.ensure_future(_report_map(req, progress))
+    rain_task = asyncio.ensure_future(
+        _report_rainfall(flood_series, rainfall_scale_m, progress)
+    )
+    try:
+        m, rain_series = await asyncio.gather(map_task, rain_task)
+    except BaseException:
+        # 1 phần lỗi / client ngắt -> dừng phần còn chạy
+        for t in (map_task, rain_task):
+            t.cancel()
+            if t.done() and not t.cancelled():
+                t.exception()
+        if map_task.done() and not map_task.cancelled() and map_task.exception() is None:
+            map_task.result()["png_file"].close()
+        raise
+
     meta = {
         "pre_start": req.pre_start,
         "pre_end": req.pre_end,
         "event_start": req.event_start,
         "event_end": req.event_end,
-        "area_km2_event": area_km2,
-        "pixel_count_event": pixel_count,
+        "area_km2_event": m["area_km2"],
+        "pixel_count_event": m["pixel_count"],
         "years_for_series": years,
         "rainfall_scale_m": rainfall_scale_m,
     }
-    meta_bytes = json.dumps(meta, ensure_ascii=False, indent=2).encode("utf-8")
-
-    # ========= 5. Gói tất cả vào ZIP =========
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zf:
-        zf.writestr("flood_map.png", flood_png)
-        zf.writestr("flood_timeseries.csv", flood_csv_bytes)
-        zf.writestr("rainfall.csv", rain_csv_bytes)
-        zf.writestr("metadata.json", meta_bytes)
+    entries = [
+        ("flood_timeseries.csv", csv_chunks(REPORT_FLOOD_FIELDS, flood_series), True),
+        ("rainfall.csv", csv_chunks(REPORT_RAIN_FIELDS, rain_series), True),
+        ("flood_map.png", file_chunks(m["png_file"]), False),
+        ("metadata.json", json.dumps(meta, ensure_ascii=False, indent=2).encode("utf-8"), True),
+    ]
 
-    zip_buffer.seek(0)
+    async def chunks():
+        async for chunk in stream_zip(entries):
+            yield chunk
+        progress("zip")
 
     filename = (
         f"flood_report_{req.event_start}_to_{req.event_end}.zip"
         .replace(":", "-")
     )
+    return chunks(), filename
+
+
+async def _report_map(req: FloodRequest, progress: Progress) -> dict:
+    """Thống kê sự kiện + PNG bản đồ ngập (lỗi -> HTTPException 502 / 500)."""
+    try:
+        # cùng pipeline với /flood nhưng chỉ dựng stage stats + ảnh ngập
+        # (dùng ngưỡng Otsu đã cache nếu /flood đã chạy cùng cửa sổ)
+        _, threshold = await _cached_threshold(req)
+        pipe = _pipeline(req, threshold_db=threshold)
+
+        # size lấy từ req.thumb_size nếu có, mặc định 1024
+        thumb_size = getattr(req, "thumb_size", None) or 1024
+
+        # thống kê sự kiện hiện tại (tổng vùng merge) + PNG bản đồ chạy
+        # song song; PNG dùng chung cache /images với /flood (cùng graph
+        # + size -> không tải lại)
+        map_key = await asyncio.to_thread(
+            image_store.register, pipe.flood_layer, pipe.aoi, thumb_size
+        )
+        stats, png_file = await asyncio.gather(
+            _stage(run_ee(get_info, pipe.stats), progress, "stats"),
+            _image_file(map_key),
+        )
+        progress("map")
+        return {
+            "area_km2": float(stats["area_km2"]),
+            "pixel_count": int(stats["pixel_count"]),
+            "png_file": png_file,
+        }
+
+    except HTTPException:
+        raise
+    except EEException as e:
+        raise HTTPException(
+            status_code=502,
+            detail=f"Earth Engine error (flood/report): {str(e)}",
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Internal server error (flood/report): {str(e)}",
+        )
+
+
+async def _report_rainfall(flood_series, rainfall_scale_m: int, progress: Progress):
+    """Chuỗi mưa CHIRPS phủ khoảng của chuỗi ngập (qua RainfallStore)."""
+    try:
+        rain_series = await run_ee(
+            rainfall_store.get_series,
+            start_date=flood_series[0]["date"],
+            end_date=flood_series[-1]["date"],
+            scale=rainfall_scale_m,
+        )
+        progress("rainfall")
+        return rain_series
+    except EEException as e:
+        raise HTTPException(
+            status_code=502,
+            detail=f"Earth Engine error (rainfall/report): {str(e)}",
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Internal server error (timeseries/report): {str(e)}",
+        )
+
+
+# ========================= JOB NỀN ==========================
+
+
+def _job_status(job: Job) -> dict:
+    return {**job.to_dict(), "result_url": f"/jobs/{job.id}/result"}
+
+
+@app.post("/jobs/flood", status_code=202)
+async def submit_flood_job(req: FloodRequest):
+    """Giống POST /flood nhưng trả job_id ngay; kết quả lấy ở /jobs/{id}/result."""
+    aoi_asset = _resolve_aoi_asset(req)
+    return _job_status(_submit_flood_job(aoi_asset, req))
+
+
+def _submit_flood_job(aoi_asset: str, req: FloodRequest) -> Job:
+    async def work(progress: Progress):
+        try:
+            resp = await _flood_cached(aoi_asset, req, progress)
+        except EEException as e:
+            raise HTTPException(
+                status_code=502, detail=f"Earth Engine error: {str(e)}"
+            )
+        return resp.model_dump()
+
+    return jobs.submit("flood", req.model_dump(), work)
+
+
+@app.post("/jobs/report", status_code=202)
+async def submit_report_job(
+    req: FloodRequest,
+    years: int = 5,
+    rainfall_scale_m: int = 5000,
+):
+    """Giống POST /report nhưng chạy nền; file ZIP lấy ở /jobs/{id}/result."""
+    aoi_asset = _resolve_aoi_asset(req)
+
+    async def work(progress: Progress):
+        # ZIP ghi dần ra file trong report_cache, job chỉ giữ khóa file
+        chunks, filename = await _build_report(
+            aoi_asset, req, years, rainfall_scale_m, progress
+        )
+        key = uuid.uuid4().hex
+        tmp = await asyncio.to_thread(report_cache.staging_path, key)
+        try:
+            with open(tmp, "wb") as f:
+                async for chunk in chunks:
+                    await asyncio.to_thread(f.write, chunk)
+            await asyncio.to_thread(report_cache.commit_file, key, tmp)
+        finally:
+            tmp.unlink(missing_ok=True)
+        return key, filename
+
+    params = {**req.model_dump(), "years": years, "rainfall_scale_m": rainfall_scale_m}
+    job = jobs.submit("report", params, work)
+    return _job_status(job)
+
+
+def _get_job(job_id: str) -> Job:
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404, detail="Job không tồn tại hoặc đã hết hạn."
+        )
+    return job
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    return _job_status(_get_job(job_id))
+
+
+@app.get("/jobs/{job_id}/result")
+async def job_result(job_id: str, request: Request):
+    job = _get_job(job_id)
+    if job.status == "error":
+        return JSONResponse(
+            status_code=job.error_status, content={"detail": job.error}
+        )
+    if not job.done:
+        return JSONResponse(status_code=409, content=_job_status(job))
+
+    if job.kind == "report":
+        key, filename = job.result
+        f = await asyncio.to_thread(report_cache.open, key)
+        if f is None:
+            return JSONResponse(
+                status_code=410,
+                content={"detail": "File báo cáo đã bị dọn, hãy tạo lại job."},
+            )
+        return StreamingResponse(
+            file_chunks(f),
+            media_type="application/x-zip-compressed",
+            headers={
+                "Content-Disposition": f'attachment; filename="{filename}"'
+            },
+        )
+    if job.kind == "flood":
+        return await asyncio.to_thread(json_response, request, job.result)
+    return job.result
 
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-Sent Events: queued / running / progress(stage) / done | error."""
+    job = _get_job(job_id)
     return StreamingResponse(
-        zip_buffer,
-        media_type="application/x-zip-compressed",
-        headers={
-            "Content-Disposition": f'attachment; filename="{filename}"'
-        },
+        job.sse(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
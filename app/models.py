@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
 
 class FloodRequest(BaseModel):
@@ -18,6 +18,36 @@ class FloodRequest(BaseModel):
     thumb_size: int = 1024
 
 
+class FloodSweepRequest(BaseModel):
+    """Quét lưới tham số ngưỡng cho 1 sự kiện (phân tích độ nhạy)."""
+    pre_start: str
+    pre_end: str
+    event_start: str
+    event_end: str
+    min_diff_db: List[float] = Field(default_factory=lambda: [-1.0, -2.0, -3.0])
+    elev_max_m: List[float] = Field(default_factory=lambda: [10.0, 15.0, 20.0])
+    scale_m: int = 30
+
+
+class FloodSweepCell(BaseModel):
+    min_diff_db: float
+    elev_max_m: float
+    area_km2: float
+    pixel_count: int
+
+
+class FloodSweepResponse(BaseModel):
+    # trục của lưới (đã sort, bỏ trùng)
+    min_diff_db: List[float]
+    elev_max_m: List[float]
+    # mỗi tổ hợp 1 ô, thứ tự: min_diff_db ngoài, elev_max_m trong
+    grid: List[FloodSweepCell]
+    scale_m: int
+    otsu_threshold_db: Optional[float] = None
+    ee_round_trips: Optional[int] = None
+    cached: bool = False
+
+
 class FloodStats(BaseModel):
     # tổng trên vùng merge (3 tỉnh)
     area_km2: float
@@ -29,6 +59,9 @@ class FloodStats(BaseModel):
     area_km2_bd: float
     area_km2_brvt: float
 
+    # ngưỡng nước Otsu (dB) trên histogram VV sự kiện
+    otsu_threshold_db: Optional[float] = None
+
 
 class FloodMapLayers(BaseModel):
     """Các URL ảnh từ GEE để hiển thị trên WebGIS."""
@@ -56,3 +89,55 @@ class FloodResponse(BaseModel):
     layers: Optional[FloodMapLayers] = None
     # ranh giới từng khu để bật layer trên MapView
     regions_geojson: Optional[FloodRegions] = None
+    # số round-trip tới Earth Engine đã dùng để dựng response
+    ee_round_trips: Optional[int] = None
+    # khóa cache (hash tham số chuẩn hóa) + cờ lấy từ cache
+    result_key: Optional[str] = None
+    cached: bool = False
+    # URL template tile XYZ theo lớp ("/tiles/flood/<key>/{z}/{x}/{y}.png")
+    tiles: Optional[Dict[str, str]] = None
+    # polygons_geojson đã đơn giản hóa theo max_vertices (thông tin LOD) +
+    # URL lấy polygon theo zoom ("/flood/<key>/polygons?zoom=12")
+    polygons_lod: Optional[Dict[str, Any]] = None
+    polygons_url: Optional[str] = None
+
+
+class FloodPreviewResponse(BaseModel):
+    """Bản xem nhanh ở scale thô (stats + 1 thumbnail ngập)."""
+    stats: FloodStats
+    thumb_url: Optional[str] = None
+    # job /flood độ phân giải đầy đủ (poll /jobs/{id} hoặc SSE /jobs/{id}/events)
+    full_job: Optional[Dict[str, Any]] = None
+    ee_round_trips: Optional[int] = None
+    cached: bool = False
+
+
+# ---- Truy vấn điểm / bbox trên polygon ngập của 1 kết quả /flood ----
+class FloodPointQuery(BaseModel):
+    # mỗi điểm [lon, lat] (thứ tự GeoJSON)
+    points: List[List[float]]
+
+
+class FloodPointQueryResponse(BaseModel):
+    flooded: List[bool]
+    # chỉ số feature trong polygons đầy đủ chứa điểm (None = không ngập)
+    feature_ids: List[Optional[int]]
+    flooded_count: int
+    query_ms: float
+
+
+class FloodBBoxQuery(BaseModel):
+    # mỗi bbox [minLon, minLat, maxLon, maxLat]
+    bboxes: List[List[float]]
+
+
+class FloodBBoxResult(BaseModel):
+    bbox: List[float]
+    flooded_area_km2: float
+    feature_count: int
+    feature_ids: List[int]
+
+
+class FloodBBoxQueryResponse(BaseModel):
+    results: List[FloodBBoxResult]
+    query_ms: float
@@ -0,0 +1,313 @@
+import os
+import math
+import struct
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .blob_cache import BlobCache
+
+# ============================================================
+#  VECTOR TILE (MVT / Mapbox Vector Tile v2) CHO POLYGON NGẬP
+# ============================================================
+# /mvt/{result_key}/{z}/{x}/{y}.pbf
+# - Nguồn: polygon đầy đủ của 1 kết quả /flood (polygon_store trong
+#   main.py), đơn giản hóa theo mức LOD của zoom (simplify.py) rồi chiếu
+#   Web Mercator 1 lần -> TileGeometry giữ trong RAM (LRU nhỏ).
+# - Mỗi tile: lọc feature theo bbox, cắt ring theo khung tile (+ buffer),
+#   lượng tử về lưới EXTENT, mã hóa protobuf bằng tay (không cần thư viện).
+# - Tile đã mã hóa lưu trên đĩa theo result_key/z/x/y; tile rỗng cũng lưu
+#   (0 byte) để pan qua vùng không ngập không phải dựng lại.
+
+MVT_LAYER = "flood"
+MVT_EXTENT = 4096
+MVT_BUFFER = int(os.getenv("MVT_BUFFER", "64"))
+MVT_SOURCES = int(os.getenv("MVT_SOURCES", "8"))
+
+mvt_cache = BlobCache(
+    "mvt",
+    max_disk_bytes=int(os.getenv("MVT_CACHE_DISK_MB", "512")) * 1024 * 1024,
+    ttl_s=float(os.getenv("MVT_CACHE_TTL_S", str(30 * 86400))),
+    suffix=".pbf",
+)
+
+_MAX_LAT = 85.0511287798
+
+
+def mvt_key(result_key: str, z: int, x: int, y: int) -> str:
+    return f"{result_key}/{z}/{x}/{y}"
+
+
+def _mercator(coords: np.ndarray) -> np.ndarray:
+    """lon/lat (độ) -> Web Mercator chuẩn hóa [0, 1] (y hướng xuống)."""
+    lon = coords[:, 0]
+    lat = np.radians(np.clip(coords[:, 1], -_MAX_LAT, _MAX_LAT))
+    mx = (lon + 180.0) / 360.0
+    my = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / math.pi) / 2.0
+    return np.column_stack([mx, my])
+
+
+# ---------- protobuf ----------
+
+
+def _varint(n: int, out: bytearray):
+    while n > 0x7F:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _zigzag(n: int) -> int:
+    return (n << 1) ^ (n >> 63)
+
+
+def _field(num: int, wire: int, out: bytearray):
+    _varint((num << 3) | wire, out)
+
+
+def _bytes_field(num: int, data: bytes, out: bytearray):
+    _field(num, 2, out)
+    _varint(len(data), out)
+    out += data
+
+
+def _packed(num: int, values: List[int], out: bytearray):
+    buf = bytearray()
+    for v in values:
+        _varint(v, buf)
+    _bytes_field(num, bytes(buf), out)
+
+
+def _value(v) -> bytes:
+    """Tile.Value: string=1, double=3, sint=6, bool=7."""
+    out = bytearray()
+    if isinstance(v, bool):
+        _field(7, 0, out)
+        _varint(int(v), out)
+    elif isinstance(v, int) and -(2**63) <= v < 2**63:
+        _field(6, 0, out)
+        _varint(_zigzag(v) & 0xFFFFFFFFFFFFFFFF, out)
+    elif isinstance(v, (int, float)):
+        _field(3, 1, out)
+        out += struct.pack("<d", float(v))
+    else:
+        _bytes_field(1, str(v).encode("utf-8"), out)
+    return bytes(out)
+
+
+# ---------- hình học ----------
+
+
+def clip_ring(p: np.ndarray, box: Tuple[float, float, float, float]) -> np.ndarray:
+    """
+    Sutherland–Hodgman: cắt ring mở (không lặp điểm đầu) theo khung
+    box = (xmin, ymin, xmax, ymax).
+    """
+    for axis in (0, 1):
+        for bound, upper in ((box[axis], False), (box[axis + 2], True)):
+            if not len(p):
+                return p
+            v = p[:, axis]
+            inside = v <= bound if upper else v >= bound
+            if inside.all():
+                continue
+            if not inside.any():
+                return p[:0]
+            q = np.roll(p, -1, axis=0)
+            cross = inside != np.roll(inside, -1)
+            dv = q[:, axis] - v
+            t = np.divide(bound - v, dv, out=np.zeros_like(v), where=cross)
+            inter = p + t[:, None] * (q - p)
+            pts = np.stack([p, inter], axis=1).reshape(-1, 2)
+            mask = np.stack([inside, cross], axis=1).reshape(-1)
+            p = pts[mask]
+    return p
+
+
+def _quantize(p: np.ndarray) -> Optional[np.ndarray]:
+    """Làm tròn về lưới tile, bỏ điểm trùng liên tiếp; None nếu ring suy biến."""
+    q = np.rint(p).astype(np.int64)
+    if len(q) > 1:
+        dup = np.all(q == np.roll(q, -1, axis=0), axis=1)
+        q = q[~dup]
+    if len(q) < 3:
+        return None
+    return q
+
+
+def _ring_area2(q: np.ndarray) -> int:
+    """2 × diện tích có dấu (công thức surveyor, tọa độ tile)."""
+    x, y = q[:, 0], q[:, 1]
+    return int(np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y))
+
+
+def _encode_rings(rings: List[np.ndarray], cursor: List[int], out: List[int]):
+    """Lệnh geometry MVT: MoveTo(1) / LineTo(2) / ClosePath(7), delta zigzag."""
+    for q in rings:
+        cx, cy = cursor
+        d = np.diff(np.vstack([[cx, cy], q]), axis=0)
+        zz = ((d << 1) ^ (d >> 63)).ravel().tolist()
+        out.append((1 << 3) | 1)
+        out.extend(zz[:2])
+        out.append(((len(q) - 1) << 3) | 2)
+        out.extend(zz[2:])
+        out.append((1 << 3) | 7)
+        cursor[0], cursor[1] = int(q[-1, 0]), int(q[-1, 1])
+
+
+class TileGeometry:
+    """
+    Polygon của 1 mức LOD đã chiếu Web Mercator [0, 1] + bbox từng feature.
+    tile(z, x, y) -> bytes MVT (b"" nếu tile không có polygon nào).
+    """
+
+    def __init__(self, fc: Dict[str, Any]):
+        self.features: List[Tuple[Dict[str, Any], List[List[np.ndarray]]]] = []
+        boxes = []
+        for f in fc.get("features") or []:
+            geom = f.get("geometry") or {}
+            if geom.get("type") == "Polygon":
+                polys = [geom.get("coordinates") or []]
+            elif geom.get("type") == "MultiPolygon":
+                polys = geom.get("coordinates") or []
+            else:
+                continue
+
+            projected = []
+            for poly in polys:
+                rings = [
+                    _mercator(np.asarray(r, dtype=float)[:-1, :2])
+                    for r in poly
+                    if len(r) >= 4
+                ]
+                if rings:
+                    projected.append(rings)
+            if not projected:
+                continue
+
+            outer = np.vstack([rings[0] for rings in projected])
+            boxes.append([*outer.min(axis=0), *outer.max(axis=0)])
+            props = {
+                k: v
+                for k, v in (f.get("properties") or {}).items()
+                if v is not None and isinstance(v, (str, int, float, bool))
+            }
+            self.features.append((props, projected))
+
+        self.bbox = np.asarray(boxes, dtype=float).reshape(-1, 4)
+
+    def tile(self, z: int, x: int, y: int) -> bytes:
+        n = 2**z
+        pad = MVT_BUFFER / MVT_EXTENT
+        x0, y0 = (x - pad) / n, (y - pad) / n
+        x1, y1 = (x + 1 + pad) / n, (y + 1 + pad) / n
+        hit = np.flatnonzero(
+            (self.bbox[:, 0] <= x1)
+            & (self.bbox[:, 2] >= x0)
+            & (self.bbox[:, 1] <= y1)
+            & (self.bbox[:, 3] >= y0)
+        )
+        if not len(hit):
+            return b""
+
+        scale = n * MVT_EXTENT
+        offset = np.array([x, y], dtype=float) * MVT_EXTENT
+        lo, hi = -MVT_BUFFER, MVT_EXTENT + MVT_BUFFER
+        box = (lo, lo, hi, hi)
+
+        keys: Dict[str, int] = {}
+        values: Dict[Any, int] = {}
+        features = bytearray()
+        for fi in hit:
+            props, polys = self.features[fi]
+            geometry: List[int] = []
+            cursor = [0, 0]
+            for rings in polys:
+                out_rings = []
+                for ri, r in enumerate(rings):
+                    q = _quantize(clip_ring(r * scale - offset, box))
+                    if q is None:
+                        if ri == 0:
+                            break  # vòng ngoài mất -> bỏ cả polygon
+                        continue
+                    area = _ring_area2(q)
+                    if area == 0:
+                        if ri == 0:
+                            break
+                        continue
+                    # MVT: vòng ngoài diện tích dương, lỗ diện tích âm
+                    if (area > 0) != (ri == 0):
+                        q = q[::-1]
+                    out_rings.append(q)
+                if out_rings:
+                    _encode_rings(out_rings, cursor, geometry)
+            if not geometry:
+                continue
+
+            tags = []
+            for k, v in props.items():
+                tags.append(keys.setdefault(k, len(keys)))
+                tags.append(values.setdefault((type(v), v), len(values)))
+
+            feat = bytearray()
+            _field(1, 0, feat)
+            _varint(int(fi) + 1, feat)
+            if tags:
+                _packed(2, tags, feat)
+            _field(3, 0, feat)
+            _varint(3, feat)  # GeomType.POLYGON
+            _packed(4, geometry, feat)
+            _bytes_field(2, bytes(feat), features)
+
+        if not features:
+            return b""
+
+        layer = bytearray()
+        _field(15, 0, layer)
+        _varint(2, layer)
+        _bytes_field(1, MVT_LAYER.encode("utf-8"), layer)
+        layer += features
+        for k in keys:
+            _bytes_field(3, k.encode("utf-8"), layer)
+        for _, v in values:
+            _bytes_field(4, _value(v), layer)
+        _field(5, 0, layer)
+        _varint(MVT_EXTENT, layer)
+
+        out = bytearray()
+        _bytes_field(3, bytes(layer), out)
+        return bytes(out)
+
+
+class MvtSource:
+    """TileGeometry theo (result_key, mức LOD) – LRU nhỏ trong RAM."""
+
+    def __init__(self, max_items: int = MVT_SOURCES):
+        self.max_items = max_items
+        self._items: "OrderedDict[Tuple[str, Any], TileGeometry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def cached(self, result_key: str, level) -> Optional[TileGeometry]:
+        with self._lock:
+            geo = self._items.get((result_key, level))
+            if geo is not None:
+                self._items.move_to_end((result_key, level))
+            return geo
+
+    def build(self, result_key: str, level, fc: Dict[str, Any]) -> TileGeometry:
+        geo = TileGeometry(fc)
+        with self._lock:
+            self._items[(result_key, level)] = geo
+            self._items.move_to_end((result_key, level))
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+        return geo
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"sources": len(self._items), "max_sources": self.max_items}
+
+
+mvt_source = MvtSource()
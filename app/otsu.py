@@ -0,0 +1,146 @@
+import os
+from typing import List, Optional, Sequence
+
+import ee
+import numpy as np
+
+from .result_cache import ResultCache, cache_key
+
+# ============================================================
+#  NGƯỠNG OTSU TỪ HISTOGRAM CỐ ĐỊNH CỦA VV (dB)
+# ============================================================
+# - Histogram VV sự kiện: 1 reduceRegion với ee.Reducer.fixedHistogram
+#   (OTSU_BINS bin đều trên [OTSU_MIN_DB, OTSU_MAX_DB)).
+# - Ngưỡng = mép trên của bin k làm cực đại phương sai giữa 2 lớp:
+#       w0 * w1 * (m0 - m1)^2     (lớp 0 = bin 0..k, lớp 1 = phần còn lại)
+#   Cùng 1 công thức ở 2 nơi:
+#     + otsu_threshold_ee   : phía server (ee.Array), dùng được khi map
+#                             trên FeatureCollection (chuỗi thời gian batch)
+#     + otsu_from_counts    : NumPy, từ histogram đã lấy về / cache
+# - Histogram chỉ phụ thuộc (cửa sổ sự kiện, scale), không phụ thuộc
+#   min_diff_db / elev_max_m -> cache lại để chỉnh ngưỡng không phải
+#   reduce lại raster.
+
+OTSU_MIN_DB = float(os.getenv("OTSU_MIN_DB", "-30"))
+OTSU_MAX_DB = float(os.getenv("OTSU_MAX_DB", "5"))
+OTSU_BINS = int(os.getenv("OTSU_BINS", "350"))
+
+# histogram rỗng / chỉ 1 lớp -> ngưỡng mặc định như trước
+OTSU_FALLBACK_DB = -15.0
+
+
+def _bin_width() -> float:
+    return (OTSU_MAX_DB - OTSU_MIN_DB) / OTSU_BINS
+
+
+def _bin_centers() -> List[float]:
+    w = _bin_width()
+    return [OTSU_MIN_DB + w * (i + 0.5) for i in range(OTSU_BINS)]
+
+
+def vv_histogram(img_db: ee.Image, region: ee.Geometry, scale: int) -> ee.List:
+    """
+    Số pixel theo từng bin (ee.List độ dài OTSU_BINS) của ảnh VV dB
+    trong region. Vùng không có pixel -> list toàn 0.
+    """
+    hist = img_db.rename("x").reduceRegion(
+        reducer=ee.Reducer.fixedHistogram(OTSU_MIN_DB, OTSU_MAX_DB, OTSU_BINS),
+        geometry=region,
+        scale=scale,
+        maxPixels=1e13,
+        bestEffort=True,
+    ).get("x")
+
+    # fixedHistogram trả mảng N x 2: [mép dưới bin, count]
+    counts = ee.Array(hist).slice(1, 1, 2).project([0]).toList()
+    return ee.List(ee.Algorithms.If(hist, counts, ee.List.repeat(0, OTSU_BINS)))
+
+
+def otsu_threshold_ee(counts: ee.List) -> ee.Number:
+    """Otsu phía server trên histogram của vv_histogram (không round-trip)."""
+    c = ee.Array(counts)
+    centers = ee.Array(_bin_centers())
+
+    w0 = c.accum(0)
+    s0 = c.multiply(centers).accum(0)
+    total = ee.Number(w0.get([OTSU_BINS - 1]))
+    s_total = ee.Number(s0.get([OTSU_BINS - 1]))
+
+    w1 = w0.multiply(-1).add(total)
+    m0 = s0.divide(w0.max(1e-12))
+    m1 = s0.multiply(-1).add(s_total).divide(w1.max(1e-12))
+    # w0 = 0 hoặc w1 = 0 -> tích = 0, không cần mask riêng
+    bcv = w0.multiply(w1).multiply(m0.subtract(m1).pow(2))
+
+    k = ee.Number(ee.List(bcv.argmax()).get(0))
+    best = ee.Number(bcv.get([k]))
+    thr = k.add(1).multiply(_bin_width()).add(OTSU_MIN_DB)
+    return ee.Number(ee.Algorithms.If(best.gt(0), thr, OTSU_FALLBACK_DB))
+
+
+def otsu_from_counts(counts: Sequence[float]) -> float:
+    """Otsu (NumPy, vector hóa) trên histogram OTSU_BINS bin -> ngưỡng dB."""
+    c = np.asarray(counts, dtype=float)
+    if c.size != OTSU_BINS:
+        raise ValueError(f"histogram phải có {OTSU_BINS} bin, nhận {c.size}")
+
+    centers = np.asarray(_bin_centers())
+    w0 = np.cumsum(c)
+    s0 = np.cumsum(c * centers)
+    w1 = w0[-1] - w0
+    m0 = s0 / np.maximum(w0, 1e-12)
+    m1 = (s0[-1] - s0) / np.maximum(w1, 1e-12)
+    bcv = w0 * w1 * (m0 - m1) ** 2
+
+    k = int(np.argmax(bcv))
+    if not bcv[k] > 0:
+        return OTSU_FALLBACK_DB
+    return OTSU_MIN_DB + (k + 1) * _bin_width()
+
+
+class HistogramCache:
+    """
+    Histogram VV sự kiện theo (event_start, event_end, scale), lưu qua
+    ResultCache (RAM + đĩa). TTL mặc định 1 ngày: cửa sổ gần hiện tại
+    vẫn có thể có thêm cảnh S1 mới.
+    """
+
+    def __init__(self, cache: Optional[ResultCache] = None):
+        self.cache = cache or ResultCache(
+            "otsu_hist",
+            max_items=int(os.getenv("OTSU_HIST_CACHE_ITEMS", "256")),
+            ttl_s=float(os.getenv("OTSU_HIST_TTL_S", "86400")),
+            max_disk_bytes=64 * 1024 * 1024,
+        )
+
+    @staticmethod
+    def key(event_start: str, event_end: str, scale: int) -> str:
+        return cache_key(
+            "otsu_hist",
+            {
+                "event_start": event_start,
+                "event_end": event_end,
+                "scale": int(scale),
+                "bins": [OTSU_MIN_DB, OTSU_MAX_DB, OTSU_BINS],
+            },
+        )
+
+    def get(self, event_start: str, event_end: str, scale: int) -> Optional[List[float]]:
+        hit = self.cache.get(self.key(event_start, event_end, scale))
+        if hit is None or len(hit.get("counts", ())) != OTSU_BINS:
+            return None
+        return hit["counts"]
+
+    def set(self, event_start: str, event_end: str, scale: int, counts: Sequence[float]):
+        self.cache.set(
+            self.key(event_start, event_end, scale),
+            {"counts": [float(v) for v in counts]},
+        )
+
+    def threshold(self, event_start: str, event_end: str, scale: int) -> Optional[float]:
+        """Ngưỡng Otsu từ histogram đã cache; None nếu chưa có."""
+        counts = self.get(event_start, event_end, scale)
+        return None if counts is None else otsu_from_counts(counts)
+
+
+histogram_cache = HistogramCache()
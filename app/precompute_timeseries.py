@@ -1,18 +1,325 @@
 # precompute_timeseries.py
+#
+# Tính trước chuỗi diện tích ngập 10 năm -> flood_timeseries_10y.json
+#
+#   python -m app.precompute_timeseries                 # chạy đủ (resume nếu bị ngắt)
+#   python -m app.precompute_timeseries --incremental   # chỉ tính các mốc mới hơn bản ghi cuối
+#   python -m app.precompute_timeseries --retry-failed  # chỉ chạy lại các mốc đã lỗi
+#
+# - Các mốc được chia cho 1 pool worker (--workers).
+# - Mỗi mốc xong được ghi ngay 1 dòng vào file checkpoint (.jsonl),
+#   chạy lại sẽ bỏ qua các mốc đã có -> resume được.
+# - Mốc lỗi được ghi vào failed_<params>.json để --retry-failed.
+# - --batch-size N: gộp N mốc vào 1 tính toán EE (1 getInfo / lô); kích
+#   thước lô tự co lại khi EE báo vượt giới hạn bộ nhớ / thời gian và
+#   nở dần ra khi các lô chạy ổn.
+import argparse
+import datetime as dt
 import json
-from processing import generate_flood_timeseries
+import threading
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
+from pathlib import Path
+
+from .result_cache import CACHE_DIR, cache_key
+from .processing import flood_stats_batch, flood_stats_for_date, timeseries_dates
+
+APP_DIR = Path(__file__).resolve().parent
+OUTPUT_PATH = APP_DIR / "flood_timeseries_10y.json"
+WORK_DIR = CACHE_DIR / "precompute"
+
+
+def _load_json(path: Path, default):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def _write_json(path: Path, data):
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    tmp.replace(path)
+
+
+class Checkpoint:
+    """
+    File .jsonl: mỗi dòng 1 bản ghi đã tính xong (append + flush ngay).
+    Dòng {"schedule": {...}} ghi lịch (start/end) của lần chạy đủ để
+    resume ngày khác vẫn ra đúng các mốc cũ.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.schedule = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        records = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        # dòng cuối có thể bị cắt dở khi process bị kill
+                        continue
+                    if "schedule" in rec:
+                        self.schedule = rec["schedule"]
+                    elif "date" in rec:
+                        records[rec["date"]] = rec
+        except OSError:
+            pass
+        return records
+
+    def append(self, rec):
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                f.flush()
+
+    def remove(self):
+        self.path.unlink(missing_ok=True)
+
+
+# Thông điệp lỗi EE khi 1 tính toán quá nặng -> nên chia nhỏ lô
+_LIMIT_ERRORS = (
+    "memory limit",
+    "timed out",
+    "too many concurrent",
+    "too many pixels",
+    "request payload size",
+    "computation was cancelled",
+)
+
+
+def _is_limit_error(e: Exception) -> bool:
+    msg = str(e).lower()
+    return any(s in msg for s in _LIMIT_ERRORS)
+
+
+def _run_per_date(todo, params, workers, on_done, on_fail):
+    """Mỗi mốc 1 task (1 getInfo / mốc)."""
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {
+            pool.submit(flood_stats_for_date, d, **params): d for d in todo
+        }
+        for fut in as_completed(futures):
+            d = futures[fut]
+            try:
+                rec = fut.result()
+            except Exception as e:
+                on_fail(d, e)
+                continue
+            on_done(rec)
+
+
+def _run_batched(todo, params, workers, batch_size, on_done, on_fail):
+    """
+    Gộp nhiều mốc vào 1 lô (1 getInfo / lô), `workers` lô chạy song song.
+    Lô lỗi được chia đôi và đẩy lại hàng đợi; lỗi vượt giới hạn EE còn
+    làm giảm kích thước cho các lô mới. Lô chạy ổn -> tăng dần lại.
+    """
+    size = max(1, batch_size)
+    rest = deque(todo)  # mốc chưa chia lô
+    retry = deque()  # các lô đã chia nhỏ sau lỗi, ưu tiên chạy trước
+    inflight = {}
+
+    def _next_chunk():
+        if retry:
+            return retry.popleft()
+        return [rest.popleft() for _ in range(min(size, len(rest)))]
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        while rest or retry or inflight:
+            while (rest or retry) and len(inflight) < max(1, workers):
+                chunk = _next_chunk()
+                inflight[pool.submit(flood_stats_batch, chunk, **params)] = chunk
+
+            finished, _ = wait(inflight, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                chunk = inflight.pop(fut)
+                try:
+                    recs = fut.result()
+                except Exception as e:
+                    if len(chunk) == 1:
+                        on_fail(chunk[0], e)
+                        continue
+                    if _is_limit_error(e):
+                        size = max(1, len(chunk) // 2)
+                    half = len(chunk) // 2
+                    retry.append(chunk[:half])
+                    retry.append(chunk[half:])
+                    print(f"Lô {len(chunk)} mốc lỗi ({e}) -> chia đôi")
+                    continue
+
+                for rec in recs:
+                    on_done(rec)
+                size = min(batch_size, size + max(1, size // 2))
+
+
+def run_precompute(
+    years: int = 10,
+    step_days: int = 30,
+    min_diff_db: float = -2.0,
+    elev_max_m: float = 15,
+    scale: int = 30,
+    workers: int = 4,
+    batch_size: int = 0,
+    incremental: bool = False,
+    retry_failed: bool = False,
+    output_path: Path = OUTPUT_PATH,
+):
+    """
+    Chạy precompute, trả về (số bản ghi trong file output, dict mốc lỗi).
+    batch_size > 1 -> dùng chế độ batch phía server (flood_stats_batch).
+    """
+    params = {
+        "min_diff_db": min_diff_db,
+        "elev_max_m": elev_max_m,
+        "scale": scale,
+    }
+    tag = cache_key("timeseries", params)[:12]
+    WORK_DIR.mkdir(parents=True, exist_ok=True)
+    checkpoint = Checkpoint(WORK_DIR / f"checkpoint_{tag}.jsonl")
+    failed_path = WORK_DIR / f"failed_{tag}.json"
+
+    existing = {
+        rec["date"]: rec for rec in _load_json(output_path, []) if "date" in rec
+    }
+    done = checkpoint.load()
+    failed = _load_json(failed_path, {})
+
+    # ---- Chọn các mốc cần tính ----
+    if retry_failed:
+        dates = [dt.date.fromisoformat(d) for d in sorted(failed)]
+    elif incremental and existing:
+        last = dt.date.fromisoformat(max(existing))
+        dates = timeseries_dates(
+            step_days=step_days, start=last + dt.timedelta(days=step_days)
+        )
+    else:
+        # lịch cố định theo checkpoint: timeseries_dates() mặc định neo vào
+        # hôm nay -> resume ngày khác sẽ lệch hết các mốc
+        schedule = checkpoint.schedule
+        if (
+            not schedule
+            or schedule.get("years") != years
+            or schedule.get("step_days") != step_days
+        ):
+            end = dt.date.today()
+            schedule = {
+                "years": years,
+                "step_days": step_days,
+                "start": (end - dt.timedelta(days=365 * years)).isoformat(),
+                "end": end.isoformat(),
+            }
+            checkpoint.append({"schedule": schedule})
+        dates = timeseries_dates(
+            step_days=step_days,
+            start=dt.date.fromisoformat(schedule["start"]),
+            end=dt.date.fromisoformat(schedule["end"]),
+        )
+
+    todo = [d for d in dates if d.isoformat() not in done]
+    print(
+        f"{len(dates)} mốc, {len(dates) - len(todo)} đã có trong checkpoint, "
+        f"cần tính {len(todo)} (workers={workers})"
+    )
+
+    # ---- Fan-out ----
+    progress = {"n": 0}
+
+    def on_done(rec):
+        checkpoint.append(rec)
+        done[rec["date"]] = rec
+        failed.pop(rec["date"], None)
+        progress["n"] += 1
+        print(f"[{progress['n']}/{len(todo)}] {rec['date']} area={rec['area_km2']:.2f} km²")
+
+    def on_fail(d, e):
+        failed[d.isoformat()] = str(e)
+        _write_json(failed_path, failed)
+        progress["n"] += 1
+        print(f"[{progress['n']}/{len(todo)}] {d.isoformat()} LỖI: {e}")
+
+    if batch_size > 1:
+        _run_batched(todo, params, workers, batch_size, on_done, on_fail)
+    else:
+        _run_per_date(todo, params, workers, on_done, on_fail)
+
+    # ---- Gộp & ghi output ----
+    if incremental or retry_failed:
+        merged = {**existing, **done}
+    else:
+        # chạy đủ: chỉ giữ các mốc thuộc lịch hiện tại; mốc lỗi lần này
+        # giữ bản ghi cũ trong output (nếu có) thay vì làm mất
+        wanted = {d.isoformat() for d in dates}
+        merged = {d: rec for d, rec in {**existing, **done}.items() if d in wanted}
+    series = [merged[d] for d in sorted(merged)]
+    _write_json(output_path, series)
+
+    # output đã chứa mọi mốc của checkpoint -> xóa checkpoint
+    checkpoint.remove()
+    if failed:
+        _write_json(failed_path, failed)
+    else:
+        failed_path.unlink(missing_ok=True)
+
+    return len(series), failed
+
 
 def main():
-    series = generate_flood_timeseries(
-        years=10,
-        step_days=30,
-        min_diff_db=-2.0,
-        elev_max_m=15,
-        scale=30,
+    parser = argparse.ArgumentParser(description="Precompute flood timeseries")
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--step-days", type=int, default=30)
+    parser.add_argument("--min-diff-db", type=float, default=-2.0)
+    parser.add_argument("--elev-max-m", type=float, default=15)
+    parser.add_argument("--scale", type=int, default=30)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=0,
+        help="số mốc tối đa gộp vào 1 tính toán EE (0/1 = từng mốc)",
     )
-    with open("flood_timeseries_10y.json", "w", encoding="utf-8") as f:
-        json.dump(series, f, ensure_ascii=False, indent=2)
-    print(f"Saved {len(series)} records to flood_timeseries_10y.json")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="chỉ tính các mốc mới hơn bản ghi cuối trong file output",
+    )
+    parser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="chỉ chạy lại các mốc đã lỗi ở lần trước",
+    )
+    args = parser.parse_args()
+
+    n, failed = run_precompute(
+        years=args.years,
+        step_days=args.step_days,
+        min_diff_db=args.min_diff_db,
+        elev_max_m=args.elev_max_m,
+        scale=args.scale,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        incremental=args.incremental,
+        retry_failed=args.retry_failed,
+    )
+    print(f"Saved {n} records to {OUTPUT_PATH.name}")
+    if failed:
+        print(f"{len(failed)} mốc lỗi, chạy lại bằng --retry-failed")
+
 
 if __name__ == "__main__":
     main()
@@ -1,26 +1,32 @@
 import datetime as dt
+from functools import cached_property
+from typing import Optional
+
 import ee
 
+from .correlation import pearson
+from .otsu import otsu_threshold_ee, vv_histogram
+
 ee.Initialize()
 
+# ===== ASSET RANH GIỚI CÁC KHU (dùng chung cho regions.py) =====
+REGION_ASSETS = {
+    # Bản merge V2 bạn vừa export (3 tỉnh gộp lại)
+    "merged": "users/tranleanhdaintd2/hcm_merged_v2",
+    "hcm": "users/tranleanhdaintd2/hcm_only",
+    "bd": "users/tranleanhdaintd2/binhduong_only",
+    "brvt": "users/tranleanhdaintd2/brvt_only",
+}
+
 # ===== AOI SAU SÁP NHẬP: HCM + BÌNH DƯƠNG + BÀ RỊA-VŨNG TÀU =====
-# Bản merge V2 bạn vừa export (3 tỉnh gộp lại)
-AOI_MERGED = ee.FeatureCollection(
-    "users/tranleanhdaintd2/hcm_merged_v2"
-).geometry()
+AOI_MERGED = ee.FeatureCollection(REGION_ASSETS["merged"]).geometry()
 
 # ===== AOI RIÊNG TỪNG TỈNH (để dành, sau này tách thống kê) =====
-AOI_HCM = ee.FeatureCollection(
-    "users/tranleanhdaintd2/hcm_only"
-).geometry()
+AOI_HCM = ee.FeatureCollection(REGION_ASSETS["hcm"]).geometry()
 
-AOI_BD = ee.FeatureCollection(
-    "users/tranleanhdaintd2/binhduong_only"
-).geometry()
+AOI_BD = ee.FeatureCollection(REGION_ASSETS["bd"]).geometry()
 
-AOI_BRVT = ee.FeatureCollection(
-    "users/tranleanhdaintd2/brvt_only"
-).geometry()
+AOI_BRVT = ee.FeatureCollection(REGION_ASSETS["brvt"]).geometry()
 
 # Biến AOI cũ – giữ lại cho các hàm phía dưới dùng,
 # hiện tại = toàn vùng sau sáp nhập (3 tỉnh).
@@ -85,47 +91,281 @@ def srtm_elev_mask(max_m: float) -> ee.Image:
 
 def otsu_threshold(img_db: ee.Image, region: ee.Geometry, scale: int) -> ee.Number:
     """
-    Ở đây dùng percentile 10% làm ngưỡng đơn giản (thay cho Otsu đầy đủ).
-    Nếu reduceRegion rỗng -> fallback -15 dB.
+    Ngưỡng Otsu thật (phía server) từ histogram cố định của img_db:
+    1 reduceRegion fixedHistogram + tính trên ee.Array (xem otsu.py).
+    Histogram rỗng / chỉ 1 lớp -> fallback -15 dB.
+    """
+    return otsu_threshold_ee(vv_histogram(img_db, region, scale))
+
+
+# các khu con cho thống kê diện tích theo khu
+REGION_AOIS = {"hcm": AOI_HCM, "bd": AOI_BD, "brvt": AOI_BRVT}
+
+
+def _flood_area_stats(flood_img: ee.Image, region: ee.Geometry, scale: int):
+    """
+    Diện tích (km²) + số pixel ngập trong 1 lần reduceRegion:
+    reducer sum + count dùng chung input là ảnh pixelArea đã mask theo ngập
+    (count trên ảnh này = count trên mask 'flood').
+    Trả về (area_km2, pixel_count) dạng ee.Number, fallback 0 phía server.
     """
-    img = img_db.rename("x")
+    area_img = flood_img.multiply(ee.Image.pixelArea())  # band 'flood', m²
 
-    dct = img.reduceRegion(
-        reducer=ee.Reducer.percentile([10]),
+    stats = area_img.reduceRegion(
+        reducer=ee.Reducer.sum().combine(ee.Reducer.count(), sharedInputs=True),
         geometry=region,
         scale=scale,
+        maxPixels=1e13,
         bestEffort=True,
     )
+    stats_area = stats.get("flood_sum")
+    stats_count = stats.get("flood_count")
 
-    vals = ee.Dictionary(dct).values()
-    p = ee.Algorithms.If(
-        ee.Number(ee.List(vals).size()).gt(0),
-        ee.List(vals).get(0),
-        None,
+    area_m2 = ee.Number(ee.Algorithms.If(stats_area, stats_area, ee.Number(0)))
+    pixel_count = ee.Number(
+        ee.Algorithms.If(stats_count, stats_count, ee.Number(0))
     )
+    return area_m2.divide(1e6), pixel_count
+
+
+def _regional_area_km2(flood_img: ee.Image, scale: int) -> ee.Dictionary:
+    """
+    Diện tích ngập (km²) cho từng khu HCM / BD / BRVT -> ee.Dictionary
+    {"hcm": km², "bd": km², "brvt": km²}. Mỗi khu 1 reduceRegion với
+    maxPixels + bestEffort như thống kê tổng (reduceRegions không có
+    bestEffort -> sự kiện lớn ở 30 m dễ lỗi bộ nhớ / timeout); vẫn gộp
+    chung 1 getInfo với các thống kê khác.
+    """
+    area_img = flood_img.multiply(ee.Image.pixelArea())  # band 'flood', m²
+
+    def _km2(region):
+        s = area_img.reduceRegion(
+            reducer=ee.Reducer.sum(),
+            geometry=region,
+            scale=scale,
+            maxPixels=1e13,
+            bestEffort=True,
+        ).get("flood")
+        return ee.Number(ee.Algorithms.If(s, s, ee.Number(0))).divide(1e6)
 
-    return ee.Number(ee.Algorithms.If(p, p, -15))
+    return ee.Dictionary({name: _km2(region) for name, region in REGION_AOIS.items()})
 
 
-def _area_km2_for_region(
-    flood_img: ee.Image, region: ee.Geometry, scale: int
-) -> ee.Number:
+# ---------- Pipeline ngập theo stage, dựng lười + nhớ kết quả ----------
+
+
+class FloodPipeline:
     """
-    Tính diện tích ngập (km²) trong 1 vùng con (HCM / BD / BRVT).
-    flood_img: ảnh mask 0/1 đã rename('flood').
+    S1 -> delta -> ngưỡng -> mask ngập cho 1 sự kiện, chia thành các stage
+    đặt tên. Mỗi stage chỉ được dựng (graph EE) khi có người truy cập lần
+    đầu và được nhớ lại (cached_property), nên mỗi caller chỉ trả giá cho
+    phần graph mình dùng:
+
+    - stats          : ee.Dictionary {area_km2, pixel_count}
+    - regional_stats : ee.Dictionary {area_km2_hcm, area_km2_bd, area_km2_brvt}
+    - vectors        : FeatureCollection polygon ngập
+    - vv_layers      : {"pre_vv", "event_vv"} ảnh VV đã visualize
+    - delta_layer    : ảnh ΔdB đã visualize
+    - flood_layer    : ảnh composite ngập (nền tối + AOI + vùng ngập)
+    - histogram      : ee.List số pixel theo bin của VV sự kiện (cho Otsu)
+
+    threshold_db: ngưỡng nước đã biết (vd. Otsu từ histogram đã cache,
+    xem otsu.HistogramCache) -> bỏ qua bước reduce histogram phía EE.
+    None -> Otsu phía server trên stage histogram.
+
+    Ngày có thể là str (client) hoặc ee.Date / ee.String (khi map phía server).
+    Luôn dùng AOI sau sáp nhập (AOI_MERGED = HCM + BD + BR-VT).
     """
-    stats_area = flood_img.multiply(ee.Image.pixelArea()).reduceRegion(
-        reducer=ee.Reducer.sum(),
-        geometry=region,
-        scale=scale,
-        maxPixels=1e13,
-        bestEffort=True,
-    ).get("flood")
 
-    area_m2 = ee.Number(
-        ee.Algorithms.If(stats_area, stats_area, ee.Number(0))
-    )
-    return area_m2.divide(1e6)
+    def __init__(
+        self,
+        pre_start,
+        pre_end,
+        event_start,
+        event_end,
+        min_diff_db: float = -2.0,
+        elev_max_m: float = 15,
+        scale: int = 30,
+        threshold_db: Optional[float] = None,
+    ):
+        self.aoi = AOI  # = AOI_MERGED
+        self.pre_start = pre_start
+        self.pre_end = pre_end
+        self.event_start = event_start
+        self.event_end = event_end
+        self.min_diff_db = min_diff_db
+        self.elev_max_m = elev_max_m
+        self.scale = scale
+        self.threshold_db = threshold_db
+
+    # ----- ảnh trung gian -----
+
+    @cached_property
+    def pre_vv(self) -> ee.Image:
+        """VV dB trước sự kiện."""
+        return load_s1_vv(self.aoi, self.pre_start, self.pre_end)
+
+    @cached_property
+    def evt_vv(self) -> ee.Image:
+        """VV dB trong sự kiện."""
+        return load_s1_vv(self.aoi, self.event_start, self.event_end)
+
+    @cached_property
+    def delta_db(self) -> ee.Image:
+        """Chênh lệch dB: event - pre."""
+        return self.evt_vv.subtract(self.pre_vv)
+
+    @cached_property
+    def histogram(self) -> ee.List:
+        """Histogram cố định của VV sự kiện (chỉ phụ thuộc cửa sổ + scale)."""
+        return vv_histogram(self.evt_vv, self.aoi, self.scale)
+
+    @cached_property
+    def threshold(self) -> ee.Number:
+        """Ngưỡng nước (dB): threshold_db nếu có, không thì Otsu phía server."""
+        if self.threshold_db is not None:
+            return ee.Number(self.threshold_db)
+        return otsu_threshold_ee(self.histogram)
+
+    def _flood_mask(self, min_diff_db: float, elev_max_m) -> ee.Image:
+        """Mask ngập 0/1 (band 'flood') cho 1 cặp tham số, dùng chung ngưỡng nước."""
+        aoi = self.aoi
+
+        # ngưỡng nước từ event
+        water_evt = self.evt_vv.lte(self.threshold)
+
+        # giảm dB đủ mạnh
+        drop = self.delta_db.lte(min_diff_db)
+
+        # kết hợp
+        flood = water_evt.And(drop)
+
+        # bỏ nước thường trực + địa hình cao
+        flood = flood.updateMask(jrc_perm_water_mask().Not())
+        if elev_max_m is not None:
+            flood = flood.updateMask(srtm_elev_mask(elev_max_m))
+
+        # đảm bảo band name ổn định để reduceRegion không null
+        return flood.updateMask(flood).rename("flood").clip(aoi)
+
+    @cached_property
+    def flood(self) -> ee.Image:
+        """Mask ngập 0/1, band 'flood'."""
+        return self._flood_mask(self.min_diff_db, self.elev_max_m)
+
+    # ----- stage kết quả -----
+
+    @cached_property
+    def stats(self) -> ee.Dictionary:
+        """Thống kê tổng trên vùng merge (1 lần reduceRegion sum + count)."""
+        area_km2, pixel_count = _flood_area_stats(self.flood, self.aoi, self.scale)
+        return ee.Dictionary({"area_km2": area_km2, "pixel_count": pixel_count})
+
+    @cached_property
+    def regional_stats(self) -> ee.Dictionary:
+        """Diện tích ngập cho từng khu HCM / BD / BRVT."""
+        regional = _regional_area_km2(self.flood, self.scale)
+        return ee.Dictionary(
+            {
+                "area_km2_hcm": regional.get("hcm"),
+                "area_km2_bd": regional.get("bd"),
+                "area_km2_brvt": regional.get("brvt"),
+            }
+        )
+
+    @cached_property
+    def vectors(self) -> ee.FeatureCollection:
+        """Vector hóa vùng ngập."""
+        return self.flood.selfMask().reduceToVectors(
+            geometry=self.aoi,
+            scale=self.scale,
+            maxPixels=1e13,
+            geometryType="polygon",
+            labelProperty="class",
+            eightConnected=True,
+        )
+
+    @cached_property
+    def vv_layers(self):
+        return {
+            "pre_vv": make_vv_image(self.pre_vv, self.aoi),
+            "event_vv": make_vv_image(self.evt_vv, self.aoi),
+        }
+
+    @cached_property
+    def delta_layer(self) -> ee.Image:
+        return make_delta_image(self.delta_db, self.aoi)
+
+    @cached_property
+    def flood_layer(self) -> ee.Image:
+        return make_flood_map_image(self.flood, self.aoi)
+
+    def sweep(self, min_diff_dbs, elev_max_ms) -> ee.Dictionary:
+        """
+        Quét lưới tham số (min_diff_db x elev_max_m) trong 1 lần đánh giá:
+        mỗi tổ hợp là 1 band mask ngập (mask riêng từng band) của cùng 1
+        ảnh nhiều band -> 1 reduceRegion sum + count cho mọi tổ hợp.
+
+        Trả về ee.Dictionary {"area_km2": [...], "pixel_count": [...]}
+        theo thứ tự [(d, e) for d in min_diff_dbs for e in elev_max_ms].
+        """
+        combos = [(d, e) for d in min_diff_dbs for e in elev_max_ms]
+        bands = [
+            self._flood_mask(d, e).rename(f"f{i}") for i, (d, e) in enumerate(combos)
+        ]
+        area_img = ee.Image.cat(bands).multiply(ee.Image.pixelArea())
+
+        stats = area_img.reduceRegion(
+            reducer=ee.Reducer.sum().combine(ee.Reducer.count(), sharedInputs=True),
+            geometry=self.aoi,
+            scale=self.scale,
+            maxPixels=1e13,
+            bestEffort=True,
+        )
+
+        def _num(k):
+            v = stats.get(k)
+            return ee.Number(ee.Algorithms.If(v, v, ee.Number(0)))
+
+        return ee.Dictionary(
+            {
+                "area_km2": ee.List(
+                    [_num(f"f{i}_sum").divide(1e6) for i in range(len(combos))]
+                ),
+                "pixel_count": ee.List(
+                    [_num(f"f{i}_count") for i in range(len(combos))]
+                ),
+            }
+        )
+
+    def layer(self, name: str) -> ee.Image:
+        """Ảnh đã visualize theo tên lớp của FloodMapLayers."""
+        if name == "flood":
+            return self.flood_layer
+        if name == "delta_db":
+            return self.delta_layer
+        if name in ("pre_vv", "event_vv"):
+            return self.vv_layers[name]
+        raise KeyError(name)
+
+    def summary(self, stages=("stats",), max_features: int = 10000) -> ee.Dictionary:
+        """
+        Gói các stage cần thiết vào 1 ee.Dictionary -> 1 lần getInfo.
+        stages: các tên trong ("stats", "regional_stats", "vectors",
+        "histogram"); "vectors" được trả về dưới key "polygons" (giới hạn
+        max_features), "histogram" dưới key "vv_histogram".
+        """
+        out = ee.Dictionary({})
+        for st in stages:
+            if st == "vectors":
+                out = out.set(
+                    "polygons", ee.FeatureCollection(self.vectors).limit(max_features)
+                )
+            elif st == "histogram":
+                out = out.set("vv_histogram", self.histogram)
+            else:
+                out = out.combine(getattr(self, st))
+        return out
 
 
 # ---------- Main flood pipeline cho 1 sự kiện (dùng cho /flood) ----------
@@ -140,9 +380,11 @@ def detect_flood(
     min_diff_db: float = -2.0,
     elev_max_m: float = 15,
     scale: int = 30,
+    max_features: int = 10000,
 ):
     """
-    Phát hiện ngập cho 1 khoảng thời gian:
+    Phát hiện ngập cho 1 khoảng thời gian (dựng MỌI stage của FloodPipeline;
+    caller chỉ cần 1 phần thì dùng thẳng FloodPipeline):
     - Luôn dùng AOI sau sáp nhập (AOI_MERGED = HCM + BD + BR-VT).
     - aoi_fc giữ lại chỉ để tương thích với main.py, nhưng bị bỏ qua.
 
@@ -150,91 +392,37 @@ def detect_flood(
     - Các thống kê area_km2, pixel_count hiện tại là
       TỔNG DIỆN TÍCH NGẬP TOÀN VÙNG SAU SÁP NHẬP (3 tỉnh),
       đồng thời có thêm area_km2_hcm / bd / brvt.
+    - result["summary"] là 1 ee.Dictionary chứa toàn bộ thống kê + GeoJSON
+      vector ngập -> lấy về bằng 1 lần getInfo. Ranh giới AOI / từng khu
+      không đổi nên lấy từ regions.py (file tĩnh), không gọi EE.
     """
-
-    aoi = AOI  # = AOI_MERGED
-
-    # VV dB trước và trong sự kiện
-    pre_vv = load_s1_vv(aoi, pre_start, pre_end)
-    evt_vv = load_s1_vv(aoi, event_start, event_end)
-
-    # chênh lệch dB
-    delta = evt_vv.subtract(pre_vv)  # event - pre (dB)
-
-    # ngưỡng nước từ event
-    otsu = otsu_threshold(evt_vv, aoi, scale)
-    water_evt = evt_vv.lte(otsu)
-
-    # giảm dB đủ mạnh
-    drop = delta.lte(min_diff_db)
-
-    # kết hợp
-    flood = water_evt.And(drop)
-
-    # bỏ nước thường trực + địa hình cao
-    flood = flood.updateMask(jrc_perm_water_mask().Not())
-    if elev_max_m is not None:
-        flood = flood.updateMask(srtm_elev_mask(elev_max_m))
-
-    # đảm bảo band name ổn định để reduceRegion không null
-    flood = flood.updateMask(flood).rename("flood").clip(aoi)
-
-    # --- Thống kê tổng (fallback 0 server-side) ---
-    stats_count = flood.reduceRegion(
-        reducer=ee.Reducer.count(),
-        geometry=aoi,
-        scale=scale,
-        maxPixels=1e13,
-        bestEffort=True,
-    ).get("flood")
-    pixel_count = ee.Number(
-        ee.Algorithms.If(stats_count, stats_count, ee.Number(0))
-    )
-
-    stats_area = flood.multiply(ee.Image.pixelArea()).reduceRegion(
-        reducer=ee.Reducer.sum(),
-        geometry=aoi,
-        scale=scale,
-        maxPixels=1e13,
-        bestEffort=True,
-    ).get("flood")
-    area_m2 = ee.Number(
-        ee.Algorithms.If(stats_area, stats_area, ee.Number(0))
-    )
-    area_km2 = area_m2.divide(1e6)
-
-    # --- Diện tích ngập cho từng khu: HCM / BD / BRVT ---
-    area_km2_hcm = _area_km2_for_region(flood, AOI_HCM, scale)
-    area_km2_bd = _area_km2_for_region(flood, AOI_BD, scale)
-    area_km2_brvt = _area_km2_for_region(flood, AOI_BRVT, scale)
-
-    # --- Vector hóa ---
-    vectors = flood.selfMask().reduceToVectors(
-        geometry=aoi,
+    p = FloodPipeline(
+        pre_start,
+        pre_end,
+        event_start,
+        event_end,
+        min_diff_db=min_diff_db,
+        elev_max_m=elev_max_m,
         scale=scale,
-        maxPixels=1e13,
-        geometryType="polygon",
-        labelProperty="class",
-        eightConnected=True,
     )
-    aoi_fc = ee.FeatureCollection([ee.Feature(aoi, {})])
+    regional = p.regional_stats
 
-    # 👇 TRẢ THÊM 3 ẢNH pre / event / delta
     return {
-        "image": flood,  # mask nhị phân (0/1) cho map & tính toán
-        "aoi": aoi,
-        "pixel_count": pixel_count,
-        "area_km2": area_km2,
-        "area_km2_hcm": area_km2_hcm,
-        "area_km2_bd": area_km2_bd,
-        "area_km2_brvt": area_km2_brvt,
-        "vectors": vectors,
-        "aoi_fc": aoi_fc,
-        "pre_vv_db": pre_vv,
-        "evt_vv_db": evt_vv,
-        "delta_db": delta,
-        # NOTE: nếu sau này bạn muốn tách theo tỉnh,
-        # có thể dùng AOI_HCM, AOI_BD, AOI_BRVT ở đây.
+        "summary": p.summary(
+            ("stats", "regional_stats", "vectors"), max_features=max_features
+        ),
+        "image": p.flood,  # mask nhị phân (0/1) cho map & tính toán
+        "aoi": p.aoi,
+        "pixel_count": ee.Number(p.stats.get("pixel_count")),
+        "area_km2": ee.Number(p.stats.get("area_km2")),
+        "area_km2_hcm": ee.Number(regional.get("area_km2_hcm")),
+        "area_km2_bd": ee.Number(regional.get("area_km2_bd")),
+        "area_km2_brvt": ee.Number(regional.get("area_km2_brvt")),
+        "vectors": p.vectors,
+        "aoi_fc": ee.FeatureCollection([ee.Feature(p.aoi, {})]),
+        "pre_vv_db": p.pre_vv,
+        "evt_vv_db": p.evt_vv,
+        "delta_db": p.delta_db,
     }
 
 
@@ -251,53 +439,22 @@ def detect_flood_stats_only(
     scale: int = 30,
 ):
     """
-    Pipeline giống detect_flood nhưng KHÔNG vector hóa,
-    chỉ trả về (area_km2, pixel_count) dạng ee.Number.
-    Dùng riêng cho generate_flood_timeseries để nhẹ hơn.
+    Chỉ dựng stage "stats" của FloodPipeline (không vector, không ảnh),
+    trả về (area_km2, pixel_count) dạng ee.Number.
+    Dùng riêng cho chuỗi thời gian để nhẹ hơn.
 
     LƯU Ý: vẫn là thống kê TRÊN TOÀN VÙNG SAU SÁP NHẬP (3 tỉnh).
     """
-    aoi = AOI
-
-    pre_vv = load_s1_vv(aoi, pre_start, pre_end)
-    evt_vv = load_s1_vv(aoi, event_start, event_end)
-
-    delta = evt_vv.subtract(pre_vv)
-    otsu = otsu_threshold(evt_vv, aoi, scale)
-    water_evt = evt_vv.lte(otsu)
-    drop = delta.lte(min_diff_db)
-    flood = water_evt.And(drop)
-
-    flood = flood.updateMask(jrc_perm_water_mask().Not())
-    if elev_max_m is not None:
-        flood = flood.updateMask(srtm_elev_mask(elev_max_m))
-
-    flood = flood.updateMask(flood).rename("flood").clip(aoi)
-
-    stats_count = flood.reduceRegion(
-        reducer=ee.Reducer.count(),
-        geometry=aoi,
-        scale=scale,
-        maxPixels=1e13,
-        bestEffort=True,
-    ).get("flood")
-    pixel_count = ee.Number(
-        ee.Algorithms.If(stats_count, stats_count, ee.Number(0))
-    )
-
-    stats_area = flood.multiply(ee.Image.pixelArea()).reduceRegion(
-        reducer=ee.Reducer.sum(),
-        geometry=aoi,
+    stats = FloodPipeline(
+        pre_start,
+        pre_end,
+        event_start,
+        event_end,
+        min_diff_db=min_diff_db,
+        elev_max_m=elev_max_m,
         scale=scale,
-        maxPixels=1e13,
-        bestEffort=True,
-    ).get("flood")
-    area_m2 = ee.Number(
-        ee.Algorithms.If(stats_area, stats_area, ee.Number(0))
-    )
-    area_km2 = area_m2.divide(1e6)
-
-    return area_km2, pixel_count
+    ).stats
+    return ee.Number(stats.get("area_km2")), ee.Number(stats.get("pixel_count"))
 
 
 def to_geojson(fc, max_features: int = 10000):
@@ -426,66 +583,158 @@ def thumb_url(img, region, size: int = 1024, is_mask: bool = True) -> str:
 # ---------- Flood TIMESERIES (dùng cho script precompute) ----------
 
 
-def generate_flood_timeseries(
+def timeseries_dates(
     years: int = 3,
     step_days: int = 45,
-    min_diff_db: float = -2.0,
-    elev_max_m: float = 15,
-    scale: int = 30,
+    start: dt.date = None,
+    end: dt.date = None,
 ):
     """
-    Sinh chuỗi thời gian diện tích ngập.
-    - Mặc định 3 năm gần nhất, mỗi ~45 ngày 1 điểm.
-    - Với mỗi mốc:
-        + pre: từ d-7 tới d-1
-        + event: từ d tới d+2
-    Trả về: list các dict {date, area_km2, pixel_count, ...}
+    Các mốc ngày cho chuỗi thời gian: từ `start` (mặc định today - years)
+    tới `end` (mặc định hôm nay), cách nhau step_days.
     """
-
-    today = dt.date.today()
-    start = today - dt.timedelta(days=365 * years)
+    end = end or dt.date.today()
+    start = start or (end - dt.timedelta(days=365 * years))
 
     dates = []
     d = start
-    while d <= today:
+    while d <= end:
         dates.append(d)
         d += dt.timedelta(days=step_days)
+    return dates
+
+
+def timeseries_window(d: dt.date):
+    """
+    Cửa sổ thời gian cho 1 mốc:
+        + pre: từ d-7 tới d-1
+        + event: từ d tới d+2
+    """
+    return {
+        "pre_start": (d - dt.timedelta(days=7)).isoformat(),
+        "pre_end": (d - dt.timedelta(days=1)).isoformat(),
+        "event_start": d.isoformat(),
+        "event_end": (d + dt.timedelta(days=2)).isoformat(),
+    }
+
+
+def flood_stats_for_date(
+    d: dt.date,
+    min_diff_db: float = -2.0,
+    elev_max_m: float = 15,
+    scale: int = 30,
+):
+    """
+    Tính {date, area_km2, pixel_count, pre/event window} cho 1 mốc,
+    gộp 2 số vào 1 ee.Dictionary -> đúng 1 lần getInfo.
+    Lỗi EE được ném ra cho caller quyết định (ghi lại / thử lại).
+    """
+    win = timeseries_window(d)
+    stats = FloodPipeline(
+        min_diff_db=min_diff_db,
+        elev_max_m=elev_max_m,
+        scale=scale,
+        **win,
+    ).stats.getInfo()
+
+    return {
+        "date": d.isoformat(),
+        "area_km2": float(stats["area_km2"]),
+        "pixel_count": int(stats["pixel_count"]),
+        **win,
+    }
 
-    series = []
 
-    for d in dates:
-        pre_start = (d - dt.timedelta(days=7)).isoformat()
-        pre_end = (d - dt.timedelta(days=1)).isoformat()
-        event_start = d.isoformat()
-        event_end = (d + dt.timedelta(days=2)).isoformat()
+def flood_stats_batch(
+    dates,
+    min_diff_db: float = -2.0,
+    elev_max_m: float = 15,
+    scale: int = 30,
+):
+    """
+    Phiên bản batch của flood_stats_for_date: dựng 1 FeatureCollection
+    (mỗi feature = 1 cửa sổ pre/event), map pipeline stats phía server,
+    rồi lấy toàn bộ area/pixel về bằng ĐÚNG 1 getInfo cho cả lô.
+
+    Lô quá lớn có thể vượt giới hạn bộ nhớ / thời gian của EE ->
+    caller tự chia nhỏ lô (xem precompute_timeseries.py).
+    """
+    windows = [{"date": d.isoformat(), **timeseries_window(d)} for d in dates]
+    fc = ee.FeatureCollection([ee.Feature(None, w) for w in windows])
+
+    def _stats(f):
+        stats = FloodPipeline(
+            pre_start=ee.Date(f.get("pre_start")),
+            pre_end=ee.Date(f.get("pre_end")),
+            event_start=ee.Date(f.get("event_start")),
+            event_end=ee.Date(f.get("event_end")),
+            min_diff_db=min_diff_db,
+            elev_max_m=elev_max_m,
+            scale=scale,
+        ).stats
+        return ee.Feature(None, stats)
+
+    stats_fc = fc.map(_stats)
+    out = ee.Dictionary(
+        {
+            "area_km2": stats_fc.aggregate_array("area_km2"),
+            "pixel_count": stats_fc.aggregate_array("pixel_count"),
+        }
+    ).getInfo()
+
+    areas = out["area_km2"]
+    pixels = out["pixel_count"]
+    if len(areas) != len(windows) or len(pixels) != len(windows):
+        raise RuntimeError(
+            f"Batch trả về {len(areas)}/{len(windows)} giá trị (thiếu kết quả)"
+        )
+
+    return [
+        {
+            "date": w["date"],
+            "area_km2": float(a),
+            "pixel_count": int(p),
+            "pre_start": w["pre_start"],
+            "pre_end": w["pre_end"],
+            "event_start": w["event_start"],
+            "event_end": w["event_end"],
+        }
+        for w, a, p in zip(windows, areas, pixels)
+    ]
+
+
+def generate_flood_timeseries(
+    years: int = 3,
+    step_days: int = 45,
+    min_diff_db: float = -2.0,
+    elev_max_m: float = 15,
+    scale: int = 30,
+    failures: list = None,
+):
+    """
+    Sinh chuỗi thời gian diện tích ngập (tuần tự; bản song song, resume được
+    nằm trong precompute_timeseries.py).
+    - Mặc định 3 năm gần nhất, mỗi ~45 ngày 1 điểm.
+    - Mốc nào lỗi được bỏ qua trong kết quả, nhưng ghi vào `failures`
+      (nếu truyền vào) dạng {date, error}.
+    Trả về: list các dict {date, area_km2, pixel_count, ...}
+    """
+    series = []
 
+    for d in timeseries_dates(years=years, step_days=step_days):
         try:
-            area_ee, pixels_ee = detect_flood_stats_only(
-                pre_start=pre_start,
-                pre_end=pre_end,
-                event_start=event_start,
-                event_end=event_end,
+            rec = flood_stats_for_date(
+                d,
                 min_diff_db=min_diff_db,
                 elev_max_m=elev_max_m,
                 scale=scale,
             )
-
-            area_km2 = float(area_ee.getInfo())
-            pixel_count = int(pixels_ee.getInfo())
-        except Exception:
+        except Exception as e:
+            if failures is not None:
+                failures.append({"date": d.isoformat(), "error": str(e)})
             continue
 
-        series.append(
-            {
-                "date": d.isoformat(),
-                "area_km2": area_km2,
-                "pixel_count": pixel_count,
-                "pre_start": pre_start,
-                "pre_end": pre_end,
-                "event_start": event_start,
-                "event_end": event_end,
-            }
-        )
+        series.append(rec)
 
     return series
 
@@ -553,23 +802,10 @@ def rainfall_timeseries(
 
 def _pearson_corr(xs, ys):
     """
-    Tính hệ số tương quan Pearson đơn giản cho 2 list số.
+    Hệ số tương quan Pearson cho 2 list số (NumPy, xem correlation.py).
     Trả về None nếu ít hơn 2 phần tử hoặc phương sai bằng 0.
     """
-    n = len(xs)
-    if n < 2:
-        return None
-
-    mean_x = sum(xs) / n
-    mean_y = sum(ys) / n
-
-    var_x = sum((x - mean_x) ** 2 for x in xs)
-    var_y = sum((y - mean_y) ** 2 for y in ys)
-    if var_x == 0 or var_y == 0:
-        return None
-
-    cov = sum((xs[i] - mean_x) * (ys[i] - mean_y) for i in range(n))
-    return cov / (var_x ** 0.5 * var_y ** 0.5)
+    return pearson(xs, ys)
 
 
 def flood_rain_correlation(
@@ -640,12 +876,14 @@ def flood_rain_correlation(
 def flood_rain_correlation_from_cached(
     flood_series,
     rainfall_scale: int = 5000,
+    rain_series=None,
 ):
     """
     Nhận sẵn flood_series (list dict từ JSON cache),
     chỉ gọi CHIRPS cho mưa và tính tương quan.
 
     flood_series: [{ "date": "YYYY-MM-DD", "area_km2": float, ... }, ...]
+    rain_series: nếu truyền sẵn (vd. từ RainfallStore) thì không gọi CHIRPS.
     """
     if not flood_series:
         return {"data": [], "corr": None}
@@ -658,11 +896,12 @@ def flood_rain_correlation_from_cached(
     start_date = min(dates).isoformat()
     end_date = max(dates).isoformat()
 
-    rain_series = rainfall_timeseries(
-        start_date=start_date,
-        end_date=end_date,
-        scale=rainfall_scale,
-    )
+    if rain_series is None:
+        rain_series = rainfall_timeseries(
+            start_date=start_date,
+            end_date=end_date,
+            scale=rainfall_scale,
+        )
 
     rain_map = {r["date"]: r["rain_mm"] for r in rain_series}
 
@@ -0,0 +1,158 @@
+import json
+import threading
+import datetime as dt
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+from .result_cache import CACHE_DIR
+
+# ============================================================
+#  CACHE MƯA CHIRPS DAILY TRÊN ĐĨA, CHỈ LẤP CÁC KHOẢNG CÒN THIẾU
+# ============================================================
+# Mưa CHIRPS của ngày đã qua không đổi -> lưu theo (date, scale).
+# Mỗi scale 1 file JSON:
+#   {"values": {"YYYY-MM-DD": rain_mm, ...},
+#    "covered": [[ordinal_from, ordinal_to], ...]}   # đã hỏi EE (bao gồm 2 đầu)
+# Request chỉ gọi EE cho phần [start, end) chưa nằm trong "covered".
+
+RAINFALL_DIR = CACHE_DIR / "rainfall"
+
+# CHIRPS có độ trễ vài tuần: khoảng không có dữ liệu nhưng cũ hơn
+# STABLE_LAG_DAYS được coi là "đã hỏi, thật sự không có" -> không hỏi lại.
+STABLE_LAG_DAYS = 60
+
+Interval = Tuple[int, int]
+
+
+def _merge(intervals: List[Interval]) -> List[Interval]:
+    out: List[Interval] = []
+    for a, b in sorted(intervals):
+        if out and a <= out[-1][1] + 1:
+            out[-1] = (out[-1][0], max(out[-1][1], b))
+        else:
+            out.append((a, b))
+    return out
+
+
+def _gaps(lo: int, hi: int, covered: List[Interval]) -> List[Interval]:
+    """Các khoảng con của [lo, hi] chưa nằm trong covered (đã merge, sort)."""
+    gaps = []
+    cur = lo
+    for a, b in covered:
+        if b < cur:
+            continue
+        if a > hi:
+            break
+        if a > cur:
+            gaps.append((cur, a - 1))
+        cur = max(cur, b + 1)
+        if cur > hi:
+            break
+    if cur <= hi:
+        gaps.append((cur, hi))
+    return gaps
+
+
+class _ScaleCache:
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.values: Dict[str, float] = {}
+        self.covered: List[Interval] = []
+        self.loaded = False
+
+    def load(self):
+        if self.loaded:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.values = {k: float(v) for k, v in data.get("values", {}).items()}
+            self.covered = _merge([tuple(iv) for iv in data.get("covered", [])])
+        except (OSError, ValueError):
+            self.values, self.covered = {}, []
+        self.loaded = True
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {"values": self.values, "covered": [list(iv) for iv in self.covered]},
+                f,
+                separators=(",", ":"),
+            )
+        tmp.replace(self.path)
+
+
+class RainfallStore:
+    """
+    get_series(start, end, scale) trả về giống processing.rainfall_timeseries
+    ([{date, rain_mm}], ngày trong [start, end)), nhưng chỉ gọi `fetch`
+    (mặc định rainfall_timeseries) cho các khoảng chưa có trong cache.
+    """
+
+    def __init__(self, fetch: Callable[..., List[Dict[str, Any]]], base_dir: Path = RAINFALL_DIR):
+        self.fetch = fetch
+        self.base_dir = base_dir
+        self._caches: Dict[int, _ScaleCache] = {}
+        self._lock = threading.Lock()
+        self.ee_fetches = 0
+
+    def _cache(self, scale: int) -> _ScaleCache:
+        with self._lock:
+            c = self._caches.get(scale)
+            if c is None:
+                c = _ScaleCache(self.base_dir / f"chirps_{int(scale)}.json")
+                self._caches[scale] = c
+            return c
+
+    def get_series(self, start_date: str, end_date: str, scale: int = 5000):
+        start = dt.date.fromisoformat(start_date[:10])
+        end = dt.date.fromisoformat(end_date[:10])  # exclusive (như filterDate)
+        lo, hi = start.toordinal(), end.toordinal() - 1
+        if hi < lo:
+            return []
+
+        c = self._cache(scale)
+        with c.lock:
+            c.load()
+            gaps = _gaps(lo, hi, c.covered)
+            if gaps:
+                self._fill(c, gaps, scale)
+
+            out = []
+            for o in range(lo, hi + 1):
+                d = dt.date.fromordinal(o).isoformat()
+                if d in c.values:
+                    out.append({"date": d, "rain_mm": c.values[d]})
+            return out
+
+    def _fill(self, c: _ScaleCache, gaps: List[Interval], scale: int):
+        stable_before = (dt.date.today() - dt.timedelta(days=STABLE_LAG_DAYS)).toordinal()
+        new_cover = []
+        for a, b in gaps:
+            rows = self.fetch(
+                start_date=dt.date.fromordinal(a).isoformat(),
+                end_date=dt.date.fromordinal(b + 1).isoformat(),
+                scale=scale,
+            )
+            self.ee_fetches += 1
+
+            last = None
+            for r in rows:
+                d = r.get("date")
+                if not d:
+                    continue
+                c.values[d] = float(r.get("rain_mm") or 0.0)
+                o = dt.date.fromisoformat(d).toordinal()
+                last = o if last is None else max(last, o)
+
+            # chỉ đánh dấu "đã có" tới ngày cuối EE trả về; phần cũ hơn
+            # STABLE_LAG_DAYS thì coi như ổn định dù không có ảnh
+            upto = max(last if last is not None else a - 1, min(b, stable_before))
+            if upto >= a:
+                new_cover.append((a, min(b, upto)))
+
+        c.covered = _merge(c.covered + new_cover)
+        c.save()
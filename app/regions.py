@@ -0,0 +1,118 @@
+# ============================================================
+#  RANH GIỚI AOI / TỪNG KHU: LẤY 1 LẦN, LƯU FILE, PHỤC VỤ TỪ RAM
+# ============================================================
+# Ranh giới HCM / BD / BRVT / merged là dữ liệu tĩnh: lấy từ GEE đúng
+# 1 lần (1 getInfo), lưu ra file JSON có version stamp, sau đó phục vụ
+# hoàn toàn từ RAM (kèm body gzip / br dựng sẵn cho /aoi).
+#
+# Tạo trước file khi build:
+#     python -m app.regions
+
+import gzip
+import json
+import hashlib
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import ee
+
+from .ee_utils import get_info
+from .fastjson import brotli, dumps, round_geojson
+from .processing import REGION_ASSETS
+
+REGIONS_PATH = Path(__file__).resolve().parent / "regions_geojson.json"
+
+# Đổi FORMAT_VERSION khi thay cấu trúc file; đổi asset -> stamp tự đổi.
+FORMAT_VERSION = 1
+REGIONS_VERSION = hashlib.sha256(
+    json.dumps(
+        {"format": FORMAT_VERSION, "assets": REGION_ASSETS}, sort_keys=True
+    ).encode("utf-8")
+).hexdigest()[:16]
+
+
+def fetch_regions() -> Dict[str, Any]:
+    """Lấy GeoJSON (FeatureCollection 1 feature) cho cả 4 khu bằng 1 getInfo."""
+    fcs = {
+        name: ee.FeatureCollection(
+            ee.Feature(ee.FeatureCollection(asset).geometry())
+        )
+        for name, asset in REGION_ASSETS.items()
+    }
+    return get_info(ee.Dictionary(fcs))
+
+
+class RegionStore:
+    """Giữ GeoJSON ranh giới trong RAM; nạp từ file, thiếu/cũ thì lấy từ GEE."""
+
+    def __init__(self, path: Path = REGIONS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.regions: Optional[Dict[str, Any]] = None
+        # body /aoi theo Content-Encoding (None = không nén)
+        self.aoi_bodies: Dict[Optional[str], bytes] = {}
+
+    def _read_file(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != REGIONS_VERSION:
+            return None
+        return data.get("regions")
+
+    def _write_file(self, regions: Dict[str, Any]):
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {"version": REGIONS_VERSION, "regions": regions},
+                f,
+                ensure_ascii=False,
+            )
+        tmp.replace(self.path)
+
+    def _set(self, regions: Dict[str, Any]):
+        # tọa độ làm tròn 1 lần khi nạp: /aoi và regions_geojson của /flood
+        # đều nhỏ hơn
+        regions = {name: round_geojson(fc) for name, fc in regions.items()}
+        body = dumps({"aoi_geojson": regions["merged"]})
+        bodies = {None: body, "gzip": gzip.compress(body, compresslevel=9)}
+        if brotli is not None:
+            bodies["br"] = brotli.compress(body, quality=11)
+        self.aoi_bodies = bodies
+        self.regions = regions
+
+    def load(self, refresh: bool = False) -> Dict[str, Any]:
+        """
+        Nạp ranh giới vào RAM (thread-safe, chỉ gọi GEE khi file
+        chưa có / sai version / refresh=True).
+        """
+        if self.regions is not None and not refresh:
+            return self.regions
+
+        with self._lock:
+            if self.regions is not None and not refresh:
+                return self.regions
+
+            regions = None if refresh else self._read_file()
+            if regions is None:
+                regions = fetch_regions()
+                self._write_file(regions)
+
+            self._set(regions)
+            return self.regions
+
+
+region_store = RegionStore()
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from .ee_utils import init_ee
+
+    load_dotenv()
+    init_ee()
+    regs = region_store.load(refresh=True)
+    print(f"Saved {len(regs)} regions (version {REGIONS_VERSION}) to {REGIONS_PATH}")
@@ -0,0 +1,218 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# ============================================================
+#  CACHE KẾT QUẢ 2 TẦNG: LRU TRONG RAM + FILE JSON TRÊN ĐĨA
+# ============================================================
+
+CACHE_DIR = Path(
+    os.getenv("CACHE_DIR", Path(__file__).resolve().parent / ".cache")
+)
+
+
+def cache_key(namespace: str, params: Dict[str, Any]) -> str:
+    """
+    Khóa nội dung (content-addressed): sha256 của JSON đã chuẩn hóa
+    (sort_keys, không khoảng trắng) -> cùng tham số luôn cùng khóa.
+    """
+    payload = json.dumps(
+        params, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    digest = hashlib.sha256(f"{namespace}:{payload}".encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+class ResultCache:
+    """
+    Cache dict JSON-serializable theo khóa:
+    - Tầng RAM: LRU tối đa `max_items` phần tử.
+    - Tầng đĩa: mỗi khóa 1 file <dir>/<key>.json, tổng dung lượng
+      tối đa `max_disk_bytes` (xóa file ít dùng nhất theo mtime tới khi
+      còn ~90%). Tổng dung lượng giữ trong RAM: chỉ quét thư mục lần
+      đầu và khi vượt giới hạn, không phải mỗi lần set().
+    - TTL áp dụng cho cả 2 tầng (ttl_s <= 0 -> không hết hạn).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_items: int = 128,
+        ttl_s: float = 3600,
+        max_disk_bytes: int = 256 * 1024 * 1024,
+        disk_dir: Optional[Path] = None,
+    ):
+        self.name = name
+        self.max_items = max_items
+        self.ttl_s = ttl_s
+        self.max_disk_bytes = max_disk_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir else CACHE_DIR / name
+
+        self._mem: "OrderedDict[str, tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_total: Optional[int] = None  # None = chưa quét thư mục
+        self._counters = {
+            "mem_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "evictions": 0,
+            "expired": 0,
+        }
+
+    # ---------- helpers ----------
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl_s > 0 and (time.time() - created) > self.ttl_s
+
+    def _path(self, key: str) -> Path:
+        return self.disk_dir / f"{key}.json"
+
+    def _mem_put(self, key: str, created: float, value: Dict[str, Any]):
+        self._mem[key] = (created, value)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_items:
+            self._mem.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    # ---------- API ----------
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            item = self._mem.get(key)
+            if item is not None:
+                created, value = item
+                if not self._expired(created):
+                    self._mem.move_to_end(key)
+                    self._counters["mem_hits"] += 1
+                    return value
+                del self._mem[key]
+                self._counters["expired"] += 1
+
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self._counters["misses"] += 1
+            return None
+
+        created = float(entry.get("created", 0))
+        if self._expired(created):
+            self._unlink(path)
+            with self._lock:
+                self._counters["expired"] += 1
+                self._counters["misses"] += 1
+            return None
+
+        # "chạm" file để LRU trên đĩa biết là vừa dùng
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+        value = entry.get("value")
+        with self._lock:
+            self._mem_put(key, created, value)
+            self._counters["disk_hits"] += 1
+        return value
+
+    def set(self, key: str, value: Dict[str, Any]):
+        created = time.time()
+        with self._lock:
+            self._mem_put(key, created, value)
+            self._counters["sets"] += 1
+
+        self.disk_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        try:
+            old = path.stat().st_size
+        except OSError:
+            old = 0
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"created": created, "value": value}, f, ensure_ascii=False)
+        size = tmp.stat().st_size
+        os.replace(tmp, path)
+
+        with self._lock:
+            if self._disk_total is not None:
+                self._disk_total += size - old
+            need_scan = self._disk_total is None or self._disk_total > self.max_disk_bytes
+        if need_scan:
+            self._evict_disk()
+
+    def _unlink(self, path: Path):
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except OSError:
+            return
+        with self._lock:
+            if self._disk_total is not None:
+                self._disk_total -= size
+
+    def _evict_disk(self):
+        """Xóa file hết hạn + file ít dùng nhất cho tới khi còn ~90% giới hạn."""
+        try:
+            files = [(p, p.stat()) for p in self.disk_dir.glob("*.json")]
+        except OSError:
+            return
+
+        now = time.time()
+        alive = []
+        for p, st in files:
+            if self.ttl_s > 0 and now - st.st_mtime > self.ttl_s:
+                # created <= mtime nên file này chắc chắn đã hết hạn
+                p.unlink(missing_ok=True)
+                with self._lock:
+                    self._counters["expired"] += 1
+            else:
+                alive.append((p, st))
+
+        total = sum(st.st_size for _, st in alive)
+        if total > self.max_disk_bytes:
+            target = int(self.max_disk_bytes * 0.9)
+            alive.sort(key=lambda it: it[1].st_mtime)
+            for p, st in alive:
+                if total <= target:
+                    break
+                p.unlink(missing_ok=True)
+                total -= st.st_size
+                with self._lock:
+                    self._counters["evictions"] += 1
+
+        with self._lock:
+            self._disk_total = total
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+            self._disk_total = None
+        for p in self.disk_dir.glob("*.json"):
+            p.unlink(missing_ok=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            mem_items = len(self._mem)
+            disk_bytes = self._disk_total
+        hits = counters["mem_hits"] + counters["disk_hits"]
+        lookups = hits + counters["misses"]
+        return {
+            "name": self.name,
+            **counters,
+            "hits": hits,
+            "hit_ratio": (hits / lookups) if lookups else None,
+            "mem_items": mem_items,
+            "max_items": self.max_items,
+            "ttl_s": self.ttl_s,
+            "disk_bytes": disk_bytes,
+            "max_disk_bytes": self.max_disk_bytes,
+        }
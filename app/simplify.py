@@ -0,0 +1,275 @@
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# ============================================================
+#  ĐƠN GIẢN HÓA POLYGON NGẬP THEO ZOOM (DOUGLAS–PEUCKER) + NGÂN SÁCH ĐỈNH
+# ============================================================
+# - Polygon từ reduceToVectors ở 30 m có cạnh răng cưa theo pixel -> rất
+#   nhiều đỉnh thừa. Douglas–Peucker với dung sai ~ LOD_PIXEL_TOL pixel
+#   màn hình ở zoom z là đủ để không thấy khác biệt trên bản đồ.
+# - simplify_to_budget(): tăng dung sai tới khi tổng số đỉnh <= max_vertices
+#   (dừng sớm nếu tăng tiếp làm mất cả ring), vẫn vượt thì giữ các polygon
+#   lớn nhất tới khi đầy ngân sách.
+# - Tọa độ GeoJSON là lon/lat (độ) -> dung sai tính bằng độ.
+
+LOD_ZOOMS = tuple(
+    int(z) for z in os.getenv("LOD_ZOOMS", "8,10,12,14").split(",") if z.strip()
+)
+LOD_PIXEL_TOL = float(os.getenv("LOD_PIXEL_TOL", "1.0"))
+# ngân sách đỉnh mặc định cho mỗi mức LOD dựng sẵn
+LOD_MAX_VERTICES = int(os.getenv("LOD_MAX_VERTICES", "50000"))
+
+# dung sai mức "đầy đủ" (zoom vượt LOD_ZOOMS): ~0.1 m, bằng độ chính xác
+# tọa độ đã làm tròn -> chỉ bỏ đỉnh thẳng hàng trên cạnh pixel 30 m
+COLLINEAR_TOL = 1e-6
+
+# số lần nhân đôi dung sai tối đa khi ép ngân sách đỉnh
+_MAX_GROW = 12
+
+
+def tolerance_for_zoom(zoom: float, pixels: float = LOD_PIXEL_TOL) -> float:
+    """Dung sai (độ) ứng với `pixels` pixel tile 256 px ở mức zoom."""
+    return pixels * 360.0 / (256.0 * 2.0 ** zoom)
+
+
+def lod_level(zoom: float) -> Optional[int]:
+    """Mức LOD cache cho 1 zoom: mức lớn nhất <= zoom; None = vượt mức mịn nhất."""
+    if zoom > max(LOD_ZOOMS):
+        return None
+    lower = [z for z in LOD_ZOOMS if z <= zoom]
+    return max(lower) if lower else min(LOD_ZOOMS)
+
+
+def _dp_keep(pts: np.ndarray, starts: np.ndarray, ends: np.ndarray, tol: float) -> np.ndarray:
+    """
+    Mask các điểm giữ lại theo Douglas–Peucker cho NHIỀU ring cùng lúc
+    (ring k = pts[starts[k] .. ends[k]]). Mỗi vòng lặp xử lý mọi đoạn đang
+    chờ của mọi ring bằng NumPy -> số vòng lặp Python ~ độ sâu phân tách,
+    không phụ thuộc số ring / số điểm.
+    """
+    keep = np.zeros(len(pts), dtype=bool)
+    keep[starts] = True
+    keep[ends] = True
+
+    xs = np.ascontiguousarray(pts[:, 0])
+    ys = np.ascontiguousarray(pts[:, 1])
+    tol2 = tol * tol
+    i, j = starts.copy(), ends.copy()
+    while len(i):
+        m = j - i - 1  # số điểm bên trong mỗi đoạn
+        sel = m > 0
+        i, j, m = i[sel], j[sel], m[sel]
+        if not len(i):
+            break
+
+        first_of = np.cumsum(m) - m
+        seg = np.repeat(np.arange(len(i)), m)
+        idx = np.repeat(i + 1 - first_of, m) + np.arange(int(m.sum()))
+
+        ax, ay = xs[i], ys[i]
+        abx, aby = xs[j] - ax, ys[j] - ay
+        l2 = abx * abx + aby * aby
+        # ring khép kín: đoạn đầu–cuối suy biến thành 1 điểm -> khoảng cách tới điểm
+        inv = np.divide(1.0, l2, out=np.zeros_like(l2), where=l2 > 0)
+
+        vx = xs[idx] - ax[seg]
+        vy = ys[idx] - ay[seg]
+        sabx, saby = abx[seg], aby[seg]
+        t = np.clip((vx * sabx + vy * saby) * inv[seg], 0.0, 1.0)
+        dx = vx - t * sabx
+        dy = vy - t * saby
+        d2 = dx * dx + dy * dy
+
+        seg_max = np.maximum.reduceat(d2, first_of)
+        hits = np.flatnonzero(d2 == seg_max[seg])
+        hs = seg[hits]
+        first_hit = np.ones(len(hits), dtype=bool)
+        first_hit[1:] = hs[1:] != hs[:-1]
+        far = idx[hits[first_hit]]  # điểm xa nhất (đầu tiên) của mỗi đoạn
+
+        split = seg_max > tol2
+        mid = far[split]
+        keep[mid] = True
+        i = np.concatenate([i[split], mid])
+        j = np.concatenate([mid, j[split]])
+    return keep
+
+
+class _Flat:
+    """
+    Mọi ring của mọi feature nối thành 1 mảng điểm. reduce(tol) trả về
+    _Flat mới chỉ còn các điểm giữ lại -> ép ngân sách bằng cách đơn giản
+    hóa tiếp kết quả trước (mảng nhỏ dần) thay vì làm lại từ đầu.
+    """
+
+    def __init__(self, features: List[Dict[str, Any]]):
+        self.features = features
+        self.rings: List[Tuple[int, int, int]] = []  # (feature, polygon, ring)
+        chunks = []
+        lengths = []
+        for fi, f in enumerate(features):
+            for pi, poly in enumerate(_polygons(f.get("geometry"))):
+                for ri, ring in enumerate(poly):
+                    if len(ring) < 4:
+                        continue
+                    self.rings.append((fi, pi, ri))
+                    chunks.append(np.asarray(ring, dtype=float)[:, :2])
+                    lengths.append(len(ring))
+
+        self.pts = np.concatenate(chunks) if chunks else np.zeros((0, 2))
+        self._set_lengths(np.asarray(lengths, dtype=np.int64))
+
+    def _set_lengths(self, lengths: np.ndarray):
+        self.lengths = lengths
+        self.starts = np.cumsum(lengths) - lengths
+        self.ends = self.starts + lengths - 1
+
+    @property
+    def vertices(self) -> int:
+        return len(self.pts)
+
+    def reduce(self, tol: float) -> "_Flat":
+        """Douglas–Peucker với dung sai tol; ring < 4 điểm và lỗ của polygon mất vòng ngoài bị bỏ."""
+        if tol <= 0 or not len(self.pts):
+            return self
+        keep = _dp_keep(self.pts, self.starts, self.ends, tol)
+        kept = np.add.reduceat(keep, self.starts)
+
+        ok = kept >= 4
+        outer_ok = {(fi, pi) for (fi, pi, ri), o in zip(self.rings, ok) if ri == 0 and o}
+        ok &= np.fromiter(
+            ((fi, pi) in outer_ok for fi, pi, _ in self.rings), dtype=bool, count=len(ok)
+        )
+
+        out = _Flat.__new__(_Flat)
+        out.features = self.features
+        out.rings = [r for r, o in zip(self.rings, ok) if o]
+        out.pts = self.pts[keep & np.repeat(ok, self.lengths)]
+        out._set_lengths(kept[ok])
+        return out
+
+    def to_features(self) -> List[Dict[str, Any]]:
+        polys: Dict[Tuple[int, int], List[list]] = {}
+        for (fi, pi, _), s, e in zip(self.rings, self.starts, self.ends):
+            # ring theo thứ tự gốc: vòng ngoài (ri = 0) luôn đứng đầu
+            polys.setdefault((fi, pi), []).append(self.pts[s : e + 1].tolist())
+
+        by_feature: Dict[int, List[list]] = {}
+        for (fi, _), rings in polys.items():
+            by_feature.setdefault(fi, []).append(rings)
+
+        out = []
+        for fi in sorted(by_feature):
+            f = self.features[fi]
+            ps = by_feature[fi]
+            if f["geometry"]["type"] == "Polygon":
+                geom = {"type": "Polygon", "coordinates": ps[0]}
+            else:
+                geom = {"type": "MultiPolygon", "coordinates": ps}
+            out.append({**f, "geometry": geom})
+        return out
+
+
+def simplify_geometry(geom: Dict[str, Any], tol: float) -> Optional[Dict[str, Any]]:
+    """Polygon / MultiPolygon đã đơn giản hóa; None nếu sụp hết."""
+    out = _Flat([{"geometry": geom}]).reduce(tol).to_features()
+    return out[0]["geometry"] if out else None
+
+
+def _polygons(geom: Dict[str, Any]) -> List[list]:
+    if not geom:
+        return []
+    if geom.get("type") == "Polygon":
+        return [geom.get("coordinates") or []]
+    if geom.get("type") == "MultiPolygon":
+        return geom.get("coordinates") or []
+    return []
+
+
+def simplify_features(fc: Dict[str, Any], tol: float) -> Dict[str, Any]:
+    """FeatureCollection đơn giản hóa với đúng dung sai tol (không ép ngân sách)."""
+    features = [f for f in fc.get("features") or [] if _polygons(f.get("geometry"))]
+    return {"type": "FeatureCollection", "features": _Flat(features).reduce(tol).to_features()}
+
+
+def count_vertices(geom: Dict[str, Any]) -> int:
+    return sum(len(r) for p in _polygons(geom) for r in p)
+
+
+def _outer_area(geom: Dict[str, Any]) -> float:
+    """Diện tích (độ², shoelace) các vòng ngoài – chỉ để xếp hạng to/nhỏ."""
+    total = 0.0
+    for p in _polygons(geom):
+        if not p:
+            continue
+        xy = np.asarray(p[0], dtype=float)
+        if len(xy) < 3:
+            continue
+        x, y = xy[:, 0], xy[:, 1]
+        total += 0.5 * abs(float(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1))))
+    return total
+
+
+def simplify_to_budget(
+    fc: Dict[str, Any], max_vertices: int, tol: float
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Đơn giản hóa FeatureCollection với dung sai >= tol sao cho tổng đỉnh
+    <= max_vertices. Trả về (FeatureCollection, thông tin LOD).
+    """
+    features = [
+        f for f in fc.get("features") or [] if _polygons(f.get("geometry"))
+    ]
+    full_vertices = sum(count_vertices(f.get("geometry")) for f in features)
+
+    flat = _Flat(features).reduce(tol)
+    grow = 0
+    while flat.vertices > max_vertices and grow < _MAX_GROW:
+        nxt_tol = tol * 2.0 if tol > 0 else tolerance_for_zoom(20)
+        nxt = flat.reduce(nxt_tol)
+        if len(nxt.rings) < len(flat.rings):
+            # dung sai bắt đầu xóa cả ring (polygon cỡ pixel sụp) -> dừng,
+            # phần vượt ngân sách xử lý bằng cách giữ polygon lớn nhất
+            break
+        tol, flat = nxt_tol, nxt
+        grow += 1
+    out, vertices = flat.to_features(), flat.vertices
+
+    dropped = len(features) - len(out)
+    if vertices > max_vertices:
+        # vẫn vượt ngân sách -> giữ các polygon lớn nhất
+        kept, vertices = [], 0
+        for f in sorted(out, key=lambda f: _outer_area(f["geometry"]), reverse=True):
+            n = count_vertices(f["geometry"])
+            if vertices + n > max_vertices:
+                continue
+            kept.append(f)
+            vertices += n
+        dropped = len(features) - len(kept)
+        out = kept
+
+    info = {
+        "tolerance_deg": tol,
+        "vertices": vertices,
+        "full_vertices": full_vertices,
+        "features": len(out),
+        "dropped_features": dropped,
+    }
+    return {"type": "FeatureCollection", "features": out}, info
+
+
+def build_lods(fc: Dict[str, Any], max_vertices: int) -> Dict[str, Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """
+    Mọi mức LOD_ZOOMS -> {str(zoom): (FeatureCollection, info)}.
+    Dựng từ mức mịn nhất, mức thô hơn đơn giản hóa tiếp từ mức trước.
+    """
+    full_vertices = sum(count_vertices(f.get("geometry")) for f in fc.get("features") or [])
+    lods = {}
+    src = fc
+    for z in sorted(LOD_ZOOMS, reverse=True):
+        src, info = simplify_to_budget(src, max_vertices, tolerance_for_zoom(z))
+        info["full_vertices"] = full_vertices
+        lods[str(z)] = (src, info)
+    return lods
@@ -0,0 +1,43 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+# ============================================================
+#  SINGLE-FLIGHT: GỘP CÁC REQUEST GIỐNG HỆT ĐANG CHẠY DỞ
+# ============================================================
+# Nhiều người dùng gửi cùng 1 /flood hoặc /correlation trong vài giây
+# -> chỉ request đầu tiên chạy tính toán EE, các request sau (cùng khóa)
+# chờ chung 1 task và nhận cùng kết quả / cùng lỗi.
+# Tính toán chạy trong task riêng: request đầu bị hủy (client ngắt kết
+# nối) thì các request đang chờ vẫn nhận được kết quả.
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.shared = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            self.leaders += 1
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _done(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # tránh cảnh báo "exception was never retrieved" khi mọi caller đã hủy
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "inflight": len(self._inflight),
+            "leaders": self.leaders,
+            "shared": self.shared,
+        }
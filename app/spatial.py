@@ -0,0 +1,286 @@
+import os
+import math
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .mvt import clip_ring
+
+# ============================================================
+#  CHỈ MỤC KHÔNG GIAN CHO POLYGON NGẬP (STR R-TREE BẰNG NUMPY)
+# ============================================================
+# - FloodIndex(fc): dựng 1 lần từ polygon đầy đủ của 1 kết quả /flood.
+#   bbox từng feature đóng gói kiểu STR (sort-tile-recursive), mỗi nút
+#   INDEX_NODE_CAP con; cạnh của mọi ring xếp theo (feature, dải ngang).
+# - Truy vấn theo lô: mọi điểm / bbox đi xuống cây cùng lúc (mảng cặp
+#   (truy vấn, nút)), rồi kiểm tra chính xác:
+#     * điểm: ray casting chẵn-lẻ trên các cạnh cùng dải ngang với điểm
+#       của feature ứng viên (lỗ và MultiPolygon tự đúng);
+#     * bbox: cắt ring theo bbox -> diện tích giao (km², phép chiếu
+#       sinusoidal – đồng diện tích).
+# - IndexStore: LRU nhỏ các FloodIndex theo result_key (trong RAM).
+
+INDEX_NODE_CAP = 16
+INDEX_MAX_ITEMS = int(os.getenv("SPATIAL_INDEX_ITEMS", "8"))
+QUERY_MAX_POINTS = int(os.getenv("QUERY_MAX_POINTS", "50000"))
+QUERY_MAX_BBOXES = int(os.getenv("QUERY_MAX_BBOXES", "1000"))
+
+EARTH_RADIUS_KM = 6371.0088
+
+# số cặp (điểm, cạnh) tối đa mỗi khối ray casting
+_PIP_CHUNK = 4_000_000
+# cạnh mỗi feature chia theo dải ngang ~_BAND_EDGES cạnh/dải: tia ngang từ
+# 1 điểm chỉ cắt được cạnh cùng dải -> chỉ cần thử các cạnh đó
+_BAND_EDGES = 16
+_MAX_BANDS = 256
+
+
+def _overlap(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """a, b: (n, 4) minx, miny, maxx, maxy -> mask giao nhau từng cặp."""
+    return (
+        (a[:, 0] <= b[:, 2])
+        & (a[:, 2] >= b[:, 0])
+        & (a[:, 1] <= b[:, 3])
+        & (a[:, 3] >= b[:, 1])
+    )
+
+
+def _ring_area_km2(ring: np.ndarray) -> float:
+    """|diện tích| ring lon/lat (độ) theo phép chiếu sinusoidal."""
+    if len(ring) < 3:
+        return 0.0
+    lat = np.radians(ring[:, 1])
+    x = np.radians(ring[:, 0]) * np.cos(lat)
+    y = lat
+    a = np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y)
+    return abs(float(a)) * 0.5 * EARTH_RADIUS_KM**2
+
+
+class FloodIndex:
+    def __init__(self, fc: Dict[str, Any]):
+        # feature -> danh sách polygon -> danh sách ring mở (n, 2)
+        self.polygons: List[List[List[np.ndarray]]] = []
+        ids = []  # vị trí feature trong FeatureCollection gốc
+        boxes, edges, edge_counts = [], [], []
+        for fi, f in enumerate(fc.get("features") or []):
+            geom = f.get("geometry") or {}
+            if geom.get("type") == "Polygon":
+                polys = [geom.get("coordinates") or []]
+            elif geom.get("type") == "MultiPolygon":
+                polys = geom.get("coordinates") or []
+            else:
+                continue
+
+            feature, n_edges = [], 0
+            for poly in polys:
+                rings = [np.asarray(r, dtype=float)[:, :2] for r in poly if len(r) >= 4]
+                if not rings:
+                    continue
+                feature.append([r[:-1] for r in rings])
+                for r in rings:
+                    edges.append(np.hstack([r[:-1], r[1:]]))
+                    n_edges += len(r) - 1
+            if not feature:
+                continue
+
+            outer = np.vstack([rings[0] for rings in feature])
+            boxes.append([*outer.min(axis=0), *outer.max(axis=0)])
+            self.polygons.append(feature)
+            ids.append(fi)
+            edge_counts.append(n_edges)
+
+        self.ids = np.asarray(ids, dtype=np.int64)
+        boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+        self._build_bands(
+            boxes,
+            np.vstack(edges) if edges else np.zeros((0, 4)),
+            np.asarray(edge_counts, dtype=np.int64),
+        )
+        self._build_tree(boxes)
+
+    def __len__(self) -> int:
+        return len(self.polygons)
+
+    # ---------- dải cạnh ----------
+
+    def _build_bands(self, boxes: np.ndarray, edges: np.ndarray, counts: np.ndarray):
+        """Cạnh xếp theo (feature, dải ngang); cạnh vắt qua nhiều dải được lặp lại."""
+        self.nbands = np.clip(-(-counts // _BAND_EDGES), 1, _MAX_BANDS)
+        self.band_base = np.cumsum(self.nbands) - self.nbands
+        self.band_y0 = boxes[:, 1]
+        self.band_h = np.maximum(boxes[:, 3] - boxes[:, 1], 1e-12) / self.nbands
+
+        feat = np.repeat(np.arange(len(counts)), counts)
+        lo = self._band(feat, np.minimum(edges[:, 1], edges[:, 3]))
+        hi = self._band(feat, np.maximum(edges[:, 1], edges[:, 3]))
+        span = hi - lo + 1
+        first = np.cumsum(span) - span
+        src = np.repeat(np.arange(len(edges)), span)
+        band = np.repeat(self.band_base[feat] + lo - first, span) + np.arange(int(span.sum()))
+
+        order = np.argsort(band, kind="stable")
+        self.edges = edges[src[order]]
+        total = int(self.nbands.sum())
+        self.band_start = np.searchsorted(band[order], np.arange(total + 1))
+
+    def _band(self, feat: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """Chỉ số dải (trong feature) chứa tung độ y."""
+        b = np.floor((y - self.band_y0[feat]) / self.band_h[feat]).astype(np.int64)
+        return np.clip(b, 0, self.nbands[feat] - 1)
+
+    # ---------- STR tree ----------
+
+    def _build_tree(self, boxes: np.ndarray):
+        n = len(boxes)
+        cap = INDEX_NODE_CAP
+        # STR: chia theo x thành ~sqrt(số lá) lát, trong mỗi lát xếp theo y
+        slices = max(1, math.ceil(math.sqrt(math.ceil(n / cap)))) if n else 1
+        per_slice = slices * cap
+        cx = (boxes[:, 0] + boxes[:, 2]) / 2
+        cy = (boxes[:, 1] + boxes[:, 3]) / 2
+        rank_x = np.empty(n, dtype=np.int64)
+        rank_x[np.argsort(cx, kind="stable")] = np.arange(n)
+        self.order = np.lexsort((cy, rank_x // per_slice))
+
+        # levels[0] = bbox feature (theo thứ tự STR); level k: nút gom
+        # cap phần tử liên tiếp của level k-1
+        self.levels = [boxes[self.order]]
+        while len(self.levels[-1]) > cap:
+            below = self.levels[-1]
+            starts = np.arange(0, len(below), cap)
+            self.levels.append(
+                np.column_stack(
+                    [
+                        np.minimum.reduceat(below[:, 0], starts),
+                        np.minimum.reduceat(below[:, 1], starts),
+                        np.maximum.reduceat(below[:, 2], starts),
+                        np.maximum.reduceat(below[:, 3], starts),
+                    ]
+                )
+            )
+
+    def candidates(self, qboxes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(chỉ số truy vấn, chỉ số feature) có bbox giao nhau, cho cả lô."""
+        qboxes = np.asarray(qboxes, dtype=float).reshape(-1, 4)
+        top = self.levels[-1]
+        qi = np.repeat(np.arange(len(qboxes)), len(top))
+        ni = np.tile(np.arange(len(top)), len(qboxes))
+        keep = _overlap(qboxes[qi], top[ni])
+        qi, ni = qi[keep], ni[keep]
+
+        cap = INDEX_NODE_CAP
+        for level in range(len(self.levels) - 2, -1, -1):
+            below = self.levels[level]
+            start = ni * cap
+            count = np.minimum(start + cap, len(below)) - start
+            first = np.cumsum(count) - count
+            child = np.repeat(start - first, count) + np.arange(int(count.sum()))
+            qi = np.repeat(qi, count)
+            keep = _overlap(qboxes[qi], below[child])
+            qi, ni = qi[keep], child[keep]
+        return qi, self.order[ni]
+
+    # ---------- truy vấn ----------
+
+    def points(self, pts: np.ndarray) -> np.ndarray:
+        """
+        pts: (n, 2) lon/lat -> chỉ số feature (trong FeatureCollection gốc)
+        chứa mỗi điểm, -1 nếu không ngập.
+        """
+        pts = np.asarray(pts, dtype=float).reshape(-1, 2)
+        out = np.full(len(pts), -1, dtype=np.int64)
+        if not len(pts) or not len(self):
+            return out
+
+        qi, fi = self.candidates(np.hstack([pts, pts]))
+        # mọi cặp (điểm, feature ứng viên) × cạnh cùng dải, theo từng khối
+        # ~_PIP_CHUNK cạnh: không có vòng lặp Python theo feature
+        band = self.band_base[fi] + self._band(fi, pts[qi, 1])
+        starts = self.band_start[band]
+        counts = self.band_start[band + 1] - starts
+        ends = np.cumsum(counts)
+        s = 0
+        while s < len(qi):
+            e = int(np.searchsorted(ends, ends[s] - counts[s] + _PIP_CHUNK, side="right"))
+            e = max(e, s + 1)
+            inside = self._inside(qi[s:e], starts[s:e], counts[s:e], pts)
+            out[qi[s:e][inside]] = self.ids[fi[s:e][inside]]
+            s = e
+        return out
+
+    def _inside(
+        self, qi: np.ndarray, starts: np.ndarray, counts: np.ndarray, pts: np.ndarray
+    ) -> np.ndarray:
+        """Ray casting chẵn-lẻ cho từng cặp (điểm qi, dải cạnh starts/counts) -> mask."""
+        first = np.cumsum(counts) - counts
+        pair = np.repeat(np.arange(len(qi)), counts)
+        edge = np.repeat(starts - first, counts) + np.arange(int(counts.sum()))
+        x0, y0, x1, y1 = self.edges[edge].T
+        px, py = pts[qi[pair], 0], pts[qi[pair], 1]
+        spans = (y0 > py) != (y1 > py)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            xint = x0 + (py - y0) * (x1 - x0) / (y1 - y0)
+        hit = (spans & (px < xint)).astype(np.int64)
+        crossings = np.bincount(pair, weights=hit, minlength=len(qi)).astype(np.int64)
+        return (crossings & 1).astype(bool)
+
+    def bboxes(self, qboxes: np.ndarray) -> List[Dict[str, Any]]:
+        """
+        Mỗi bbox (minLon, minLat, maxLon, maxLat) -> diện tích ngập giao
+        với bbox (km²) + chỉ số các feature thực sự giao (diện tích > 0).
+        """
+        qboxes = np.asarray(qboxes, dtype=float).reshape(-1, 4)
+        results = [{"flooded_area_km2": 0.0, "feature_ids": []} for _ in qboxes]
+        if not len(self):
+            return results
+
+        qi, fi = self.candidates(qboxes)
+        for q, f in sorted(zip(qi.tolist(), fi.tolist())):
+            box = tuple(qboxes[q])
+            area = 0.0
+            for rings in self.polygons[f]:
+                outer = _ring_area_km2(clip_ring(rings[0], box))
+                if outer <= 0:
+                    continue
+                holes = sum(_ring_area_km2(clip_ring(r, box)) for r in rings[1:])
+                area += max(outer - holes, 0.0)
+            if area > 0:
+                results[q]["flooded_area_km2"] += area
+                results[q]["feature_ids"].append(int(self.ids[f]))
+        return results
+
+
+class IndexStore:
+    """FloodIndex theo result_key – LRU nhỏ trong RAM."""
+
+    def __init__(self, max_items: int = INDEX_MAX_ITEMS):
+        self.max_items = max_items
+        self._items: "OrderedDict[str, FloodIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.builds = 0
+
+    def get(self, result_key: str) -> Optional[FloodIndex]:
+        with self._lock:
+            idx = self._items.get(result_key)
+            if idx is not None:
+                self._items.move_to_end(result_key)
+            return idx
+
+    def build(self, result_key: str, fc: Dict[str, Any]) -> FloodIndex:
+        idx = FloodIndex(fc)
+        with self._lock:
+            self._items[result_key] = idx
+            self._items.move_to_end(result_key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+            self.builds += 1
+        return idx
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"indexes": len(self._items), "builds": self.builds}
+
+
+index_store = IndexStore()
@@ -0,0 +1,103 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Tuple
+
+import ee
+import requests
+
+from .blob_cache import BlobCache
+from .ee_utils import record_round_trip
+
+# ============================================================
+#  TILE XYZ CHO CÁC LỚP ẢNH NGẬP / VV / ΔdB (EE map id + cache đĩa)
+# ============================================================
+# /tiles/{layer}/{result_key}/{z}/{x}/{y}.png
+# - result_key -> tham số /flood (registry trong main.py) -> FloodPipeline
+#   -> ảnh đã visualize của lớp đó.
+# - Mỗi (layer, result_key) chỉ gọi getMapId 1 lần / MAPID_TTL_S; tile tải
+#   từ URL tile của EE qua 1 requests.Session (giữ kết nối).
+# - PNG lưu trên đĩa theo layer/result_key/z/x/y: pan lại / xem lại không
+#   gọi EE nữa.
+
+TILE_LAYERS = ("flood", "pre_vv", "event_vv", "delta_db")
+TILE_MIN_ZOOM = 0
+TILE_MAX_ZOOM = int(os.getenv("TILE_MAX_ZOOM", "18"))
+
+# map id của EE hết hạn sau vài giờ -> làm mới sớm hơn
+MAPID_TTL_S = float(os.getenv("MAPID_TTL_S", "7200"))
+# số map id giữ trong RAM tối đa (LRU)
+MAPID_MAX_ITEMS = int(os.getenv("MAPID_MAX_ITEMS", "256"))
+
+tile_cache = BlobCache(
+    "tiles",
+    max_disk_bytes=int(os.getenv("TILE_CACHE_DISK_MB", "1024")) * 1024 * 1024,
+    ttl_s=float(os.getenv("TILE_CACHE_TTL_S", str(7 * 86400))),
+    suffix=".png",
+)
+
+
+def tile_key(layer: str, result_key: str, z: int, x: int, y: int) -> str:
+    return f"{layer}/{result_key}/{z}/{x}/{y}"
+
+
+def valid_tile(z: int, x: int, y: int) -> bool:
+    return TILE_MIN_ZOOM <= z <= TILE_MAX_ZOOM and 0 <= x < 2**z and 0 <= y < 2**z
+
+
+class TileSource:
+    """Map id EE theo (layer, result_key) + tải tile PNG (blocking, chạy trong pool)."""
+
+    def __init__(self, ttl_s: float = MAPID_TTL_S, max_items: int = MAPID_MAX_ITEMS):
+        self.ttl_s = ttl_s
+        self.max_items = max_items
+        self._mapids: "OrderedDict[Tuple[str, str], Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._session = requests.Session()
+        self.mapid_calls = 0
+
+    def cached_fetcher(self, layer: str, result_key: str):
+        with self._lock:
+            item = self._mapids.get((layer, result_key))
+            if item is None:
+                return None
+            if time.time() - item[0] > self.ttl_s:
+                del self._mapids[(layer, result_key)]
+                return None
+            self._mapids.move_to_end((layer, result_key))
+            return item[1]
+
+    def fetcher(self, layer: str, result_key: str, build: Callable[[], ee.Image]):
+        """tile_fetcher của map id (gọi getMapId nếu chưa có / đã hết hạn)."""
+        tf = self.cached_fetcher(layer, result_key)
+        if tf is not None:
+            return tf
+
+        record_round_trip()
+        mapid = build().getMapId()
+        tf = mapid["tile_fetcher"]
+        now = time.time()
+        with self._lock:
+            self._mapids[(layer, result_key)] = (now, tf)
+            self._mapids.move_to_end((layer, result_key))
+            self.mapid_calls += 1
+            # bỏ map id hết hạn / ít dùng nhất ở đầu LRU, giữ <= max_items
+            while self._mapids:
+                t, _ = next(iter(self._mapids.values()))
+                if now - t <= self.ttl_s and len(self._mapids) <= self.max_items:
+                    break
+                self._mapids.popitem(last=False)
+        return tf
+
+    def fetch(self, tf, z: int, x: int, y: int) -> bytes:
+        resp = self._session.get(tf.format_tile_url(x, y, z), timeout=30)
+        resp.raise_for_status()
+        return resp.content
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"mapids": len(self._mapids), "mapid_calls": self.mapid_calls}
+
+
+tile_source = TileSource()
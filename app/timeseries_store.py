@@ -0,0 +1,147 @@
+import json
+import bisect
+import threading
+import datetime as dt
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional
+
+# ============================================================
+#  STORE CHUỖI NGẬP 10 NĂM TRONG RAM (NẠP 1 LẦN, HOT-RELOAD THEO MTIME)
+# ============================================================
+# Thay cho việc mỗi request lại json.load + sorted + fromisoformat:
+# - Cột: ordinals (ngày dạng int, đã sort), area_km2, pixel_count.
+# - Lọc khoảng ngày = 2 lần bisect trên cột ordinals.
+# - File bị precompute ghi đè (mtime/size đổi) -> tự nạp lại.
+
+
+class _Columns(NamedTuple):
+    records: List[Dict[str, Any]]
+    ordinals: array
+    area_km2: array
+    pixel_count: array
+
+
+class TimeseriesStore:
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stamp = None  # (mtime_ns, size) của lần nạp gần nhất
+
+        self._cols = _Columns([], array("l"), array("d"), array("q"))
+
+    # cột hiện tại (đọc 1 lần -> luôn nhất quán kể cả khi đang reload)
+    @property
+    def records(self) -> List[Dict[str, Any]]:
+        return self._cols.records
+
+    @property
+    def ordinals(self) -> array:
+        return self._cols.ordinals
+
+    @property
+    def area_km2(self) -> array:
+        return self._cols.area_km2
+
+    @property
+    def pixel_count(self) -> array:
+        return self._cols.pixel_count
+
+    # ---------- nạp / hot-reload ----------
+
+    def _load(self, stamp):
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, list):
+            raise ValueError("Timeseries cache sai định dạng (không phải list).")
+
+        rows = []
+        for rec in data:
+            try:
+                ordinal = dt.date.fromisoformat(rec["date"]).toordinal()
+            except (KeyError, TypeError, ValueError):
+                continue
+            rows.append((ordinal, rec))
+        rows.sort(key=lambda r: r[0])
+
+        # gán 1 lượt để reader không thấy trạng thái dở dang
+        self._cols = _Columns(
+            records=[r for _, r in rows],
+            ordinals=array("l", (o for o, _ in rows)),
+            area_km2=array("d", (float(r.get("area_km2") or 0.0) for _, r in rows)),
+            pixel_count=array("q", (int(r.get("pixel_count") or 0) for _, r in rows)),
+        )
+        self._stamp = stamp
+
+    def refresh(self):
+        """Nạp lại nếu file đổi. Ném FileNotFoundError nếu chưa có file."""
+        st = self.path.stat()
+        stamp = (st.st_mtime_ns, st.st_size)
+        if stamp == self._stamp:
+            return
+        with self._lock:
+            if stamp != self._stamp:
+                self._load(stamp)
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    # ---------- truy vấn ----------
+
+    def __len__(self):
+        self.refresh()
+        return len(self.records)
+
+    @staticmethod
+    def _bounds(cols, start, end):
+        ords = cols.ordinals
+        lo = bisect.bisect_left(ords, start.toordinal()) if start else 0
+        hi = bisect.bisect_right(ords, end.toordinal()) if end else len(ords)
+        return lo, max(lo, hi)
+
+    def index_range(
+        self, start: Optional[dt.date] = None, end: Optional[dt.date] = None
+    ):
+        """Chỉ số [lo, hi) của các bản ghi có start <= date <= end."""
+        self.refresh()
+        return self._bounds(self._cols, start, end)
+
+    def slice(
+        self, start: Optional[dt.date] = None, end: Optional[dt.date] = None
+    ) -> List[Dict[str, Any]]:
+        self.refresh()
+        cols = self._cols
+        lo, hi = self._bounds(cols, start, end)
+        return cols.records[lo:hi]
+
+    def window(
+        self, start: Optional[dt.date] = None, end: Optional[dt.date] = None
+    ) -> _Columns:
+        """Các cột đã cắt theo [start, end] (cùng 1 snapshot, nhất quán)."""
+        self.refresh()
+        cols = self._cols
+        lo, hi = self._bounds(cols, start, end)
+        return _Columns(
+            records=cols.records[lo:hi],
+            ordinals=cols.ordinals[lo:hi],
+            area_km2=cols.area_km2[lo:hi],
+            pixel_count=cols.pixel_count[lo:hi],
+        )
+
+    def last_date(self) -> Optional[dt.date]:
+        self.refresh()
+        ords = self.ordinals
+        if not ords:
+            return None
+        return dt.date.fromordinal(ords[-1])
+
+    def cutoff_for_years(self, years: int) -> Optional[dt.date]:
+        """Ngày bắt đầu khi chỉ lấy N năm gần nhất (tính từ bản ghi cuối)."""
+        last = self.last_date()
+        if last is None or not years or years <= 0:
+            return None
+        return last - dt.timedelta(days=365 * years)
+
+    def last_years(self, years: int) -> List[Dict[str, Any]]:
+        """Các bản ghi trong N năm gần nhất (years <= 0 -> tất cả)."""
+        return self.slice(start=self.cutoff_for_years(years))
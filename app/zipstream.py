@@ -0,0 +1,116 @@
+import io
+import asyncio
+import csv
+import time
+import zipfile
+from typing import Any, AsyncIterator, BinaryIO, Dict, Iterable, Iterator, Sequence, Tuple, Union
+
+# ============================================================
+#  GHI ZIP DẠNG STREAM (không giữ cả archive trong RAM)
+# ============================================================
+# zipfile ghi được lên stream không seek được (dùng data descriptor sau
+# mỗi entry). _Sink gom các byte zipfile vừa ghi, stream_zip() nhả chúng
+# ra ngay sau mỗi chunk dữ liệu -> bộ nhớ chỉ cỡ 1 chunk, byte đầu tiên
+# tới client trước khi các entry sau có dữ liệu.
+
+Chunk = Union[bytes, str]
+Source = Union[bytes, Iterable[Chunk], AsyncIterator[Chunk]]
+
+CSV_BATCH_ROWS = 500
+BLOB_CHUNK = 64 * 1024
+
+
+class _Sink(io.RawIOBase):
+    """File-like chỉ ghi, không seek/tell được; drain() lấy phần đã ghi."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        out = b"".join(self._chunks)
+        self._chunks.clear()
+        return out
+
+
+def csv_chunks(
+    fieldnames: Sequence[str], rows: Iterable[Dict[str, Any]], batch: int = CSV_BATCH_ROWS
+) -> Iterator[str]:
+    """Header + các dòng CSV, mỗi lần nhả `batch` dòng (không dựng cả file)."""
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=fieldnames, extrasaction="ignore")
+    writer.writeheader()
+    n = 0
+    for row in rows:
+        writer.writerow(row)
+        n += 1
+        if n % batch == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def blob_chunks(data: bytes, size: int = BLOB_CHUNK) -> Iterator[bytes]:
+    view = memoryview(data)
+    for i in range(0, len(view), size):
+        yield view[i : i + size].tobytes()
+
+
+async def file_chunks(f: BinaryIO, size: int = BLOB_CHUNK) -> AsyncIterator[bytes]:
+    """Đọc dần file đang mở (trong thread, không chặn event loop), đóng khi xong."""
+    try:
+        while True:
+            chunk = await asyncio.to_thread(f.read, size)
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        f.close()
+
+
+async def _iter_source(src: Source) -> AsyncIterator[bytes]:
+    if isinstance(src, (bytes, bytearray, memoryview)):
+        src = [bytes(src)]
+    if hasattr(src, "__aiter__"):
+        async for c in src:
+            yield c.encode("utf-8") if isinstance(c, str) else c
+    else:
+        for c in src:
+            yield c.encode("utf-8") if isinstance(c, str) else c
+
+
+async def stream_zip(
+    entries: Iterable[Tuple[str, Source, bool]],
+) -> AsyncIterator[bytes]:
+    """
+    entries: (tên file, nguồn dữ liệu, nén?) theo thứ tự ghi vào ZIP.
+    Nguồn là bytes, iterable hoặc async iterable các chunk bytes/str;
+    nguồn async chỉ được đọc tới khi tới lượt entry đó.
+    PNG/ảnh nên để nén=False (đã nén sẵn).
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w") as zf:
+        for name, src, compress in entries:
+            info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+            info.external_attr = 0o644 << 16
+            with zf.open(info, "w") as f:
+                async for chunk in _iter_source(src):
+                    f.write(chunk)
+                    out = sink.drain()
+                    if out:
+                        yield out
+            out = sink.drain()
+            if out:
+                yield out
+    out = sink.drain()
+    if out:
+        yield out
@@ -3,6 +3,12 @@
   import type {
     FloodRequest,
     FloodResponse,
+    FloodPreviewResponse,
+    FloodPolygonsLod,
+    FloodPointQueryResponse,
+    FloodBBoxQueryResponse,
+    FloodSweepRequest,
+    FloodSweepResponse,
     FloodTimeseriesResponse,
     RainfallResponse,
     CorrelationResponse,
@@ -11,6 +17,13 @@
   const api = axios.create({
     baseURL: import.meta.env.VITE_API_URL || "http://127.0.0.1:8000",
   });
+
+  // URL tương đối của backend (/images/..., /tiles/...) -> URL đầy đủ
+  export function apiUrl(path: string): string {
+    if (!path || /^https?:\/\//.test(path)) return path;
+    return (api.defaults.baseURL || "").replace(/\/$/, "") + path;
+  }
+
   export async function getAoi(): Promise<any> {
     // backend /aoi trả: { aoi_geojson: <FeatureCollection> }
     const res = await api.get<{ aoi_geojson: any }>("/aoi");
@@ -22,9 +35,73 @@
     return res.data;
   }
 
+  // --- Xem nhanh ở scale thô; kết quả đầy đủ lấy qua job ---
+  export async function previewFlood(
+    payload: FloodRequest,
+    options: { scale_m?: number; full?: boolean } = {}
+  ): Promise<FloodPreviewResponse> {
+    const res = await api.post<FloodPreviewResponse>("/flood/preview", payload, {
+      params: options,
+    });
+    return res.data;
+  }
+
+  export async function getJobResult<T = any>(jobId: string): Promise<T> {
+    const res = await api.get<T>(`/jobs/${jobId}/result`);
+    return res.data;
+  }
+
+  // --- Polygon ngập theo zoom (polygons_url từ /flood) ---
+  export async function getFloodPolygons(
+    polygonsUrl: string,
+    zoom: number,
+    maxVertices?: number
+  ): Promise<FloodPolygonsLod> {
+    const res = await api.get<FloodPolygonsLod>(polygonsUrl, {
+      params: { zoom, max_vertices: maxVertices },
+    });
+    return res.data;
+  }
+
+  // --- Điểm [lon, lat] nào nằm trong vùng ngập (theo lô) ---
+  export async function queryFloodPoints(
+    resultKey: string,
+    points: [number, number][]
+  ): Promise<FloodPointQueryResponse> {
+    const res = await api.post<FloodPointQueryResponse>(
+      `/flood/${resultKey}/query/points`,
+      { points }
+    );
+    return res.data;
+  }
+
+  // --- Diện tích ngập trong từng bbox [minLon, minLat, maxLon, maxLat] ---
+  export async function queryFloodBBoxes(
+    resultKey: string,
+    bboxes: [number, number, number, number][]
+  ): Promise<FloodBBoxQueryResponse> {
+    const res = await api.post<FloodBBoxQueryResponse>(
+      `/flood/${resultKey}/query/bbox`,
+      { bboxes }
+    );
+    return res.data;
+  }
+
+  // --- Quét tham số ngưỡng (1 lần tính cho cả lưới) ---
+  export async function sweepFlood(
+    payload: FloodSweepRequest
+  ): Promise<FloodSweepResponse> {
+    const res = await api.post<FloodSweepResponse>("/flood/sweep", payload);
+    return res.data;
+  }
+
   // --- Flood timeseries ---
   export async function getFloodTimeseries(params: {
     years?: number;
+    start?: string; // YYYY-MM-DD
+    end?: string; // YYYY-MM-DD
+    max_points?: number; // backend tự giảm điểm (LTTB / min-max)
+    downsample?: "lttb" | "minmax";
     step_days?: number;
     min_diff_db?: number;
     elev_max_m?: number;
@@ -54,6 +131,9 @@
   // --- Flood–rain correlation ---
   export async function getCorrelation(params: {
     years?: number;
+    max_lag_days?: number;
+    windows?: number[];
+    method?: "pearson" | "spearman";
     step_days?: number;
     rainfall_scale_m?: number;
     min_diff_db?: number;
@@ -61,7 +141,10 @@
     scale_m?: number;
   } = {}): Promise<CorrelationResponse> {
     // backend trả đúng shape CorrelationResponse { data: [...], corr: number | null }
-    const res = await api.get<CorrelationResponse>("/correlation", { params });
+    const res = await api.get<CorrelationResponse>("/correlation", {
+      params,
+      paramsSerializer: { indexes: null }, // windows=1&windows=3 cho FastAPI
+    });
     return res.data;
   }
   // --- Download report (ZIP: map + CSV) ---
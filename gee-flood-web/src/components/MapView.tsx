@@ -24,6 +24,7 @@ import marker1x from "leaflet/dist/images/marker-icon.png";
 import markerShadow from "leaflet/dist/images/marker-shadow.png";
 
 import type { FloodMapLayers, FloodRegions } from "../types";
+import { apiUrl } from "../api";
 
 const searchMarkerIcon = L.icon({
   iconRetinaUrl: marker2x,
@@ -250,11 +251,11 @@ const MapView: React.FC<MapViewProps> = ({
             />
           </BaseLayer>
 
-          {/* PNG overlays từ GEE */}
+          {/* PNG overlays (backend cache ảnh từ GEE) */}
           {overlayBounds && floodLayers?.flood && (
             <LayersControl.Overlay checked name="Ngập (mask + AOI)">
               <ImageOverlay
-                url={floodLayers.flood}
+                url={apiUrl(floodLayers.flood)}
                 bounds={overlayBounds}
                 opacity={0.85}
               />
@@ -264,7 +265,7 @@ const MapView: React.FC<MapViewProps> = ({
           {overlayBounds && floodLayers?.pre_vv && (
             <LayersControl.Overlay name="VV trước sự kiện">
               <ImageOverlay
-                url={floodLayers.pre_vv}
+                url={apiUrl(floodLayers.pre_vv)}
                 bounds={overlayBounds}
                 opacity={0.9}
               />
@@ -274,7 +275,7 @@ const MapView: React.FC<MapViewProps> = ({
           {overlayBounds && floodLayers?.event_vv && (
             <LayersControl.Overlay name="VV trong sự kiện">
               <ImageOverlay
-                url={floodLayers.event_vv}
+                url={apiUrl(floodLayers.event_vv)}
                 bounds={overlayBounds}
                 opacity={0.9}
               />
@@ -284,7 +285,7 @@ const MapView: React.FC<MapViewProps> = ({
           {overlayBounds && floodLayers?.delta_db && (
             <LayersControl.Overlay name="ΔdB (event - pre)">
               <ImageOverlay
-                url={floodLayers.delta_db}
+                url={apiUrl(floodLayers.delta_db)}
                 bounds={overlayBounds}
                 opacity={0.9}
               />
@@ -27,6 +27,9 @@ export interface FloodStats {
   area_km2_hcm: number;
   area_km2_bd: number;
   area_km2_brvt: number;
+
+  // ngưỡng nước Otsu (dB) trên histogram VV sự kiện
+  otsu_threshold_db?: number | null;
 }
 
 // các URL ảnh map từ backend
@@ -56,6 +59,64 @@ export interface FloodResponse {
 
   // ranh giới 3 vùng + merged (option vì backend cũ có thể chưa trả)
   regions_geojson?: FloodRegions | null;
+
+  // khóa kết quả + URL template tile XYZ theo lớp (flood, pre_vv, event_vv, delta_db)
+  // + "polygons": vector tile MVT (.pbf, source-layer "flood")
+  result_key?: string | null;
+  tiles?: Record<string, string> | null;
+
+  // polygons_geojson đã đơn giản hóa theo max_vertices; bản theo zoom ở polygons_url
+  polygons_lod?: PolygonLodInfo | null;
+  polygons_url?: string | null;
+}
+
+// --- /flood/{result_key}/polygons: polygon đơn giản hóa theo mức zoom ---
+export interface PolygonLodInfo {
+  tolerance_deg: number;
+  vertices: number;
+  full_vertices: number;
+  features: number;
+  dropped_features: number;
+  level?: number | null; // null = đầy đủ (zoom vượt mức LOD mịn nhất)
+}
+
+export type FloodPolygonsLod = GeoJSON.FeatureCollection & { lod: PolygonLodInfo };
+
+// --- /flood/preview: stats + thumbnail ở scale thô, job đầy đủ chạy nền ---
+export interface FloodPreviewResponse {
+  stats: FloodStats;
+  thumb_url?: string | null;
+  full_job?: { job_id: string; status: string; result_url: string } | null;
+  ee_round_trips?: number | null;
+  cached?: boolean;
+}
+
+// --- /flood/sweep: lưới độ nhạy min_diff_db x elev_max_m ---
+export interface FloodSweepRequest {
+  pre_start: string;
+  pre_end: string;
+  event_start: string;
+  event_end: string;
+  min_diff_db?: number[];
+  elev_max_m?: number[];
+  scale_m?: number;
+}
+
+export interface FloodSweepCell {
+  min_diff_db: number;
+  elev_max_m: number;
+  area_km2: number;
+  pixel_count: number;
+}
+
+export interface FloodSweepResponse {
+  min_diff_db: number[];
+  elev_max_m: number[];
+  grid: FloodSweepCell[];
+  scale_m: number;
+  otsu_threshold_db?: number | null;
+  ee_round_trips?: number | null;
+  cached?: boolean;
 }
 
 // ================== FLOOD TIMESERIES ==================
@@ -89,7 +150,48 @@ export interface CorrelationPoint {
   area_km2: number;
 }
 
+export interface LaggedCorrelationCell {
+  lag_days: number;
+  window_days: number;
+  pearson: number | null;
+  spearman: number | null;
+  n: number;
+}
+
+export interface LaggedCorrelation {
+  grid: LaggedCorrelationCell[];
+  best: {
+    lag_days: number;
+    window_days: number;
+    corr: number | null;
+    method: "pearson" | "spearman";
+    n: number;
+  } | null;
+}
+
 export interface CorrelationResponse {
   data: CorrelationPoint[];
   corr: number | null;
+  // tương quan theo độ trễ + mưa tích lũy (backend /correlation)
+  lagged?: LaggedCorrelation;
+}
+
+// --- /flood/{result_key}/query/points|bbox: truy vấn trên polygon ngập ---
+export interface FloodPointQueryResponse {
+  flooded: boolean[];
+  feature_ids: (number | null)[]; // feature chứa điểm (null = không ngập)
+  flooded_count: number;
+  query_ms: number;
+}
+
+export interface FloodBBoxResult {
+  bbox: [number, number, number, number];
+  flooded_area_km2: number;
+  feature_count: number;
+  feature_ids: number[];
+}
+
+export interface FloodBBoxQueryResponse {
+  results: FloodBBoxResult[];
+  query_ms: number;
 }
@@ -0,0 +1,97 @@
+import datetime as dt
+
+import numpy as np
+import pytest
+
+from app.correlation import _masked_pearson, _masked_rank, lagged_rain_correlation, pearson
+
+
+def _avg_rank(v):
+    # hạng trung bình khi bằng nhau (như scipy.stats.rankdata)
+    v = list(v)
+    s = sorted(v)
+    return [s.index(a) + 1 + (s.count(a) - 1) / 2 for a in v]
+
+
+def test_pearson_matches_corrcoef():
+    rng = np.random.default_rng(1)
+    x = rng.normal(size=50)
+    y = 0.5 * x + rng.normal(size=50)
+    assert pearson(x, y) == pytest.approx(np.corrcoef(x, y)[0, 1])
+
+
+def test_pearson_undefined():
+    assert pearson([1.0], [2.0]) is None
+    assert pearson([3.0, 3.0, 3.0], [1.0, 2.0, 3.0]) is None
+    assert pearson([1.0, 2.0, 3.0], [5.0, 5.0, 5.0]) is None
+
+
+def test_masked_pearson_ignores_invalid():
+    x = np.array([[1.0, 2.0, np.nan, 4.0, 10.0], [1.0, 1.0, 1.0, 2.0, 3.0]])
+    y = np.array([[2.0, 4.1, 7.0, 7.9, -3.0], [3.0, 1.0, 2.0, 5.0, 4.0]])
+    valid = np.array([[True, True, False, True, False], [True, True, True, True, True]])
+
+    r = _masked_pearson(x, y, valid)
+    assert r[0] == pytest.approx(np.corrcoef([1, 2, 4], [2, 4.1, 7.9])[0, 1])
+    assert r[1] == pytest.approx(np.corrcoef(x[1], y[1])[0, 1])
+
+
+def test_masked_pearson_zero_variance_is_nan():
+    x = np.array([[2.0, 2.0, 2.0, 9.0]])
+    y = np.array([[1.0, 2.0, 3.0, 4.0]])
+    valid = np.array([[True, True, True, False]])
+    assert np.isnan(_masked_pearson(x, y, valid)[0])
+
+
+def test_masked_rank_ties_and_invalid():
+    v = np.array([[3.0, 1.0, np.nan, 3.0, 2.0], [5.0, 4.0, 4.0, 1.0, 0.0]])
+    valid = np.array([[True, True, False, True, True], [True, True, True, True, True]])
+
+    ranks = _masked_rank(v, valid)
+    assert ranks[0][valid[0]].tolist() == _avg_rank([3.0, 1.0, 3.0, 2.0])
+    assert ranks[1].tolist() == _avg_rank(v[1])
+
+
+def test_lagged_rain_correlation_finds_known_lag():
+    rng = np.random.default_rng(7)
+    day0 = dt.date(2024, 1, 1)
+    rain = rng.gamma(1.0, 10.0, size=120)
+    rain_series = [
+        {"date": (day0 + dt.timedelta(days=i)).isoformat(), "rain_mm": float(r)}
+        for i, r in enumerate(rain)
+    ]
+    # diện tích ngập ngày d = mưa ngày d - 3
+    flood_series = [
+        {"date": (day0 + dt.timedelta(days=i)).isoformat(), "area_km2": float(rain[i - 3])}
+        for i in range(20, 120, 2)
+    ]
+
+    out = lagged_rain_correlation(flood_series, rain_series, max_lag_days=6, windows=(1, 3))
+    assert len(out["grid"]) == 7 * 2
+    best = out["best"]
+    assert (best["lag_days"], best["window_days"]) == (3, 1)
+    assert best["corr"] == pytest.approx(1.0)
+    assert best["n"] == 50
+
+    cell = next(g for g in out["grid"] if g["lag_days"] == 3 and g["window_days"] == 1)
+    assert cell["spearman"] == pytest.approx(1.0)
+
+
+def test_lagged_rain_correlation_missing_rain_days():
+    day0 = dt.date(2024, 1, 1)
+    rain_series = [
+        {"date": (day0 + dt.timedelta(days=i)).isoformat(), "rain_mm": float(i % 5)}
+        for i in range(30)
+        if i != 10  # ngày thiếu -> cửa sổ phủ ngày 10 bị loại
+    ]
+    flood_series = [
+        {"date": (day0 + dt.timedelta(days=i)).isoformat(), "area_km2": float(i)}
+        for i in range(5, 30)
+    ]
+    out = lagged_rain_correlation(flood_series, rain_series, max_lag_days=0, windows=(3,))
+    # mốc 5..29, cửa sổ [d-2, d]: bỏ d = 10, 11, 12
+    assert out["grid"][0]["n"] == 25 - 3
+
+
+def test_lagged_rain_correlation_empty():
+    assert lagged_rain_correlation([], []) == {"grid": [], "best": None}
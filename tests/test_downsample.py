@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from app.downsample import lttb_indices, minmax_indices
+
+
+def _series(n: int, seed: int = 3):
+    rng = np.random.default_rng(seed)
+    x = np.arange(n, dtype=float)
+    y = np.cumsum(rng.normal(size=n)) + 5 * np.sin(x / 17)
+    y[n // 3] = 100.0  # đỉnh ngập đơn lẻ
+    y[2 * n // 3] = -100.0
+    return x.tolist(), y.tolist()
+
+
+def _check(idx, n, max_points):
+    assert len(idx) <= max_points
+    assert idx == sorted(set(idx))
+    assert all(0 <= i < n for i in idx)
+
+
+@pytest.mark.parametrize("n,max_points", [(1000, 100), (1000, 4), (1000, 3), (57, 10), (500, 499)])
+def test_lttb_indices(n, max_points):
+    x, y = _series(n)
+    idx = lttb_indices(x, y, max_points)
+    _check(idx, n, max_points)
+    assert len(idx) == max_points
+    assert idx[0] == 0 and idx[-1] == n - 1
+
+
+@pytest.mark.parametrize("n,max_points", [(1000, 100), (1000, 4), (1001, 7), (57, 10), (500, 499)])
+def test_minmax_indices(n, max_points):
+    x, y = _series(n)
+    idx = minmax_indices(y, max_points)
+    _check(idx, n, max_points)
+    assert idx[0] == 0 and idx[-1] == n - 1
+    assert int(np.argmax(y)) in idx
+    assert int(np.argmin(y)) in idx
+
+
+@pytest.mark.parametrize("max_points", [2, 3])
+def test_minmax_indices_tiny_budget_keeps_extremes(max_points):
+    _, y = _series(200)
+    idx = minmax_indices(y, max_points)
+    _check(idx, 200, max_points)
+    assert set(idx) == {int(np.argmax(y)), int(np.argmin(y))}
+
+
+def test_no_downsample_when_within_budget():
+    x, y = _series(10)
+    assert lttb_indices(x, y, 10) == list(range(10))
+    assert minmax_indices(y, 50) == list(range(10))
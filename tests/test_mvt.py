@@ -0,0 +1,159 @@
+import numpy as np
+import pytest
+
+from app.mvt import MVT_EXTENT, TileGeometry, clip_ring
+
+
+def _box(x0, y0, x1, y1):
+    return [[x0, y0], [x1, y0], [x1, y1], [x0, y1], [x0, y0]]
+
+
+def _fc(*features):
+    return {"type": "FeatureCollection", "features": list(features)}
+
+
+def _polygon(*rings, **props):
+    return {
+        "type": "Feature",
+        "properties": props,
+        "geometry": {"type": "Polygon", "coordinates": list(rings)},
+    }
+
+
+# ---------- đọc protobuf tối thiểu (đủ cho Tile / Layer / Feature) ----------
+
+
+def _varint(buf, i):
+    n = shift = 0
+    while True:
+        b = buf[i]
+        i += 1
+        n |= (b & 0x7F) << shift
+        shift += 7
+        if b < 0x80:
+            return n, i
+
+
+def _fields(buf):
+    i, out = 0, []
+    while i < len(buf):
+        key, i = _varint(buf, i)
+        num, wire = key >> 3, key & 7
+        if wire == 0:
+            v, i = _varint(buf, i)
+        elif wire == 2:
+            n, i = _varint(buf, i)
+            v, i = buf[i : i + n], i + n
+        elif wire == 1:
+            v, i = buf[i : i + 8], i + 8
+        else:
+            raise AssertionError(f"wire type {wire}")
+        out.append((num, v))
+    return out
+
+
+def _packed(buf):
+    i, out = 0, []
+    while i < len(buf):
+        v, i = _varint(buf, i)
+        out.append(v)
+    return out
+
+
+def _rings(commands):
+    """Lệnh geometry MVT -> danh sách ring (tọa độ tile tuyệt đối)."""
+    rings, x, y, i = [], 0, 0, 0
+    unzig = lambda v: (v >> 1) ^ -(v & 1)  # noqa: E731
+    while i < len(commands):
+        cmd, count = commands[i] & 7, commands[i] >> 3
+        i += 1
+        if cmd == 7:
+            continue
+        for _ in range(count):
+            x += unzig(commands[i])
+            y += unzig(commands[i + 1])
+            i += 2
+            if cmd == 1:
+                rings.append([])
+            rings[-1].append((x, y))
+    return rings
+
+
+def _area2(ring):
+    q = np.asarray(ring, dtype=np.int64)
+    x, y = q[:, 0], q[:, 1]
+    return int(np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y))
+
+
+def _decode(tile):
+    (num, layer), = _fields(tile)
+    assert num == 3
+    fields = _fields(layer)
+    assert dict(fields)[15] == 2 and dict(fields)[5] == MVT_EXTENT
+    assert bytes(dict(fields)[1]) == b"flood"
+    features = []
+    for num, feat in fields:
+        if num == 2:
+            f = dict(_fields(feat))
+            assert f[3] == 3  # POLYGON
+            features.append(_rings(_packed(f[4])))
+    return features
+
+
+# ---------- clip_ring ----------
+
+
+def test_clip_ring_square_crossing_box():
+    square = np.array(_box(-1.0, -1.0, 1.0, 1.0)[:-1])
+    out = clip_ring(square, (0.0, 0.0, 2.0, 2.0))
+    assert sorted(map(tuple, out.tolist())) == [(0.0, 0.0), (0.0, 1.0), (1.0, 0.0), (1.0, 1.0)]
+
+
+def test_clip_ring_inside_and_outside():
+    square = np.array(_box(0.2, 0.2, 0.8, 0.8)[:-1])
+    assert np.array_equal(clip_ring(square, (0.0, 0.0, 1.0, 1.0)), square)
+    assert len(clip_ring(square, (2.0, 2.0, 3.0, 3.0))) == 0
+
+
+# ---------- TileGeometry.tile ----------
+
+
+def test_empty_tile_is_empty_bytes():
+    geo = TileGeometry(_fc(_polygon(_box(106.6, 10.7, 106.7, 10.8))))
+    assert geo.tile(10, 0, 0) == b""
+    assert TileGeometry(_fc()).tile(0, 0, 0) == b""
+
+
+def test_winding_exterior_positive_hole_negative():
+    # lon/lat: y Mercator ngược chiều lat -> ring đầu vào CCW trở thành CW
+    outer = _box(-10.0, -10.0, 10.0, 10.0)
+    hole = _box(-5.0, -5.0, 5.0, 5.0)[::-1]
+    for rings in ([outer, hole], [outer[::-1], hole[::-1]]):
+        tile = TileGeometry(_fc(_polygon(*rings, name="a", level=2))).tile(0, 0, 0)
+        (decoded,) = _decode(tile)
+        assert len(decoded) == 2
+        assert _area2(decoded[0]) > 0
+        assert _area2(decoded[1]) < 0
+
+
+def test_tile_clips_to_buffer():
+    # polygon lớn hơn tile z=2 (0, 0): mọi đỉnh nằm trong extent + buffer
+    tile = TileGeometry(_fc(_polygon(_box(-170.0, 0.0, 0.0, 80.0)))).tile(2, 0, 0)
+    (decoded,) = _decode(tile)
+    pts = np.asarray(decoded[0])
+    assert pts.min() >= -64 and pts.max() <= MVT_EXTENT + 64
+
+
+def test_decode_round_trip_with_reference_library():
+    mvt = pytest.importorskip("mapbox_vector_tile")
+    fc = _fc(
+        _polygon(_box(-10.0, -10.0, 10.0, 10.0), _box(-5.0, -5.0, 5.0, 5.0), name="a", area=1.5),
+        _polygon(_box(20.0, 20.0, 30.0, 30.0), name="b", flag=True),
+    )
+    decoded = mvt.decode(TileGeometry(fc).tile(0, 0, 0))
+    layer = decoded["flood"]
+    assert layer["extent"] == MVT_EXTENT
+    props = sorted((f["properties"] for f in layer["features"]), key=lambda p: p["name"])
+    assert props == [{"name": "a", "area": 1.5}, {"name": "b", "flag": True}]
+    types = {f["geometry"]["type"] for f in layer["features"]}
+    assert types == {"Polygon"}
@@ -0,0 +1,103 @@
+import datetime as dt
+
+from app.rainfall_store import STABLE_LAG_DAYS, RainfallStore, _gaps, _merge
+
+
+# ---------- _merge / _gaps ----------
+
+
+def test_merge_adjacent_overlapping_and_disjoint():
+    assert _merge([(4, 6), (1, 3)]) == [(1, 6)]  # kề nhau
+    assert _merge([(1, 5), (3, 8)]) == [(1, 8)]  # chồng lấn
+    assert _merge([(1, 10), (2, 3)]) == [(1, 10)]  # nằm trong
+    assert _merge([(1, 3), (5, 6)]) == [(1, 3), (5, 6)]  # cách 1 ngày
+    assert _merge([]) == []
+
+
+def test_gaps():
+    covered = [(5, 9), (15, 20)]
+    assert _gaps(1, 30, covered) == [(1, 4), (10, 14), (21, 30)]
+    assert _gaps(5, 9, covered) == []
+    assert _gaps(6, 16, covered) == [(10, 14)]
+    assert _gaps(9, 10, covered) == [(10, 10)]
+    assert _gaps(21, 25, covered) == [(21, 25)]
+    assert _gaps(1, 3, []) == [(1, 3)]
+
+
+# ---------- RainfallStore ----------
+
+
+class _FakeChirps:
+    """fetch giả: có dữ liệu mọi ngày < available_until (exclusive)."""
+
+    def __init__(self, available_until: dt.date):
+        self.available_until = available_until
+        self.calls = []
+
+    def __call__(self, start_date, end_date, scale):
+        self.calls.append((start_date, end_date))
+        d = dt.date.fromisoformat(start_date)
+        end = min(dt.date.fromisoformat(end_date), self.available_until)
+        rows = []
+        while d < end:
+            rows.append({"date": d.isoformat(), "rain_mm": float(d.day)})
+            d += dt.timedelta(days=1)
+        return rows
+
+
+def test_rainfall_store_fetches_only_missing_ranges(tmp_path):
+    fetch = _FakeChirps(dt.date(2100, 1, 1))
+    store = RainfallStore(fetch, base_dir=tmp_path)
+
+    rows = store.get_series("2020-01-10", "2020-01-20")
+    assert [r["date"] for r in rows][0] == "2020-01-10"
+    assert len(rows) == 10 and rows[-1]["date"] == "2020-01-19"  # end exclusive
+    assert fetch.calls == [("2020-01-10", "2020-01-20")]
+
+    store.get_series("2020-01-12", "2020-01-15")  # nằm trong phần đã có
+    assert len(fetch.calls) == 1
+
+    rows = store.get_series("2020-01-05", "2020-01-25")
+    assert len(rows) == 20
+    assert fetch.calls[1:] == [("2020-01-05", "2020-01-10"), ("2020-01-20", "2020-01-25")]
+
+    # store mới đọc lại file trên đĩa -> không gọi fetch
+    fetch2 = _FakeChirps(dt.date(2100, 1, 1))
+    assert len(RainfallStore(fetch2, base_dir=tmp_path).get_series("2020-01-05", "2020-01-25")) == 20
+    assert fetch2.calls == []
+
+
+def test_rainfall_store_recent_days_without_data_are_asked_again(tmp_path):
+    today = dt.date.today()
+    stable = today - dt.timedelta(days=STABLE_LAG_DAYS)
+    # CHIRPS mới có dữ liệu tới stable + 5 (chưa tới hôm nay)
+    fetch = _FakeChirps(stable + dt.timedelta(days=6))
+    store = RainfallStore(fetch, base_dir=tmp_path)
+
+    start = stable - dt.timedelta(days=10)
+    end = stable + dt.timedelta(days=20)
+    assert len(store.get_series(start.isoformat(), end.isoformat())) == 16
+
+    # phần sau ngày cuối EE trả về (và mới hơn STABLE_LAG_DAYS) hỏi lại
+    fetch.available_until = end
+    assert len(store.get_series(start.isoformat(), end.isoformat())) == 30
+    assert fetch.calls[-1] == ((stable + dt.timedelta(days=6)).isoformat(), end.isoformat())
+
+
+def test_rainfall_store_stable_lag_boundary(tmp_path):
+    today = dt.date.today()
+    stable = today - dt.timedelta(days=STABLE_LAG_DAYS)
+    fetch = _FakeChirps(dt.date(1900, 1, 1))  # không có dữ liệu nào
+    store = RainfallStore(fetch, base_dir=tmp_path)
+
+    # khoảng kết thúc đúng ngày stable: coi là ổn định, không hỏi lại
+    a, b = stable - dt.timedelta(days=5), stable + dt.timedelta(days=1)
+    assert store.get_series(a.isoformat(), b.isoformat()) == []
+    store.get_series(a.isoformat(), b.isoformat())
+    assert len(fetch.calls) == 1
+
+    # ngày stable + 1 chưa ổn định -> lần nào cũng hỏi lại, chỉ ngày đó
+    c = stable + dt.timedelta(days=2)
+    store.get_series(a.isoformat(), c.isoformat())
+    store.get_series(a.isoformat(), c.isoformat())
+    assert fetch.calls[1:] == [(b.isoformat(), c.isoformat())] * 2
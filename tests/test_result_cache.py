@@ -0,0 +1,64 @@
+import os
+import time
+
+from app.result_cache import ResultCache
+
+
+def _value(i: int, size: int = 0):
+    return {"i": i, "pad": "x" * size}
+
+
+def test_memory_lru_falls_back_to_disk(tmp_path):
+    cache = ResultCache("t", max_items=2, ttl_s=0, disk_dir=tmp_path)
+    for i in range(3):
+        cache.set(str(i), _value(i))
+    assert cache.get("1") == _value(1)  # 1 thành mới dùng nhất
+    cache.set("3", _value(3))  # đẩy 2 ra khỏi RAM
+
+    st = cache.stats()
+    assert st["mem_items"] == 2 and st["evictions"] == 2
+    # 0 và 2 không còn trong RAM nhưng vẫn đọc được từ đĩa
+    assert cache.get("0") == _value(0)
+    assert cache.get("2") == _value(2)
+    st = cache.stats()
+    assert st["mem_hits"] == 1 and st["disk_hits"] == 2
+
+
+def test_disk_eviction_removes_least_recently_used(tmp_path):
+    cache = ResultCache("t", max_items=1, ttl_s=0, max_disk_bytes=5000, disk_dir=tmp_path)
+    for i in range(4):
+        cache.set(str(i), _value(i, 1000))
+        # mtime tăng dần rõ ràng (độ phân giải mtime của một số hệ file thô)
+        t = time.time() - 100 + i
+        os.utime(tmp_path / f"{i}.json", (t, t))
+    os.utime(tmp_path / "0.json", None)  # 0 vừa được dùng
+
+    cache.set("4", _value(4, 1000))
+    cache.set("5", _value(5, 1000))
+    left = sorted(p.stem for p in tmp_path.glob("*.json"))
+    assert "0" in left and "1" not in left
+    assert sum(p.stat().st_size for p in tmp_path.glob("*.json")) <= 5000
+    assert cache.stats()["disk_bytes"] == sum(p.stat().st_size for p in tmp_path.glob("*.json"))
+
+
+def test_set_scans_directory_only_when_over_limit(tmp_path, monkeypatch):
+    cache = ResultCache("t", max_items=4, ttl_s=0, max_disk_bytes=10**9, disk_dir=tmp_path)
+    scans = []
+    orig = cache._evict_disk
+    monkeypatch.setattr(cache, "_evict_disk", lambda: (scans.append(1), orig()))
+
+    for i in range(50):
+        cache.set(str(i), _value(i, 100))
+    cache.set("0", _value(0, 500))  # ghi đè: tổng tính theo chênh lệch
+    assert len(scans) == 1  # chỉ lần quét đầu tiên
+    assert cache.stats()["disk_bytes"] == sum(p.stat().st_size for p in tmp_path.glob("*.json"))
+
+
+def test_expired_entries(tmp_path):
+    cache = ResultCache("t", max_items=4, ttl_s=0.05, disk_dir=tmp_path)
+    cache.set("a", _value(1))
+    assert cache.get("a") == _value(1)
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    assert not (tmp_path / "a.json").exists()
+    assert cache.stats()["disk_bytes"] == 0
@@ -0,0 +1,44 @@
+import numpy as np
+
+from app.simplify import count_vertices, simplify_to_budget, tolerance_for_zoom
+
+
+def _square(x: float, y: float, size: float) -> dict:
+    ring = [[x, y], [x + size, y], [x + size, y + size], [x, y + size], [x, y]]
+    return {"type": "Feature", "properties": {}, "geometry": {"type": "Polygon", "coordinates": [ring]}}
+
+
+def _fc(n: int) -> dict:
+    # n polygon cỡ 1 pixel 30 m + 1 polygon lớn răng cưa
+    step = 30 / 111_320
+    side = int(np.ceil(np.sqrt(n)))
+    features = [
+        _square(106.4 + (i % side) * 4 * step, 10.6 + (i // side) * 4 * step, step)
+        for i in range(n)
+    ]
+    a = np.linspace(0, 2 * np.pi, 2000, endpoint=False)
+    r = 0.05 * (1 + 0.1 * np.sin(37 * a))
+    ring = np.column_stack([107.0 + r * np.cos(a), 11.0 + r * np.sin(a)]).tolist()
+    features.append(
+        {"type": "Feature", "properties": {}, "geometry": {"type": "Polygon", "coordinates": [ring + [ring[0]]]}}
+    )
+    return {"type": "FeatureCollection", "features": features}
+
+
+def test_budget_keeps_many_small_polygons():
+    fc = _fc(3000)
+    max_vertices = 5000
+    out, info = simplify_to_budget(fc, max_vertices, tolerance_for_zoom(14))
+
+    vertices = sum(count_vertices(f["geometry"]) for f in out["features"])
+    assert vertices == info["vertices"]
+    assert 0.9 * max_vertices <= vertices <= max_vertices
+    assert info["features"] == len(out["features"]) > 500
+    assert info["dropped_features"] == len(fc["features"]) - info["features"]
+
+
+def test_budget_not_needed_keeps_everything():
+    fc = _fc(100)
+    out, info = simplify_to_budget(fc, 50_000, tolerance_for_zoom(14))
+    assert info["features"] == len(fc["features"])
+    assert info["dropped_features"] == 0
@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+
+from app.mvt import clip_ring
+from app.spatial import FloodIndex, _ring_area_km2
+
+
+def _feature(*polys, multi=False):
+    if multi:
+        geom = {"type": "MultiPolygon", "coordinates": [list(p) for p in polys]}
+    else:
+        geom = {"type": "Polygon", "coordinates": list(polys[0])}
+    return {"type": "Feature", "properties": {}, "geometry": geom}
+
+
+def _box(x0, y0, x1, y1):
+    return [[x0, y0], [x1, y0], [x1, y1], [x0, y1], [x0, y0]]
+
+
+def _fc(features):
+    return {"type": "FeatureCollection", "features": features}
+
+
+def _star(rng, cx, cy, r, n=40):
+    a = np.sort(rng.uniform(0, 2 * np.pi, n))
+    rr = r * rng.uniform(0.4, 1.0, n)
+    pts = np.column_stack([cx + rr * np.cos(a), cy + rr * np.sin(a)]).tolist()
+    return pts + [pts[0]]
+
+
+def _brute_inside(poly_rings, pts):
+    """Ray casting chẵn-lẻ trực tiếp trên mọi cạnh -> mask cho mọi điểm."""
+    x, y = pts[:, 0], pts[:, 1]
+    inside = np.zeros(len(pts), dtype=bool)
+    for ring in poly_rings:
+        r = np.asarray(ring, dtype=float)
+        for (x0, y0), (x1, y1) in zip(r[:-1], r[1:]):
+            if y0 == y1:
+                continue
+            inside ^= ((y0 > y) != (y1 > y)) & (x < x0 + (y - y0) * (x1 - x0) / (y1 - y0))
+    return inside
+
+
+def test_points_inside_hole_outside_and_bbox_edge():
+    square_with_hole = _feature([_box(0, 0, 10, 10), _box(4, 4, 6, 6)])
+    triangle = _feature([[[20, 0], [30, 0], [20, 10], [20, 0]]])
+    multi = _feature([_box(40, 0, 41, 1)], [_box(50, 0, 51, 1)], multi=True)
+    idx = FloodIndex(_fc([square_with_hole, {"type": "Feature", "geometry": None}, triangle, multi]))
+
+    pts = [
+        (1, 1),  # trong
+        (5, 5),  # trong lỗ
+        (15, 5),  # ngoài mọi polygon
+        (29, 9),  # trong bbox tam giác nhưng ngoài tam giác
+        (30, 10),  # góc bbox tam giác, ngoài tam giác
+        (21, 1),  # trong tam giác
+        (50.5, 0.5),  # polygon thứ 2 của MultiPolygon
+        (45, 0.5),  # giữa 2 polygon của MultiPolygon
+    ]
+    # chỉ số theo FeatureCollection gốc (feature None ở vị trí 1 bị bỏ qua)
+    assert idx.points(np.array(pts)).tolist() == [0, -1, -1, -1, -1, 2, 3, -1]
+
+
+def test_points_match_brute_force():
+    rng = np.random.default_rng(5)
+    features = [
+        _feature([_star(rng, *rng.uniform(0, 10, 2), rng.uniform(0.1, 0.6))])
+        for _ in range(300)
+    ]
+    idx = FloodIndex(_fc(features))
+    assert len(idx.levels) > 2  # cây nhiều tầng
+
+    pts = rng.uniform(-0.5, 10.5, (3000, 2))
+    got = idx.points(pts)
+    hits = np.array([_brute_inside(f["geometry"]["coordinates"], pts) for f in features])
+    assert ((got == -1) == ~hits.any(axis=0)).all()
+    inside = got != -1
+    assert hits[got[inside], np.flatnonzero(inside)].all()
+    assert inside.sum() > 100
+
+
+def test_bboxes_match_brute_force():
+    rng = np.random.default_rng(11)
+    features = [
+        _feature([_star(rng, *rng.uniform(0, 2, 2), rng.uniform(0.02, 0.2))])
+        for _ in range(80)
+    ]
+    idx = FloodIndex(_fc(features))
+
+    lo = rng.uniform(-0.2, 2.0, (40, 2))
+    qboxes = np.hstack([lo, lo + rng.uniform(0.05, 0.8, (40, 2))])
+    results = idx.bboxes(qboxes)
+    for box, res in zip(qboxes, results):
+        area, ids = 0.0, []
+        for i, f in enumerate(features):
+            ring = np.asarray(f["geometry"]["coordinates"][0], dtype=float)[:-1]
+            a = _ring_area_km2(clip_ring(ring, tuple(box)))
+            if a > 0:
+                area += a
+                ids.append(i)
+        assert res["flooded_area_km2"] == pytest.approx(area)
+        assert sorted(res["feature_ids"]) == ids
+
+
+def test_bbox_area_subtracts_holes():
+    idx = FloodIndex(_fc([_feature([_box(106.0, 10.0, 106.1, 10.1), _box(106.02, 10.02, 106.04, 10.04)])]))
+    outer = _ring_area_km2(np.array(_box(106.0, 10.0, 106.1, 10.1))[:-1])
+    hole = _ring_area_km2(np.array(_box(106.02, 10.02, 106.04, 10.04))[:-1])
+
+    full, half, none = idx.bboxes([[105, 9, 107, 11], [106.05, 9, 107, 11], [107, 11, 108, 12]])
+    assert full["flooded_area_km2"] == pytest.approx(outer - hole)
+    assert half["flooded_area_km2"] == pytest.approx(outer / 2, rel=1e-3)
+    assert none == {"flooded_area_km2": 0.0, "feature_ids": []}
@@ -0,0 +1,47 @@
+import json
+import datetime as dt
+
+from app.timeseries_store import TimeseriesStore
+
+
+def _write(path, dates):
+    recs = [{"date": d, "area_km2": i + 0.5, "pixel_count": i} for i, d in enumerate(dates)]
+    path.write_text(json.dumps(recs + [{"date": "sai"}, {"area_km2": 1}]), encoding="utf-8")
+
+
+def test_timeseries_store_slices_by_bisect(tmp_path):
+    path = tmp_path / "ts.json"
+    _write(path, ["2020-03-01", "2020-01-01", "2020-02-01", "2020-02-01", "2020-04-01"])
+    store = TimeseriesStore(path)
+    D = dt.date.fromisoformat
+
+    assert len(store) == 5
+    assert [r["date"] for r in store.slice()] == [
+        "2020-01-01", "2020-02-01", "2020-02-01", "2020-03-01", "2020-04-01",
+    ]
+    # 2 đầu đều bao gồm, kể cả ngày trùng
+    assert [r["date"] for r in store.slice(D("2020-02-01"), D("2020-03-01"))] == [
+        "2020-02-01", "2020-02-01", "2020-03-01",
+    ]
+    assert [r["date"] for r in store.slice(D("2020-01-15"), D("2020-02-20"))] == [
+        "2020-02-01", "2020-02-01",
+    ]
+    assert store.slice(D("2020-04-02")) == []
+    assert store.slice(D("2020-03-02"), D("2020-03-31")) == []
+    assert store.index_range(D("2019-01-01"), D("2019-12-31")) == (0, 0)
+
+    w = store.window(start=D("2020-03-01"))
+    assert list(w.area_km2) == [0.5, 4.5] and list(w.pixel_count) == [0, 4]
+    assert store.last_date() == D("2020-04-01")
+    assert [r["date"] for r in store.last_years(0)] == [r["date"] for r in store.slice()]
+
+
+def test_timeseries_store_reloads_when_file_changes(tmp_path):
+    path = tmp_path / "ts.json"
+    _write(path, ["2020-01-01"])
+    store = TimeseriesStore(path)
+    assert len(store) == 1
+
+    _write(path, ["2020-01-01", "2021-06-01", "2022-06-01"])
+    assert len(store) == 3
+    assert [r["date"] for r in store.last_years(1)] == ["2021-06-01", "2022-06-01"]
@@ -0,0 +1,67 @@
+import io
+import asyncio
+import zipfile
+
+import numpy as np
+
+from app.zipstream import blob_chunks, csv_chunks, file_chunks, stream_zip
+
+
+def _collect(entries):
+    async def run():
+        return [c async for c in stream_zip(entries)]
+
+    return asyncio.run(run())
+
+
+async def _agen(chunks):
+    for c in chunks:
+        await asyncio.sleep(0)
+        yield c
+
+
+def test_stream_zip_is_valid_archive_with_correct_crcs(tmp_path):
+    png = np.random.default_rng(0).bytes(300_000)  # ~ ảnh đã nén, không nén lại
+    path = tmp_path / "map.png"
+    path.write_bytes(png)
+    rows = [{"date": f"2020-01-{d:02d}", "rain_mm": d * 1.5} for d in range(1, 29)]
+    text = "xin chào " * 5000
+
+    chunks = _collect(
+        [
+            ("rainfall.csv", csv_chunks(["date", "rain_mm"], rows, batch=5), True),
+            ("notes.txt", _agen([text[:100], text[100:].encode("utf-8")]), True),
+            ("raw.bin", blob_chunks(png, size=4096), False),
+            ("flood_map.png", file_chunks(open(path, "rb"), size=10_000), False),
+            ("meta.json", b'{"a": 1}', True),
+            ("empty.txt", b"", True),
+        ]
+    )
+    assert len(chunks) > 10  # thật sự stream thành nhiều chunk
+
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as zf:
+        assert zf.testzip() is None  # CRC của mọi entry đúng
+        assert zf.namelist() == [
+            "rainfall.csv", "notes.txt", "raw.bin", "flood_map.png", "meta.json", "empty.txt",
+        ]
+        csv_text = zf.read("rainfall.csv").decode("utf-8").splitlines()
+        assert csv_text[0] == "date,rain_mm" and len(csv_text) == 29
+        assert zf.read("notes.txt").decode("utf-8") == text
+        assert zf.read("raw.bin") == png
+        assert zf.read("flood_map.png") == png
+        assert zf.read("meta.json") == b'{"a": 1}'
+        assert zf.read("empty.txt") == b""
+        assert zf.getinfo("flood_map.png").compress_type == zipfile.ZIP_STORED
+        assert zf.getinfo("notes.txt").compress_type == zipfile.ZIP_DEFLATED
+
+
+def test_file_chunks_closes_file(tmp_path):
+    path = tmp_path / "a.bin"
+    path.write_bytes(b"x" * 25)
+    f = open(path, "rb")
+
+    async def run():
+        return [c async for c in file_chunks(f, size=10)]
+
+    assert asyncio.run(run()) == [b"x" * 10, b"x" * 10, b"x" * 5]
+    assert f.closed